@@ -0,0 +1,136 @@
+"""compressed document text
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 06:12:41.518204
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils import compression
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH = 200
+TRAIN_MIN_DOCS = 50
+TRAIN_SAMPLES = 2000
+
+
+def _train(conn, codec: int) -> int:
+    """Train the first shared dictionary from existing text when there is enough of it"""
+    if codec == compression.CODEC_RAW:
+        return 0
+    samples = conn.execute(sa.text(
+        "SELECT extracted_text FROM documents WHERE extracted_text IS NOT NULL ORDER BY random() LIMIT :n"
+    ), {"n": TRAIN_SAMPLES}).scalars().all()
+    if len(samples) < TRAIN_MIN_DOCS:
+        return 0
+    try:
+        data = compression.train_dictionary(list(samples), codec)
+    except Exception:
+        return 0
+    if not data:
+        return 0
+    conn.execute(sa.text(
+        "INSERT INTO text_dictionaries (dict_id, codec, data, sample_docs, created_at) VALUES (1, :codec, :data, :n, CURRENT_TIMESTAMP)"
+    ), {"codec": codec, "data": data, "n": len(samples)})
+    compression.register_dictionary(1, codec, data)
+    return 1
+
+
+def _convert(conn, table: str, key: str, columns: dict, encode):
+    """Copy columns {old: new} in keyset batches, applying encode to each value"""
+    old = ", ".join(columns)
+    sets = ", ".join(f"{new} = :{new}" for new in columns.values())
+    last = ""
+    while True:
+        rows = conn.execute(sa.text(
+            f"SELECT {key}, {old} FROM {table} WHERE {key} > :last ORDER BY {key} LIMIT {BATCH}"
+        ), {"last": last}).all()
+        if not rows:
+            return
+        conn.execute(sa.text(f"UPDATE {table} SET {sets} WHERE {key} = :key"), [
+            {"key": r[0], **{new: encode(old_col, r[i + 1]) for i, (old_col, new) in enumerate(columns.items())}}
+            for r in rows
+        ])
+        last = rows[-1][0]
+
+
+def upgrade() -> None:
+    op.create_table('text_dictionaries',
+    sa.Column('dict_id', sa.Integer(), nullable=False),
+    sa.Column('codec', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('sample_docs', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('dict_id')
+    )
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('text_z', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('ai_analysis_z', sa.LargeBinary(), nullable=True))
+    with op.batch_alter_table('doc_chunks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('text_z', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('start_char', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('end_char', sa.Integer(), nullable=True))
+
+    conn = op.get_bind()
+    codec = compression.preferred_codec()
+    dict_id = _train(conn, codec)
+
+    def encode(col, value):
+        if value is None:
+            return None
+        if col == "ai_analysis":
+            value = value if isinstance(value, str) else json.dumps(value, default=str)
+        return compression.compress(value, codec, dict_id)
+
+    _convert(conn, "documents", "doc_id", {"extracted_text": "text_z", "ai_analysis": "ai_analysis_z"}, encode)
+    # Existing chunk copies are kept (compressed); new chunks store offsets only
+    _convert(conn, "doc_chunks", "chunk_id", {"text": "text_z"}, encode)
+
+    with op.batch_alter_table('doc_chunks', schema=None) as batch_op:
+        batch_op.drop_column('text')
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        batch_op.drop_column('ai_analysis')
+        batch_op.drop_column('extracted_text')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('extracted_text', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('ai_analysis', sa.JSON(), nullable=True))
+    with op.batch_alter_table('doc_chunks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('text', sa.Text(), nullable=True))
+
+    conn = op.get_bind()
+    for r in conn.execute(sa.text("SELECT dict_id, codec, data FROM text_dictionaries")).all():
+        compression.register_dictionary(r.dict_id, r.codec, bytes(r.data))
+
+    def decode(col, value):
+        return None if value is None else compression.decompress(bytes(value))
+
+    _convert(conn, "documents", "doc_id", {"text_z": "extracted_text", "ai_analysis_z": "ai_analysis"}, decode)
+    _convert(conn, "doc_chunks", "chunk_id", {"text_z": "text"}, decode)
+    # Offset-only chunks get their text back from the parent document
+    conn.execute(sa.text(
+        "UPDATE doc_chunks SET text = (SELECT substr(d.extracted_text, doc_chunks.start_char + 1, doc_chunks.end_char - doc_chunks.start_char) "
+        "FROM documents d WHERE d.doc_id = doc_chunks.doc_id) WHERE text IS NULL AND start_char IS NOT NULL"
+    ))
+
+    with op.batch_alter_table('doc_chunks', schema=None) as batch_op:
+        batch_op.drop_column('end_char')
+        batch_op.drop_column('start_char')
+        batch_op.drop_column('text_z')
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        batch_op.drop_column('ai_analysis_z')
+        batch_op.drop_column('text_z')
+    op.drop_table('text_dictionaries')
@@ -1,5 +1,6 @@
+from sqlalchemy import select, or_
 from sqlalchemy.orm import Session
-from .models import Document
+from .models import Document, Loan
 
 def create_document(db: Session, doc_id: str, loan_id: str = None, type: str = "generic", path: str = "", sha256: str = ""):
     """Create a new document record"""
@@ -13,4 +14,52 @@ def create_document(db: Session, doc_id: str, loan_id: str = None, type: str = "
     db.add(db_doc)
     db.commit()
     db.refresh(db_doc)
-    return db_doc
\ No newline at end of file
+    return db_doc
+
+PREVIEW_CHARS = 280
+
+REMOVED = "removed"
+# Loans still on the book; a full tape reload marks the ones it drops REMOVED but keeps their rows
+ON_BOOK = Loan.status.is_distinct_from(REMOVED)
+# Loan ids with a filed 410A. Unlinked documents are left out: one NULL in the list makes `NOT IN` never true
+WITH_410A = select(Document.loan_id).where(Document.type == "410A", Document.loan_id.isnot(None))
+
+def set_document_text(doc: Document, text: str | None):
+    """Store extracted text with its preview and length so listings never load it"""
+    doc.extracted_text = text
+    doc.text_preview = text[:PREVIEW_CHARS] if text else None
+    doc.text_length = len(text) if text is not None else None
+
+def iter_loan_columns(db: Session, columns, chunk_size: int, portfolio_id: str = None):
+    """Keyset-paginate selected loan columns so memory stays bounded by chunk_size"""
+    last = ""
+    while True:
+        stmt = select(Loan.loan_id, *columns).where(Loan.loan_id > last, ON_BOOK)
+        if portfolio_id:
+            stmt = stmt.where(Loan.portfolio_id == portfolio_id)
+        rows = db.execute(stmt.order_by(Loan.loan_id).limit(chunk_size)).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1].loan_id
+
+
+def filter_loans(stmt, status: str = None, delinquency_min: int = None, risk_min: float = None, portfolio_id: str = None, q: str = None):
+    """Apply the loan search filters shared by search and export; removed loans match only status=removed"""
+    stmt = stmt.where(Loan.status == status) if status else stmt.where(ON_BOOK)
+    if delinquency_min is not None:
+        stmt = stmt.where((Loan.delinquency_days != None) & (Loan.delinquency_days >= delinquency_min))
+    if risk_min is not None:
+        stmt = stmt.where((Loan.risk_score != None) & (Loan.risk_score >= risk_min))
+    if portfolio_id:
+        stmt = stmt.where(Loan.portfolio_id == portfolio_id)
+    if q:
+        like = f"%{q}%"
+        stmt = stmt.where(
+            or_(
+                Loan.loan_id.like(like),
+                Loan.geography.like(like),
+                Loan.servicer_id.like(like)
+            )
+        )
+    return stmt
@@ -1,18 +1,181 @@
-from sqlalchemy import create_engine
+import asyncio
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .settings import settings
 
-engine = create_engine(
-    settings.DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+def async_url(url: str) -> str:
+    """Swap a sync driver URL for its asyncio driver (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    for prefix in ("postgresql+psycopg2:", "postgresql:", "postgres:"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg:" + url[len(prefix):]
+    return url
+
+
+def _is_memory(url) -> bool:
+    return url.database in (None, "", ":memory:") or "mode=memory" in str(url)
+
+
+def engine_options(url: str) -> dict:
+    """create_engine keyword arguments for the backend profile of url"""
+    u = make_url(url)
+    backend, driver = u.get_backend_name(), u.get_driver_name()
+    if backend == "sqlite":
+        opts = {"connect_args": {"check_same_thread": False}}
+        if not _is_memory(u):
+            opts["connect_args"]["timeout"] = settings.SQLITE_BUSY_TIMEOUT_MS / 1000.0
+            if driver == "aiosqlite":
+                # Reuse connections instead of reopening (and re-running pragmas) per request
+                opts["poolclass"] = AsyncAdaptedQueuePool
+        return opts
+    opts = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if backend == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if driver == "asyncpg":
+            opts["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            opts["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return opts
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the single writer; NORMAL sync is safe under WAL
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.close()
+
+
+# Pool usage per engine; peak usage and checkout timeouts make exhaustion visible
+_pool_stats = {}
+_pool_timeouts = 0
+_pool_lock = threading.Lock()
+
+
+def _track_pool(name: str, sync_engine):
+    stats = _pool_stats.setdefault(name, {"checked_out": 0, "peak_checked_out": 0, "checkouts": 0, "connects": 0, "invalidated": 0})
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        with _pool_lock:
+            stats["connects"] += 1
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        with _pool_lock:
+            stats["checkouts"] += 1
+            stats["checked_out"] += 1
+            stats["peak_checked_out"] = max(stats["peak_checked_out"], stats["checked_out"])
+
+    @event.listens_for(sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        with _pool_lock:
+            stats["checked_out"] = max(stats["checked_out"] - 1, 0)
+
+    @event.listens_for(sync_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        with _pool_lock:
+            stats["invalidated"] += 1
+
+
+def _configure(name: str, sync_engine):
+    url = sync_engine.url
+    if url.get_backend_name() == "sqlite" and not _is_memory(url):
+        event.listen(sync_engine, "connect", _sqlite_pragmas)
+    _track_pool(name, sync_engine)
+    return sync_engine
+
+
+def make_engine(url: str, name: str):
+    engine = create_engine(url, **engine_options(url))
+    _configure(name, engine)
+    return engine
+
+
+def make_async_engine(url: str, name: str):
+    engine = create_async_engine(url, **engine_options(url))
+    _configure(name, engine.sync_engine)
+    return engine
+
+
+engine = make_engine(settings.DATABASE_URL, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = make_async_engine(settings.ASYNC_DATABASE_URL or async_url(settings.DATABASE_URL), "primary_async")
+# Objects stay loaded after commit: lazy refreshes are not possible under asyncio
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Read-only GET traffic can be routed to a replica; falls back to the primary
+if settings.READ_REPLICA_URL:
+    read_engine = make_engine(settings.READ_REPLICA_URL, "replica")
+    async_read_engine = make_async_engine(async_url(settings.READ_REPLICA_URL), "replica_async")
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+else:
+    read_engine, async_read_engine = engine, async_engine
+    ReadSessionLocal, AsyncReadSessionLocal = SessionLocal, AsyncSessionLocal
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db():
+    async with AsyncReadSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+async def run_in_session(fn, *args, read_only: bool = False, **kwargs):
+    """Run fn(sync_session, ...) on a worker thread for CPU-heavy or sync-only code"""
+    factory = ReadSessionLocal if read_only else SessionLocal
+    def call():
+        db = factory()
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            db.close()
+    return await asyncio.to_thread(call)
+
+
+def record_pool_timeout():
+    global _pool_timeouts
+    with _pool_lock:
+        _pool_timeouts += 1
+
+
+def pool_status() -> dict:
+    """Live pool gauges per engine"""
+    engines = {"primary": engine, "primary_async": async_engine.sync_engine}
+    if settings.READ_REPLICA_URL:
+        engines.update(replica=read_engine, replica_async=async_read_engine.sync_engine)
+    out = {}
+    for name, e in engines.items():
+        pool = e.pool
+        with _pool_lock:
+            stats = dict(_pool_stats.get(name, {}))
+        gauges = {"pool": type(pool).__name__, "status": pool.status()}
+        for attr in ("size", "checkedin", "checkedout", "overflow"):
+            if hasattr(pool, attr):
+                gauges[attr] = getattr(pool, attr)()
+        if hasattr(pool, "size"):
+            gauges["capacity"] = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+        out[name] = {**gauges, **stats}
+    out["checkout_timeouts"] = _pool_timeouts
+    return out
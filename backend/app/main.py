@@ -1,41 +1,99 @@
 
-from fastapi import FastAPI, Depends, UploadFile, File, Form, HTTPException, Path as FPath, Query, BackgroundTasks
+from fastapi import FastAPI, Depends, UploadFile, File, Form, HTTPException, Path as FPath, Query, BackgroundTasks, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import func, select, and_, or_
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import case, func, select, delete, insert, or_
+from sqlalchemy.orm import undefer
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+import asyncio
+from contextlib import asynccontextmanager
+import os
 import uuid
 import time
-from datetime import datetime, timedelta
+from datetime import date, datetime
 import json
 
 from .settings import settings
-from .db import Base, engine, get_db
+from .db import Base, async_engine, get_db, get_read_db, SessionLocal, run_in_session, pool_status, record_pool_timeout
 from .services.ingestion import ingest_loans_csv
 from .services.storage import save_upload
 from .services.extract import extract_pdf_text
-from .services.embeddings import embed, chunk, cosine
+from .services.embeddings import close_provider, cosine, get_provider
+from .utils.lazy import lazy_import
+from .services.fields import EXTRACTOR_VERSION, index_document_fields, loan_fields
+from .services import bulk_ingest, embedding_cache, snapshots, textstore
 from .schemas import (
-    IngestLoansResult, UploadResult, LoanResponse, DocumentResponse,
-    ComplianceRuleCreate, ComplianceRuleResponse, ComplianceEventResponse,
-    RiskAssessmentCreate, RiskAssessmentResponse, PortfolioCreate, PortfolioResponse,
-    RAGQuery, RAGResponse, ComplianceFinding, PortfolioAnalytics, Form410ADraft
+    IngestLoansResult, UploadResult, BulkIngestResult,
+    ComplianceRuleCreate, ComplianceRuleResponse,
+    RiskAssessmentCreate, RiskAssessmentResponse, RiskBatchResult, PortfolioCreate, PortfolioResponse,
+    RAGQuery, RAGResponse, PortfolioAnalytics, PortfolioPricing, AnalyticsHistory, SnapshotResult,
+    SimulationRequest, SimulationJob, Job, Form410ADraft
 )
-from .utils.ledger import append_event
-from .crud import create_document
+from .utils.ledger import append_event, append_event_async
+from .utils import admission, jobs, profiling, versions
+from .utils.serialization import columns_for, json_response, model_dict, model_rows, stream_page
+
+# numpy/scipy-backed services load on first use to keep worker startup fast
+risk = lazy_import("app.services.risk")
+scoring = lazy_import("app.services.scoring")
+cashflow = lazy_import("app.services.cashflow")
+pricing = lazy_import("app.services.pricing")
+simulation = lazy_import("app.services.simulation")
+loan_cache = lazy_import("app.services.loan_cache")
+export = lazy_import("app.services.export")
+vectorstore = lazy_import("app.services.vectorstore")
+from .crud import ON_BOOK, REMOVED, WITH_410A, create_document, filter_loans, set_document_text
 from .models import (
-    Loan, Document, DocChunk, ComplianceRule, ComplianceEvent,
-    RiskAssessment, Portfolio, AIAnalysis
+    Loan, Document, DocChunk, ComplianceRule,
+    RiskAssessment, Portfolio, AIAnalysis, PortfolioSnapshot
 )
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema is owned by alembic (python -m app.migrate); opt-in create_all for local dev
+    if settings.SCHEMA_AUTO_CREATE:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    scheduler = asyncio.create_task(snapshots.run_daily(settings.SNAPSHOT_CHECK_SECONDS)) if settings.SNAPSHOT_SCHEDULE else None
+    yield
+    if scheduler:
+        scheduler.cancel()
+    close_provider()
 
 app = FastAPI(
     title="Fixed-Income AI Platform",
     description="AI-powered platform for fixed-income portfolio management, compliance monitoring, and risk assessment",
     version="2.0.0",
-    openapi_url=f"{settings.API_PREFIX}/openapi.json"
+    openapi_url=f"{settings.API_PREFIX}/openapi.json",
+    lifespan=lifespan
 )
 
+def _book_wide(params: dict) -> str:
+    # The whole book is heavy; one portfolio is a dashboard read
+    return admission.CHEAP if params.get("portfolio_id") else admission.HEAVY
+
+# Admission classes for the expensive routes; everything else is cheap and never queued
+ADMISSION_ROUTES = {
+    "POST /api/rag/query": admission.HEAVY,
+    "POST /api/410a/draft": admission.HEAVY,
+    "GET /api/compliance/findings/missing-410a": admission.HEAVY,
+    "GET /api/portfolio/analytics": _book_wide,
+    "GET /api/portfolio/analytics/pricing": admission.HEAVY,
+    "GET /api/portfolio/cashflows": admission.HEAVY,
+    "GET /api/export/{dataset}": admission.HEAVY,
+    "POST /api/documents/{doc_id}/extract": admission.HEAVY,
+    "POST /api/rag/index/{doc_id}": admission.HEAVY,
+    "POST /api/ingest/loans": admission.BATCH,
+    "POST /api/ingest/documents:batch": admission.BATCH,
+    "POST /api/risk/assess:batch": admission.BATCH,
+    "POST /api/portfolio/snapshots": admission.BATCH,
+}
+
+# Added before CORS so refusals still carry the CORS headers
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(admission.AdmissionMiddleware, routes=ADMISSION_ROUTES)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.ALLOWED_ORIGINS,
@@ -44,11 +102,84 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request instrumentation: latency, SQL counts/time, N+1 and slow-query logs
+if settings.PROFILING_ENABLED:
+    profiling.install(settings.SLOW_QUERY_MS)
+
+    @app.middleware("http")
+    async def instrument_requests(request: Request, call_next):
+        stats, token = profiling.start_request(request.url.path)
+        profiler = None
+        if settings.PROFILE_TOKEN and request.headers.get(settings.PROFILE_HEADER) == settings.PROFILE_TOKEN:
+            profiler = profiling.start_profile()
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            elapsed = time.perf_counter() - started
+            route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+            profile_id = profiling.stop_profile(profiler, request.method, route, request.url.path, elapsed) if profiler else None
+            profiling.finish_request(stats, token, request.method, route, status, elapsed, settings.N_PLUS_ONE_THRESHOLD)
+        response.headers["Server-Timing"] = f'app;dur={elapsed * 1000:.1f}, db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"'
+        if profile_id:
+            response.headers["X-Profile-Id"] = profile_id
+        return response
+
+def _require_profile_token(request: Request):
+    if not settings.PROFILE_TOKEN or request.headers.get(settings.PROFILE_HEADER) != settings.PROFILE_TOKEN:
+        raise HTTPException(404, detail="Not found")
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_exhausted(request: Request, exc: PoolTimeoutError):
+    # Every pooled connection stayed checked out past DB_POOL_TIMEOUT
+    record_pool_timeout()
+    return JSONResponse(status_code=503, content={"detail": "Database connection pool exhausted"}, headers={"Retry-After": "1"})
+
 # Health and status endpoints
 @app.get("/health")
 def health():
     return {"status": "ok", "version": "2.0.0", "timestamp": datetime.utcnow()}
 
+@app.get("/api/cache/stats")
+def cache_stats():
+    return {"loan_tape": loan_cache.stats(settings.LOAN_CACHE_ENABLED)}
+
+@app.get("/api/db/pool")
+def db_pool():
+    return pool_status()
+
+@app.get("/api/admission")
+def admission_stats():
+    return admission.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of request histograms, pool and admission gauges"""
+    lines = ["# HELP db_pool_checked_out Connections currently checked out", "# TYPE db_pool_checked_out gauge"]
+    pools = pool_status()
+    for name, p in pools.items():
+        if isinstance(p, dict):
+            lines.append(f'db_pool_checked_out{{engine="{name}"}} {p["checked_out"]}')
+    lines += ["# HELP db_pool_checkout_timeouts_total Pool checkouts that timed out", "# TYPE db_pool_checkout_timeouts_total counter"]
+    lines.append(f"db_pool_checkout_timeouts_total {pools['checkout_timeouts']}")
+    lines += admission.metric_lines()
+    return profiling.render_metrics(lines)
+
+@app.get("/api/debug/profiles")
+def debug_profiles(request: Request, route: str | None = None):
+    _require_profile_token(request)
+    return {"profiles": profiling.list_profiles(route)}
+
+@app.get("/api/debug/profiles/{profile_id}", response_class=PlainTextResponse)
+def debug_profile(profile_id: str, request: Request):
+    _require_profile_token(request)
+    p = profiling.get_profile(profile_id)
+    if not p:
+        raise HTTPException(404, detail="Profile not found")
+    return p["stats"]
+
 @app.get("/api/status")
 def api_status():
     return {
@@ -62,42 +193,97 @@ def api_status():
         "last_updated": datetime.utcnow()
     }
 
+async def _revalidate(request: Request, response: Response, db: AsyncSession, *datasets: str):
+    """Tag the response with the datasets' versions; a 304 when the client already holds them"""
+    tag = versions.etag(await versions.current(db), *datasets)
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    response.headers.update(headers)
+    sent = request.headers.get("if-none-match")
+    if sent and (sent.strip() == "*" or tag in [t.strip().removeprefix("W/") for t in sent.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return None
+
+@app.get("/api/data/versions")
+async def data_versions(db: AsyncSession = Depends(get_read_db)):
+    """Current version of each dataset; they only move when a write commits"""
+    return await versions.current(db)
+
+async def _loan_tape():
+    """Refreshed loan-tape snapshot (on a worker thread), or None when disabled"""
+    if not settings.LOAN_CACHE_ENABLED:
+        return None
+    return await run_in_session(loan_cache.current, True)
+
 # Enhanced loan management
 @app.post("/api/ingest/loans", response_model=IngestLoansResult)
-async def ingest_loans(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def ingest_loans(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    full: bool = Form(False, description="Tape is the servicers' whole book: their loans missing from it are marked removed (needs a servicer_id column)"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Apply a loan tape as a delta; only new, changed and removed loans are written"""
     if not file.filename.endswith((".csv",)):
         raise HTTPException(400, detail="Only CSV supported in MVP")
     text = (await file.read()).decode("utf-8", errors="ignore")
     try:
-        res = ingest_loans_csv(db, text)
-        append_event(db, actor="system", type="ingest_loans", payload={"filename": file.filename, **res.model_dump()})
-        return res
+        res = await run_in_session(ingest_loans_csv, text, full)
     except ValueError as e:
         raise HTTPException(400, detail=str(e))
+    changed = res.changes.created + res.changes.updated + res.changes.removed
+    if changed:
+        loan_cache.mark_changed(changed)
+        await versions.bump_async(db, "loans")
+        if settings.SNAPSHOT_ON_INGEST:
+            background_tasks.add_task(run_in_session, snapshots.take)
+    await append_event_async(db, actor="system", type="ingest_loans", payload={
+        "filename": file.filename, "full": full,
+        **res.model_dump(exclude={"changes"}), "changed_columns": res.changes.changed_columns
+    })
+    return res
 
 @app.get("/api/loans/summary")
-async def loans_summary(db: Session = Depends(get_db)):
-    total = db.scalar(select(func.count(Loan.loan_id))) or 0
-    gt60 = db.scalar(select(func.count(Loan.loan_id)).where((Loan.delinquency_days != None) & (Loan.delinquency_days > 60))) or 0
-    subq = select(Document.loan_id).where(Document.type == "410A").subquery()
-    missing_410a = db.scalar(select(func.count(Loan.loan_id)).where(~Loan.loan_id.in_(select(subq.c.loan_id)))) or 0
+async def loans_summary(request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
+    if (cached := await _revalidate(request, response, db, "loans", "documents")):
+        return cached
+    tape = await _loan_tape()
+    if tape is not None:
+        return tape.summary()
     
-    # Enhanced analytics
-    total_value = db.scalar(select(func.sum(Loan.balance)).where(Loan.balance.isnot(None))) or 0
-    avg_rate = db.scalar(select(func.avg(Loan.rate)).where(Loan.rate.isnot(None))) or 0
-    high_risk = db.scalar(select(func.count(Loan.loan_id)).where(Loan.risk_score > 0.7)) or 0
+    # One pass over the loans still on the book
+    flag = lambda cond: func.sum(case((cond, 1), else_=0))
+    total, gt60, missing_410a, total_value, avg_rate, high_risk = (await db.execute(select(
+        func.count(Loan.loan_id),
+        flag(Loan.delinquency_days > 60),
+        flag(Loan.loan_id.not_in(WITH_410A)),
+        func.sum(Loan.balance),
+        func.avg(Loan.rate),
+        flag(Loan.risk_score > 0.7),
+    ).where(ON_BOOK))).one()
     
     return {
         "total": int(total),
-        ">60dpd": int(gt60),
-        "missing_410A": int(missing_410a),
-        "total_value": float(total_value),
-        "average_rate": float(avg_rate),
-        "high_risk_loans": int(high_risk)
+        ">60dpd": int(gt60 or 0),
+        "missing_410A": int(missing_410a or 0),
+        "total_value": float(total_value or 0),
+        "average_rate": float(avg_rate or 0),
+        "high_risk_loans": int(high_risk or 0)
     }
 
+_SEARCH_FIELDS = (
+    "loan_id", "status", "delinquency_days", "balance", "rate", "geography",
+    "servicer_id", "risk_score", "compliance_status", "missing_410A", "portfolio_id"
+)
+
+def _row_batches(stmt, fields):
+    """Response dicts for stmt, JSON_STREAM_BATCH rows at a time, off a server-side cursor"""
+    for part in export.iter_batches(stmt, settings.JSON_STREAM_BATCH):
+        yield [dict(zip(fields, r)) for r in part]
+
 @app.get("/api/loans/search", response_model=dict)
 async def loans_search(
+    request: Request,
+    response: Response,
     status: str | None = None,
     delinquency_min: int | None = None,
     risk_min: float | None = None,
@@ -105,55 +291,70 @@ async def loans_search(
     q: str | None = None,
     page: int = 1,
     page_size: int = 20,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    stmt = select(Loan)
-    
-    # Enhanced filtering
-    if status:
-        stmt = stmt.where(Loan.status == status)
-    if delinquency_min is not None:
-        stmt = stmt.where((Loan.delinquency_days != None) & (Loan.delinquency_days >= delinquency_min))
-    if risk_min is not None:
-        stmt = stmt.where((Loan.risk_score != None) & (Loan.risk_score >= risk_min))
-    if portfolio_id:
-        stmt = stmt.where(Loan.portfolio_id == portfolio_id)
-    if q:
-        like = f"%{q}%"
-        stmt = stmt.where(
-            or_(
-                Loan.loan_id.like(like),
-                Loan.geography.like(like),
-                Loan.servicer_id.like(like)
-            )
-        )
+    if (cached := await _revalidate(request, response, db, "loans", "documents")):
+        return cached
+    # Filter-only searches can be answered from the resident snapshot, which holds no removed loans
+    tape = None if q or status == REMOVED else await _loan_tape()
+    if tape is not None:
+        m = tape.mask(status=status, delinquency_min=delinquency_min, risk_min=risk_min, portfolio_id=portfolio_id)
+        return json_response({
+            "total": int(m.sum()),
+            "page": page,
+            "page_size": page_size,
+            "items": [tape.search_item(i) for i in tape.page(m, page, page_size)]
+        }, headers=response.headers)
     
-    total = db.scalar(select(func.count()).select_from(stmt.subquery())) or 0
-    items = db.execute(stmt.order_by(Loan.loan_id).offset((page-1)*page_size).limit(page_size)).scalars().all()
-
-    # Enhanced compliance checking
-    with_410a = {x[0] for x in db.execute(select(Document.loan_id).where(Document.type=="410A")).all()}
+    stmt = filter_loans(select(Loan.loan_id), status, delinquency_min, risk_min, portfolio_id, q)
+    total = await db.scalar(select(func.count()).select_from(stmt.subquery())) or 0
+    
+    # Columns in response order; the 410A check runs in SQL instead of loading every 410A loan id
+    rows = filter_loans(
+        select(
+            Loan.loan_id, Loan.status, Loan.delinquency_days, Loan.balance, Loan.rate, Loan.geography,
+            Loan.servicer_id, Loan.risk_score, Loan.compliance_status, Loan.loan_id.not_in(WITH_410A), Loan.portfolio_id
+        ),
+        status, delinquency_min, risk_min, portfolio_id, q
+    ).order_by(Loan.loan_id).offset((page-1)*page_size).limit(page_size)
+    head = {"total": int(total), "page": page, "page_size": page_size}
+    if page_size >= settings.JSON_STREAM_MIN_ROWS:
+        return stream_page(head, _row_batches(rows, _SEARCH_FIELDS), headers=response.headers)
+    items = [dict(zip(_SEARCH_FIELDS, r)) for r in (await db.execute(rows)).all()]
+    return json_response({**head, "items": items}, headers=response.headers)
 
-    return {
-        "total": int(total),
-        "page": page,
-        "page_size": page_size,
-        "items": [
-            {
-                "loan_id": x.loan_id,
-                "status": x.status,
-                "delinquency_days": x.delinquency_days,
-                "balance": x.balance,
-                "rate": x.rate,
-                "geography": x.geography,
-                "servicer_id": x.servicer_id,
-                "risk_score": x.risk_score,
-                "compliance_status": x.compliance_status,
-                "missing_410A": (x.loan_id not in with_410a),
-                "portfolio_id": x.portfolio_id
-            } for x in items
-        ]
-    }
+@app.get("/api/export/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    gzip: bool = False,
+    status: str | None = None,
+    delinquency_min: int | None = None,
+    risk_min: float | None = None,
+    portfolio_id: str | None = None,
+    q: str | None = None,
+    loan_id: str | None = None,
+):
+    """Stream a full dataset; loans take the same filters as /api/loans/search"""
+    if dataset not in export.DATASETS:
+        raise HTTPException(404, detail=f"Unknown dataset: {dataset}")
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(400, detail="Parquet export requires pyarrow")
+    
+    model = export.DATASETS[dataset][0]
+    if dataset == "loans":
+        where = lambda stmt: filter_loans(stmt, status, delinquency_min, risk_min, portfolio_id, q).where(
+            Loan.loan_id == loan_id if loan_id else True
+        )
+    elif loan_id:
+        where = lambda stmt: stmt.where(model.loan_id == loan_id)
+    else:
+        where = None
+    
+    filename = f"{dataset}.{format}" + (".gz" if gzip else "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    media_type = "application/gzip" if gzip else export.FORMATS[format]
+    return StreamingResponse(export.stream_export(dataset, format, where, gzip), media_type=media_type, headers=headers)
 
 # Enhanced document management
 @app.post("/api/ingest/document", response_model=UploadResult)
@@ -161,150 +362,278 @@ async def ingest_document(
     file: UploadFile = File(...),
     loan_id: str | None = Form(None),
     doc_type: str = Form("generic"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    path, sha = save_upload(file.file, file.content_type or "")
+    path, sha = await asyncio.to_thread(save_upload, file.file, file.content_type or "")
     doc_id = str(uuid.uuid4())
-    doc = create_document(db, doc_id=doc_id, loan_id=loan_id, type=doc_type, path=path, sha256=sha)
-    append_event(db, actor="system", type="ingest_document", payload={"doc_id": doc.doc_id, "loan_id": loan_id, "type": doc_type})
+    doc = await db.run_sync(create_document, doc_id=doc_id, loan_id=loan_id, type=doc_type, path=path, sha256=sha)
+    if loan_id and doc_type == "410A":
+        loan_cache.mark_changed([loan_id])
+    await versions.bump_async(db, "documents")
+    await append_event_async(db, actor="system", type="ingest_document", payload={"doc_id": doc.doc_id, "loan_id": loan_id, "type": doc_type})
     return UploadResult(doc_id=doc.doc_id, loan_id=doc.loan_id, type=doc.type, path=doc.path)
 
+def _run_document_processing(job: dict, doc_ids: list, index: bool):
+    db = SessionLocal()
+    try:
+        bulk_ingest.process_documents(
+            db, job, doc_ids, index=index,
+            batch_size=settings.BULK_PROCESS_BATCH, workers=settings.BULK_INGEST_WORKERS,
+        )
+    except Exception as e:
+        db.rollback()
+        jobs.fail_job(job, str(e))
+    finally:
+        db.close()
+
+@app.post("/api/ingest/documents:batch", response_model=BulkIngestResult)
+async def ingest_documents_batch(
+    background_tasks: BackgroundTasks,
+    files: list[UploadFile] = File(...),
+    manifest: UploadFile | None = File(None),
+    loan_id: str | None = Form(None),
+    doc_type: str = Form("generic"),
+    pattern: str | None = Form(None),
+    process: bool = Form(True),
+    index: bool = Form(True),
+):
+    """Ingest a ZIP package and/or many files in one call, then extract and index them as one job.
+
+    Files map to loans via a manifest CSV (uploaded or manifest.csv in the ZIP)
+    or the filename pattern; unmatched or unknown loans are left unlinked.
+    """
+    manifest_text = (await manifest.read()).decode("utf-8-sig", errors="ignore") if manifest else None
+    try:
+        res = await run_in_session(
+            bulk_ingest.ingest_uploads, files, manifest_text,
+            max_files=settings.BULK_MAX_FILES, max_bytes=settings.BULK_MAX_BYTES, max_file_bytes=settings.BULK_MAX_FILE_BYTES,
+            pattern=pattern or settings.BULK_FILENAME_PATTERN, loan_id=loan_id, doc_type=doc_type,
+            workers=settings.BULK_INGEST_WORKERS,
+        )
+    except ValueError as e:
+        raise HTTPException(400, detail=str(e))
+    if res["loan_ids_410a"]:
+        loan_cache.mark_changed(res["loan_ids_410a"])
+    job_id = None
+    if process and res["doc_ids"]:
+        job = jobs.create_job({"documents": len(res["doc_ids"]), "index": index})
+        background_tasks.add_task(_run_document_processing, job, res["doc_ids"], index)
+        job_id = job["job_id"]
+    return BulkIngestResult(job_id=job_id, **{k: v for k, v in res.items() if k != "loan_ids_410a"})
+
+@app.get("/api/ingest/jobs/{job_id}", response_model=Job)
+async def get_ingest_job(job_id: str):
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(404, detail="Job not found")
+    return Job(**job)
+
 @app.get("/api/documents", response_model=dict)
 async def list_documents(
+    request: Request,
+    response: Response,
     loan_id: str | None = None,
     has_text: bool | None = Query(None),
     doc_type: str | None = None,
     page: int = 1,
     page_size: int = 20,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    stmt = select(Document)
+    if (cached := await _revalidate(request, response, db, "documents")):
+        return cached
+    stmt = select(
+        Document.doc_id, Document.loan_id, Document.type, Document.sha256,
+        Document.text_preview, Document.text_length, Document.processing_status, Document.confidence_score
+    )
     if loan_id:
         stmt = stmt.where(Document.loan_id == loan_id)
     if has_text is not None:
         if has_text:
-            stmt = stmt.where(Document.extracted_text.isnot(None))
+            stmt = stmt.where(Document.text_length > 0)
         else:
-            stmt = stmt.where(Document.extracted_text.is_(None))
+            stmt = stmt.where(or_(Document.text_length.is_(None), Document.text_length == 0))
     if doc_type:
         stmt = stmt.where(Document.type == doc_type)
     
-    total = db.scalar(select(func.count()).select_from(stmt.subquery())) or 0
-    items = db.execute(stmt.order_by(Document.doc_id.desc()).offset((page-1)*page_size).limit(page_size)).scalars().all()
-    
+    total = await db.scalar(select(func.count()).select_from(stmt.subquery())) or 0
+    stmt = stmt.order_by(Document.doc_id.desc()).offset((page-1)*page_size).limit(page_size)
+    head = {"total": int(total), "page": page, "page_size": page_size}
+    if page_size >= settings.JSON_STREAM_MIN_ROWS:
+        batches = ([_document_item(d) for d in part] for part in export.iter_batches(stmt, settings.JSON_STREAM_BATCH))
+        return stream_page(head, batches, headers=response.headers)
+    items = [_document_item(d) for d in (await db.execute(stmt)).all()]
+    return json_response({**head, "items": items}, headers=response.headers)
+
+def _document_item(d) -> dict:
     return {
-        "total": int(total),
-        "page": page,
-        "page_size": page_size,
-        "items": [
-            {
-                "doc_id": d.doc_id,
-                "loan_id": d.loan_id,
-                "type": d.type,
-                "sha256": d.sha256,
-                "has_text": bool(d.extracted_text),
-                "preview": (d.extracted_text[:280] + '…') if d.extracted_text else None,
-                "processing_status": d.processing_status,
-                "confidence_score": d.confidence_score
-            } for d in items
-        ]
+        "doc_id": d.doc_id,
+        "loan_id": d.loan_id,
+        "type": d.type,
+        "sha256": d.sha256,
+        "has_text": bool(d.text_length),
+        "text_length": d.text_length or 0,
+        "preview": (d.text_preview + '…') if d.text_preview else None,
+        "processing_status": d.processing_status,
+        "confidence_score": d.confidence_score
     }
 
 @app.get("/api/documents/{doc_id}")
-async def get_document(doc_id: str, db: Session = Depends(get_db)):
-    d = db.get(Document, doc_id)
+async def get_document(
+    request: Request,
+    response: Response,
+    doc_id: str,
+    offset: int = Query(0, ge=0, description="First character of text to return"),
+    length: int | None = Query(None, ge=0, description="Characters of text to return (default: to the end)"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if (cached := await _revalidate(request, response, db, "documents")):
+        return cached
+    d = await db.get(Document, doc_id)
     if not d:
         raise HTTPException(404, detail="Not found")
+    # Text is stored compressed and only loaded (and decompressed) here
+    text = None
+    if d.text_length:
+        full = await db.scalar(select(Document.extracted_text).where(Document.doc_id == doc_id))
+        text = full[offset:offset + length if length is not None else None]
     return {
         "doc_id": d.doc_id,
         "loan_id": d.loan_id,
         "type": d.type,
         "sha256": d.sha256,
-        "has_text": bool(d.extracted_text),
-        "text": d.extracted_text,
+        "has_text": bool(d.text_length),
+        "text_length": d.text_length or 0,
+        "text_offset": offset,
+        "text": text,
         "processing_status": d.processing_status,
         "extracted_fields": d.extracted_fields,
         "confidence_score": d.confidence_score
     }
 
-@app.post("/api/documents/{doc_id}/extract")
-async def extract_document(doc_id: str = FPath(...), db: Session = Depends(get_db)):
+def _store_extracted_text(db, doc_id: str, text: str) -> int:
     doc = db.get(Document, doc_id)
+    set_document_text(doc, text)
+    doc.processing_status = "extracted"
+    index_document_fields(db, doc)
+    db.commit()
+    versions.bump(db, "documents")
+    return doc.text_length
+
+@app.post("/api/documents/{doc_id}/extract")
+async def extract_document(doc_id: str = FPath(...), db: AsyncSession = Depends(get_db)):
+    doc = await db.get(Document, doc_id)
     if not doc:
         raise HTTPException(404, detail="Document not found")
     
-    text = extract_pdf_text(doc.path)
+    text = await asyncio.to_thread(extract_pdf_text, doc.path)
     if not text:
         raise HTTPException(400, detail="Could not extract text (non-PDF or error)")
     
-    doc.extracted_text = text[:1_000_000]
-    doc.processing_status = "extracted"
-    db.commit()
-    
-    append_event(db, actor="system", type="extract_text", payload={"doc_id": doc_id})
-    return {"doc_id": doc_id, "chars": len(doc.extracted_text)}
+    # Compression and the field index are CPU work; both run on a worker thread
+    chars = await run_in_session(_store_extracted_text, doc_id, text[:1_000_000])
+    await append_event_async(db, actor="system", type="extract_text", payload={"doc_id": doc_id})
+    return {"doc_id": doc_id, "chars": chars}
 
 # Enhanced RAG system
 @app.post("/api/rag/index/{doc_id}")
-async def rag_index(doc_id: str, db: Session = Depends(get_db)):
-    d = db.get(Document, doc_id)
+async def rag_index(doc_id: str, db: AsyncSession = Depends(get_db)):
+    d = await db.get(Document, doc_id, options=[undefer(Document.extracted_text)])
     if not d or not d.extracted_text:
         raise HTTPException(400, detail="Document missing or no extracted text")
     
-    # Clear existing chunks
-    db.query(DocChunk).filter(DocChunk.doc_id==doc_id).delete()
-    
-    pieces = chunk(d.extracted_text)
-    for i, txt in enumerate(pieces):
-        v = embed(txt)
-        db.add(DocChunk(
-            chunk_id=str(uuid.uuid4()),
-            doc_id=doc_id,
-            ord=i,
-            text=txt,
-            vec=v
-        ))
+    # Embed first (cache writes commit on their own session), then swap the chunks;
+    # chunks reference character offsets into the document instead of copying it
+    rows = await run_in_session(textstore.embed_chunks, [(doc_id, d.extracted_text)])
+    old = (await db.execute(select(DocChunk.chunk_id, DocChunk.embedding_model).where(DocChunk.doc_id==doc_id))).all()
+    await db.execute(delete(DocChunk).where(DocChunk.doc_id==doc_id))
+    if rows:
+        await db.execute(insert(DocChunk), rows)
     
     d.processing_status = "indexed"
-    db.commit()
+    await db.commit()
+    await versions.bump_async(db, "documents", "chunks")
+    await run_in_session(vectorstore.index_rows, rows, [tuple(r) for r in old], read_only=True)
     
-    append_event(db, actor="system", type="rag_index", payload={"doc_id": doc_id, "chunks": len(pieces)})
-    return {"doc_id": doc_id, "chunks": len(pieces)}
+    await append_event_async(db, actor="system", type="rag_index", payload={"doc_id": doc_id, "chunks": len(rows)})
+    return {"doc_id": doc_id, "chunks": len(rows)}
+
+@app.get("/api/rag/embeddings")
+async def rag_embeddings():
+    """Active embedding model and what the embedding cache holds per model"""
+    provider = await asyncio.to_thread(get_provider)
+    return {
+        "provider": provider.name,
+        "model": provider.model,
+        "version": provider.version,
+        "dim": provider.dim,
+        "cache": await run_in_session(embedding_cache.stats, read_only=True),
+    }
+
+@app.get("/api/rag/store")
+async def rag_store():
+    """Segments, rows and tombstones per vector space in the on-disk store"""
+    return {"enabled": settings.VECTOR_STORE_ENABLED, "spaces": await asyncio.to_thread(vectorstore.stats)}
 
 @app.post("/api/rag/query", response_model=RAGResponse)
-async def rag_query(query: RAGQuery, db: Session = Depends(get_db)):
+async def rag_query(query: RAGQuery, db: AsyncSession = Depends(get_db)):
     start_time = time.time()
     q = query.q.strip()
     if not q:
         return RAGResponse(answers=[], query=q, total_results=0, processing_time=0.0)
     
-    qv = embed(q)
-    
-    # Enhanced search with filters
-    stmt = select(DocChunk)
-    if query.loan_id:
-        stmt = stmt.join(Document).where(Document.loan_id == query.loan_id)
-    if query.doc_type:
-        stmt = stmt.join(Document).where(Document.type == query.doc_type)
+    # The first call may load a model, so provider setup stays off the event loop too
+    provider = await asyncio.to_thread(get_provider)
+    qv = (await asyncio.to_thread(provider.embed_batch, [q]))[0]
     
-    chunks = db.execute(stmt.order_by(DocChunk.doc_id, DocChunk.ord)).scalars().all()
+    columns = (
+        DocChunk.chunk_id, DocChunk.doc_id, DocChunk.start_char, DocChunk.end_char,
+        DocChunk.chunk_type, DocChunk.semantic_tags
+    )
     
-    # Compute similarity scores
-    scored = []
-    for ch in chunks:
-        try:
-            sim = cosine(qv, ch.vec or [0.0]*128)
-        except Exception:
-            sim = 0.0
-        scored.append((sim, ch))
+    def filtered(stmt):
+        if query.loan_id or query.doc_type:
+            stmt = stmt.join(Document)
+        if query.loan_id:
+            stmt = stmt.where(Document.loan_id == query.loan_id)
+        if query.doc_type:
+            stmt = stmt.where(Document.type == query.doc_type)
+        return stmt
     
-    scored.sort(key=lambda x: x[0], reverse=True)
-    top = [x for x in scored[:query.limit] if x[0] > 0]
+    if settings.VECTOR_STORE_ENABLED and await asyncio.to_thread(vectorstore.is_synced, provider.version):
+        hits = await asyncio.to_thread(
+            vectorstore.search, provider.version, qv, query.limit, query.loan_id, query.doc_type, query.nprobe
+        )
+        hits = [h for h in hits if h[0] > 0]
+        # Re-check against the DB so chunks deleted or relinked since indexing are dropped
+        found = {}
+        if hits:
+            stmt = filtered(select(*columns).where(DocChunk.chunk_id.in_([h[1] for h in hits])))
+            found = {ch.chunk_id: ch for ch in (await db.execute(stmt)).all()}
+        top = [(sim, found[cid]) for sim, cid, _ in hits if cid in found]
+    else:
+        # Only vectors from the active model's space are comparable with the query
+        stmt = filtered(select(*columns, DocChunk.vec).where(
+            DocChunk.embedding_model == provider.version, DocChunk.dim == len(qv)
+        ))
+        chunks = (await db.execute(stmt.order_by(DocChunk.doc_id, DocChunk.ord))).all()
+        
+        # Compute similarity scores off the event loop
+        def rank():
+            scored = []
+            for ch in chunks:
+                if ch.vec:
+                    scored.append((cosine(qv, ch.vec), ch))
+            scored.sort(key=lambda x: x[0], reverse=True)
+            return [x for x in scored[:query.limit] if x[0] > 0]
+        
+        top = await asyncio.to_thread(rank)
+    texts = await run_in_session(textstore.chunk_texts, [ch for _, ch in top], read_only=True) if top else {}
 
     answers = []
     for sim, ch in top:
+        txt = texts[ch.chunk_id]
         answers.append({
-            "text": ch.text[:500] + ("…" if len(ch.text)>500 else ""),
+            "text": txt[:500] + ("…" if len(txt)>500 else ""),
             "doc_id": ch.doc_id,
             "similarity": round(float(sim), 4),
             "chunk_type": ch.chunk_type,
@@ -313,12 +642,11 @@ async def rag_query(query: RAGQuery, db: Session = Depends(get_db)):
     
     # Fallback to text search if no vector results
     if not answers:
-        like = f"%{q}%"
-        docs = db.execute(select(Document).where(Document.extracted_text.like(like)).limit(query.limit)).scalars().all()
+        docs = await run_in_session(textstore.search_text, q, query.limit, read_only=True)
         for d in docs:
             answers.append({
-                "text": (d.extracted_text or "")[:500],
-                "doc_id": d.doc_id,
+                "text": d["text"],
+                "doc_id": d["doc_id"],
                 "similarity": 0.0,
                 "chunk_type": "text",
                 "semantic_tags": None
@@ -334,22 +662,27 @@ async def rag_query(query: RAGQuery, db: Session = Depends(get_db)):
 
 # Enhanced 410A Draft Assistant
 @app.post("/api/410a/draft", response_model=Form410ADraft)
-async def draft_410a(body: dict, db: Session = Depends(get_db)):
+async def draft_410a(body: dict, db: AsyncSession = Depends(get_db)):
     loan_id = (body or {}).get("loan_id")
     if not loan_id:
         raise HTTPException(400, detail="loan_id required")
     
-    loan = db.get(Loan, loan_id)
+    loan = await db.get(Loan, loan_id)
     if not loan:
         raise HTTPException(404, detail="Loan not found")
     
-    # Enhanced field extraction
+    # Field index is built once per document version at extraction time
+    found, doc_count = await run_in_session(loan_fields, loan_id)
+    
+    def value(name):
+        return found[name]["value"] if name in found else None
+    
     fields = {
-        "debtor_name": None,
-        "case_number": None,
-        "arrears": loan.balance if loan and loan.balance else None,
-        "escrow_shortage": None,
-        "payment_history_ref": None,
+        "debtor_name": value("debtor_name"),
+        "case_number": value("case_number"),
+        "arrears": value("arrears") or (loan.balance if loan.balance else None),
+        "escrow_shortage": value("escrow_shortage"),
+        "payment_history_ref": value("payment_history_ref"),
         "loan_balance": loan.balance,
         "interest_rate": loan.rate,
         "origination_date": loan.orig_date.isoformat() if loan.orig_date else None,
@@ -357,22 +690,9 @@ async def draft_410a(body: dict, db: Session = Depends(get_db)):
         "geography": loan.geography
     }
     
-    # Enhanced document analysis
-    docs = db.execute(select(Document).where(Document.loan_id==loan_id, Document.extracted_text.isnot(None))).scalars().all()
-    
     missing_info = []
     recommendations = []
     
-    # Analyze documents for missing information
-    for doc in docs:
-        text = doc.extracted_text.lower()
-        if "case" in text and "number" in text:
-            fields["case_number"] = "(found in doc — review)"
-        if "debtor" in text or "borrower" in text:
-            fields["debtor_name"] = "(found in doc — review)"
-        if "escrow" in text and "shortage" in text:
-            fields["escrow_shortage"] = "(found in doc — review)"
-    
     # Check for missing critical information
     if not fields["debtor_name"]:
         missing_info.append("Debtor/Borrower name")
@@ -387,7 +707,7 @@ async def draft_410a(body: dict, db: Session = Depends(get_db)):
     if loan.risk_score and loan.risk_score > 0.7:
         recommendations.append("High-risk loan - ensure all supporting documentation is included")
     
-    confidence = 0.4 + (0.3 if len(docs) > 0 else 0) + (0.2 if loan.balance else 0) + (0.1 if loan.rate else 0)
+    confidence = 0.4 + (0.3 if doc_count > 0 else 0) + (0.2 if loan.balance else 0) + (0.1 if loan.rate else 0)
     confidence = min(confidence, 0.95)
     
     result = {
@@ -396,10 +716,11 @@ async def draft_410a(body: dict, db: Session = Depends(get_db)):
         "confidence": round(confidence, 2),
         "pdf_url": None,
         "missing_information": missing_info,
-        "recommendations": recommendations
+        "recommendations": recommendations,
+        "field_sources": {k: {"start": v["start"], "end": v["end"], "confidence": v["confidence"]} for k, v in found.items()}
     }
     
-    append_event(db, actor="system", type="410a_draft", payload=result)
+    await append_event_async(db, actor="system", type="410a_draft", payload=result)
     return Form410ADraft(**result)
 
 # New AI-powered endpoints
@@ -407,14 +728,29 @@ async def draft_410a(body: dict, db: Session = Depends(get_db)):
 async def get_missing_410a_findings(
     page: int = 1,
     page_size: int = 20,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
+    tape = await _loan_tape()
+    if tape is not None:
+        m = tape.alive & ~tape.has_410a
+        items = []
+        for i in tape.page(m, page, page_size):
+            x = tape.search_item(i)
+            items.append({
+                "loan_id": x["loan_id"],
+                "balance": x["balance"],
+                "delinquency_days": x["delinquency_days"],
+                "risk_score": x["risk_score"],
+                "compliance_status": x["compliance_status"],
+                "priority": "high" if (x["delinquency_days"] and x["delinquency_days"] > 60) else "medium"
+            })
+        return {"total": int(m.sum()), "page": page, "page_size": page_size, "items": items}
+    
     # Find loans missing 410A forms
-    subq = select(Document.loan_id).where(Document.type == "410A").subquery()
-    stmt = select(Loan).where(~Loan.loan_id.in_(select(subq.c.loan_id)))
+    stmt = select(Loan).where(ON_BOOK, Loan.loan_id.not_in(WITH_410A))
     
-    total = db.scalar(select(func.count()).select_from(stmt.subquery())) or 0
-    items = db.execute(stmt.order_by(Loan.loan_id).offset((page-1)*page_size).limit(page_size)).scalars().all()
+    total = await db.scalar(select(func.count()).select_from(stmt.subquery())) or 0
+    items = (await db.execute(stmt.order_by(Loan.loan_id).offset((page-1)*page_size).limit(page_size))).scalars().all()
     
     return {
         "total": int(total),
@@ -434,16 +770,57 @@ async def get_missing_410a_findings(
 
 @app.get("/api/portfolio/analytics", response_model=PortfolioAnalytics)
 async def get_portfolio_analytics(
+    request: Request,
+    response: Response,
     portfolio_id: str | None = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    # Build portfolio analytics
-    stmt = select(Loan)
+    if (cached := await _revalidate(request, response, db, "loans")):
+        return cached
+    tape = await _loan_tape()
+    if tape is not None:
+        return PortfolioAnalytics(**tape.analytics(portfolio_id))
+    
+    # Loading the loans as ORM objects is CPU-bound too, so all of it runs on a worker thread
+    return await run_in_session(_analytics_from_db, portfolio_id, read_only=True)
+
+@app.get("/api/portfolio/analytics/history", response_model=AnalyticsHistory)
+async def get_portfolio_analytics_history(
+    request: Request,
+    response: Response,
+    portfolio_id: str | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    interval: str = Query("day", pattern="^(day|week|month)$"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Analytics over time from the daily snapshots; week/month keep each period's last snapshot"""
+    if (cached := await _revalidate(request, response, db, "snapshots")):
+        return cached
+    stmt = select(*[c for c in PortfolioSnapshot.__table__.columns if c.name != "taken_at"]).where(PortfolioSnapshot.portfolio_id == (portfolio_id or snapshots.BOOK))
+    if start:
+        stmt = stmt.where(PortfolioSnapshot.as_of >= start)
+    if end:
+        stmt = stmt.where(PortfolioSnapshot.as_of <= end)
+    rows = (await db.execute(stmt.order_by(PortfolioSnapshot.as_of))).all()
+    return json_response({
+        "portfolio_id": portfolio_id,
+        "interval": interval,
+        "points": snapshots.history(rows, interval)
+    }, headers=response.headers)
+
+@app.post("/api/portfolio/snapshots", response_model=SnapshotResult)
+async def take_portfolio_snapshot(as_of: date | None = None):
+    """Snapshot every portfolio now, labelled as_of (default today); replaces that day's snapshot"""
+    return await run_in_session(snapshots.take, as_of)
+
+def _analytics_from_db(db, portfolio_id: str | None) -> PortfolioAnalytics:
+    stmt = select(Loan).where(ON_BOOK)
     if portfolio_id:
         stmt = stmt.where(Loan.portfolio_id == portfolio_id)
-    
-    loans = db.execute(stmt).scalars().all()
-    
+    return _analytics_for(db.execute(stmt).scalars().all())
+
+def _analytics_for(loans) -> PortfolioAnalytics:
     if not loans:
         return PortfolioAnalytics(
             total_loans=0,
@@ -513,53 +890,135 @@ async def get_portfolio_analytics(
         geography_distribution=geography_distribution
     )
 
+@app.get("/api/portfolio/analytics/pricing", response_model=PortfolioPricing)
+async def get_portfolio_pricing(
+    portfolio_id: str | None = None,
+    curve: str | None = Query(None, description="Zero curve as tenor_years:rate pairs, e.g. 1:0.045,10:0.043,30:0.046"),
+    spread: float = 0.0,
+    cpr: float = Query(0.06, ge=0, le=1),
+    cdr: float = Query(0.01, ge=0, le=1),
+    severity: float = Query(0.35, ge=0, le=1),
+    include_loans: bool = False,
+    page: int = 1,
+    page_size: int = 20,
+):
+    """Price, yield, WAL, duration and convexity under a discount curve"""
+    try:
+        points = pricing.parse_curve(curve)
+    except ValueError:
+        raise HTTPException(400, detail="curve must be tenor:rate pairs separated by commas")
+    assumptions = cashflow.Assumptions(cpr=cpr, cdr=cdr, severity=severity, as_of=datetime.utcnow().date())
+    res = await run_in_session(
+        pricing.portfolio_pricing, points, assumptions,
+        portfolio_id=portfolio_id,
+        spread=spread,
+        by_loan=include_loans,
+        workers=settings.CASHFLOW_WORKERS or os.cpu_count() or 1,
+        loan_chunk_size=settings.PRICING_LOAN_CHUNK_SIZE,
+        read_only=True,
+    )
+    loans = [{**x, "yield_rate": x.pop("yield")} for x in pricing.loan_page(res, page, page_size)] if include_loans else None
+    
+    return PortfolioPricing(
+        portfolio_id=portfolio_id,
+        curve=[list(p) for p in points],
+        spread=spread,
+        total_balance=res["total_balance"],
+        price=res["price"],
+        price_pct=res["price_pct"],
+        yield_rate=res["yield"],
+        wal=res["wal"],
+        modified_duration=res["modified_duration"],
+        convexity=res["convexity"],
+        loans_total=len(res["loans"]["loan_id"]) if include_loans else None,
+        loans=loans
+    )
+
+@app.get("/api/portfolio/cashflows")
+async def get_portfolio_cashflows(
+    portfolio_id: str | None = None,
+    cpr: float = Query(0.06, ge=0, le=1),
+    cdr: float = Query(0.01, ge=0, le=1),
+    severity: float = Query(0.35, ge=0, le=1),
+    periods: int = Query(360, ge=1, le=600),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+):
+    """Project portfolio-level monthly cash flows and stream them as NDJSON or CSV"""
+    assumptions = cashflow.Assumptions(cpr=cpr, cdr=cdr, severity=severity, periods=periods, as_of=datetime.utcnow().date())
+    total = await run_in_session(
+        cashflow.project_portfolio, assumptions,
+        portfolio_id=portfolio_id,
+        chunk_size=settings.CASHFLOW_CHUNK_SIZE,
+        workers=settings.CASHFLOW_WORKERS or os.cpu_count() or 1,
+        read_only=True,
+    )
+    
+    def rows():
+        if format == "csv":
+            yield ",".join(["period", "date", *cashflow.FLOWS]) + "\n"
+            for row in cashflow.iter_periods(total, assumptions.as_of):
+                yield ",".join(str(v) for v in row.values()) + "\n"
+        else:
+            for row in cashflow.iter_periods(total, assumptions.as_of):
+                yield json.dumps(row) + "\n"
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(rows(), media_type=media_type)
+
 # Portfolio management endpoints
 @app.post("/api/portfolios", response_model=PortfolioResponse)
-async def create_portfolio(portfolio: PortfolioCreate, db: Session = Depends(get_db)):
+async def create_portfolio(portfolio: PortfolioCreate, db: AsyncSession = Depends(get_db)):
     portfolio_id = str(uuid.uuid4())
     db_portfolio = Portfolio(
         portfolio_id=portfolio_id,
         **portfolio.model_dump()
     )
     db.add(db_portfolio)
-    db.commit()
-    db.refresh(db_portfolio)
+    await db.commit()
+    await db.refresh(db_portfolio)
+    await versions.bump_async(db, "portfolios")
     
-    append_event(db, actor="system", type="create_portfolio", payload={"portfolio_id": portfolio_id})
-    return PortfolioResponse(**db_portfolio.__dict__)
+    await append_event_async(db, actor="system", type="create_portfolio", payload={"portfolio_id": portfolio_id})
+    return json_response(model_dict(PortfolioResponse, db_portfolio))
 
 @app.get("/api/portfolios", response_model=dict)
 async def list_portfolios(
+    request: Request,
+    response: Response,
     page: int = 1,
     page_size: int = 20,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    stmt = select(Portfolio)
-    total = db.scalar(select(func.count()).select_from(stmt.subquery())) or 0
-    items = db.execute(stmt.order_by(Portfolio.created_at.desc()).offset((page-1)*page_size).limit(page_size)).scalars().all()
+    if (cached := await _revalidate(request, response, db, "portfolios")):
+        return cached
+    total = await db.scalar(select(func.count(Portfolio.portfolio_id))) or 0
+    stmt = select(*columns_for(PortfolioResponse, Portfolio))
+    rows = (await db.execute(stmt.order_by(Portfolio.created_at.desc()).offset((page-1)*page_size).limit(page_size))).all()
     
-    return {
+    return json_response({
         "total": int(total),
         "page": page,
         "page_size": page_size,
-        "items": [PortfolioResponse(**item.__dict__) for item in items]
-    }
+        "items": model_rows(PortfolioResponse, rows)
+    }, headers=response.headers)
 
 @app.get("/api/portfolios/{portfolio_id}", response_model=PortfolioResponse)
-async def get_portfolio(portfolio_id: str, db: Session = Depends(get_db)):
-    portfolio = db.get(Portfolio, portfolio_id)
+async def get_portfolio(portfolio_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
+    if (cached := await _revalidate(request, response, db, "portfolios")):
+        return cached
+    portfolio = await db.get(Portfolio, portfolio_id)
     if not portfolio:
         raise HTTPException(404, detail="Portfolio not found")
-    return PortfolioResponse(**portfolio.__dict__)
+    return json_response(model_dict(PortfolioResponse, portfolio), headers=response.headers)
 
 # Risk assessment endpoints
 @app.post("/api/risk/assess/{loan_id}", response_model=RiskAssessmentResponse)
 async def assess_loan_risk(
     loan_id: str,
     assessment: RiskAssessmentCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    loan = db.get(Loan, loan_id)
+    loan = await db.get(Loan, loan_id)
     if not loan:
         raise HTTPException(404, detail="Loan not found")
     
@@ -576,97 +1035,220 @@ async def assess_loan_risk(
     loan.yield_impact = assessment.yield_impact
     loan.last_risk_assessment = datetime.utcnow()
     
-    db.commit()
-    db.refresh(db_assessment)
+    await db.commit()
+    await db.refresh(db_assessment)
+    loan_cache.mark_changed([loan_id])
+    await versions.bump_async(db, "loans")
+    
+    await append_event_async(db, actor="system", type="risk_assessment", payload={"loan_id": loan_id, "risk_score": assessment.risk_score})
+    return json_response(model_dict(RiskAssessmentResponse, db_assessment))
+
+@app.post("/api/risk/assess:batch", response_model=RiskBatchResult)
+async def assess_loan_risk_batch(request: Request, db: AsyncSession = Depends(get_db)):
+    """Bulk-load assessments as a JSON array, NDJSON or CSV body.
+
+    A body that fails to parse part way is answered 400 with the counts of the
+    chunks already committed; those writes are versioned and logged as usual.
+    """
+    try:
+        fmt = risk.batch_format(request.headers.get("content-type"))
+    except ValueError as e:
+        raise HTTPException(400, detail=str(e))
+    sync_db = SessionLocal()
+    aborted = None
+    try:
+        res = await risk.write_assessment_stream(sync_db, request.stream(), fmt, settings.RISK_BATCH_CHUNK_SIZE)
+    except risk.BatchAborted as e:
+        res, aborted = e.result, str(e)
+    finally:
+        sync_db.close()
+    if res.written:
+        await versions.bump_async(db, "loans")
     
-    append_event(db, actor="system", type="risk_assessment", payload={"loan_id": loan_id, "risk_score": assessment.risk_score})
-    return RiskAssessmentResponse(**db_assessment.__dict__)
+    # One summarizing ledger event per batch rather than one per loan
+    if res.written or not aborted:
+        payload = {"format": fmt, **res.model_dump(exclude={"errors"})}
+        if aborted:
+            payload["aborted"] = aborted
+        await append_event_async(db, actor="system", type="risk_assessment_batch", payload=payload)
+    if aborted:
+        raise HTTPException(400, detail={"message": aborted, **res.model_dump()})
+    return res
+
+def _run_scoring(job: dict, portfolio_id: str | None):
+    db = SessionLocal()
+    try:
+        jobs.update(job, status="running")
+        res = scoring.score_book(
+            db,
+            model_path=settings.RISK_MODEL_PATH,
+            chunk_size=settings.SCORING_CHUNK_SIZE,
+            workers=settings.SCORING_WORKERS,
+            portfolio_id=portfolio_id,
+        )
+        versions.bump(db, "loans")
+        append_event(db, actor="system", type="risk_scoring", payload=res)
+        jobs.update(job, status="completed", progress=1.0, finished_at=datetime.utcnow(), result=res)
+    except Exception as e:
+        db.rollback()
+        jobs.fail_job(job, str(e))
+    finally:
+        db.close()
+
+@app.post("/api/risk/score")
+async def score_loans(background_tasks: BackgroundTasks, portfolio_id: str | None = None):
+    """Re-score the book (or one portfolio) with the configured model in the background"""
+    try:
+        model = await asyncio.to_thread(scoring.load_model, settings.RISK_MODEL_PATH)
+    except Exception as e:
+        raise HTTPException(500, detail=f"Could not load risk model: {str(e)}")
+    version = model.version
+    job = jobs.create_job({"model_version": version, "portfolio_id": portfolio_id})
+    background_tasks.add_task(_run_scoring, job, portfolio_id)
+    return {"status": "scheduled", "job_id": job["job_id"], "model_version": version, "portfolio_id": portfolio_id}
+
+@app.get("/api/risk/score/{job_id}", response_model=Job)
+async def get_scoring_job(job_id: str):
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(404, detail="Job not found")
+    return Job(**job)
+
+def _run_simulation(job: dict, req: SimulationRequest, scenarios: list):
+    db = SessionLocal()
+    try:
+        res = simulation.run_simulation(
+            db, job, scenarios,
+            portfolio_id=req.portfolio_id,
+            paths=req.paths,
+            seed=req.seed,
+            confidence=req.confidence,
+            rho_sys=req.systematic_correlation,
+            rho_geo=req.geography_correlation,
+            workers=settings.SIMULATION_WORKERS,
+        )
+        append_event(db, actor="system", type="credit_simulation", payload={
+            "job_id": job["job_id"], "portfolio_id": req.portfolio_id, "paths": req.paths, "seed": req.seed,
+            "expected_loss": {k: v["expected_loss"] for k, v in res["scenarios"].items()}
+        })
+    except Exception as e:
+        simulation.fail_job(job, str(e))
+    finally:
+        db.close()
+
+@app.post("/api/risk/simulations", response_model=SimulationJob)
+async def start_simulation(req: SimulationRequest, background_tasks: BackgroundTasks):
+    """Queue a Monte Carlo credit-loss / stress run; poll the job for progress"""
+    if req.systematic_correlation + req.geography_correlation >= 1:
+        raise HTTPException(400, detail="Correlations must sum to less than 1")
+    scenarios = []
+    for s in req.scenarios:
+        if isinstance(s, str):
+            if s not in simulation.SCENARIOS:
+                raise HTTPException(400, detail=f"Unknown scenario: {s}")
+            scenarios.append(simulation.SCENARIOS[s])
+        else:
+            scenarios.append(simulation.Scenario(**s.model_dump()))
+    job = simulation.create_job(req.model_dump())
+    background_tasks.add_task(_run_simulation, job, req, scenarios)
+    return SimulationJob(**job)
+
+@app.get("/api/risk/simulations/{job_id}", response_model=SimulationJob)
+async def get_simulation(job_id: str):
+    job = simulation.get_job(job_id)
+    if not job:
+        raise HTTPException(404, detail="Simulation not found")
+    return SimulationJob(**job)
 
 # Compliance rule management
 @app.post("/api/compliance/rules", response_model=ComplianceRuleResponse)
-async def create_compliance_rule(rule: ComplianceRuleCreate, db: Session = Depends(get_db)):
+async def create_compliance_rule(rule: ComplianceRuleCreate, db: AsyncSession = Depends(get_db)):
     rule_id = str(uuid.uuid4())
     db_rule = ComplianceRule(
         rule_id=rule_id,
         **rule.model_dump()
     )
     db.add(db_rule)
-    db.commit()
-    db.refresh(db_rule)
+    await db.commit()
+    await db.refresh(db_rule)
+    await versions.bump_async(db, "rules")
     
-    append_event(db, actor="system", type="create_compliance_rule", payload={"rule_id": rule_id})
-    return ComplianceRuleResponse(**db_rule.__dict__)
+    await append_event_async(db, actor="system", type="create_compliance_rule", payload={"rule_id": rule_id})
+    return json_response(model_dict(ComplianceRuleResponse, db_rule))
 
 @app.get("/api/compliance/rules", response_model=dict)
 async def list_compliance_rules(
+    request: Request,
+    response: Response,
     rule_type: str | None = None,
     is_active: bool | None = None,
     page: int = 1,
     page_size: int = 20,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    stmt = select(ComplianceRule)
+    if (cached := await _revalidate(request, response, db, "rules")):
+        return cached
+    stmt = select(*columns_for(ComplianceRuleResponse, ComplianceRule))
     if rule_type:
         stmt = stmt.where(ComplianceRule.rule_type == rule_type)
     if is_active is not None:
         stmt = stmt.where(ComplianceRule.is_active == is_active)
     
-    total = db.scalar(select(func.count()).select_from(stmt.subquery())) or 0
-    items = db.execute(stmt.order_by(ComplianceRule.created_at.desc()).offset((page-1)*page_size).limit(page_size)).scalars().all()
+    total = await db.scalar(select(func.count()).select_from(stmt.subquery())) or 0
+    rows = (await db.execute(stmt.order_by(ComplianceRule.created_at.desc()).offset((page-1)*page_size).limit(page_size))).all()
     
-    return {
+    return json_response({
         "total": int(total),
         "page": page,
         "page_size": page_size,
-        "items": [ComplianceRuleResponse(**item.__dict__) for item in items]
-    }
+        "items": model_rows(ComplianceRuleResponse, rows)
+    }, headers=response.headers)
 
 # AI Analysis endpoints
-@app.post("/api/ai/analyze/document/{doc_id}")
-async def analyze_document_ai(
-    doc_id: str,
-    analysis_type: str = "extraction",
-    db: Session = Depends(get_db)
-):
+def _analyze_document(db, doc_id: str, analysis_type: str):
     doc = db.get(Document, doc_id)
-    if not doc:
-        raise HTTPException(404, detail="Document not found")
-    
-    if not doc.extracted_text:
-        raise HTTPException(400, detail="Document must have extracted text for AI analysis")
-    
-    # Placeholder for AI analysis - in production, this would call OpenAI or other AI services
+    # Read the precomputed field index (rebuilt only if the document version changed)
+    index = index_document_fields(db, doc)
     analysis_result = {
-        "extracted_fields": {
-            "loan_amount": None,
-            "interest_rate": None,
-            "borrower_name": None,
-            "property_address": None
-        },
-        "confidence_score": 0.75,
+        "extracted_fields": {k: v["value"] for k, v in index["fields"].items()},
+        "field_offsets": {k: [v["start"], v["end"]] for k, v in index["fields"].items()},
+        "confidence_score": index["confidence"],
         "analysis_notes": "AI analysis completed successfully"
     }
     
     # Store AI analysis
     analysis_id = str(uuid.uuid4())
-    db_analysis = AIAnalysis(
+    db.add(AIAnalysis(
         analysis_id=analysis_id,
         doc_id=doc_id,
         analysis_type=analysis_type,
-        model_used="gpt-4",
-        input_data={"text_length": len(doc.extracted_text)},
+        model_used=f"field-extractor-v{EXTRACTOR_VERSION}",
+        input_data={"text_length": doc.text_length},
         output_data=analysis_result,
         confidence_score=analysis_result["confidence_score"]
-    )
-    db.add(db_analysis)
+    ))
     
-    # Update document with extracted fields
-    doc.extracted_fields = analysis_result["extracted_fields"]
-    doc.confidence_score = analysis_result["confidence_score"]
+    # extracted_fields/confidence_score already hold the field index
     doc.ai_analysis = analysis_result
     doc.processing_status = "ai_analyzed"
     
     db.commit()
+    versions.bump(db, "documents")
+    return analysis_id, analysis_result
+
+@app.post("/api/ai/analyze/document/{doc_id}")
+async def analyze_document_ai(
+    doc_id: str,
+    analysis_type: str = "extraction",
+    db: AsyncSession = Depends(get_db)
+):
+    doc = await db.get(Document, doc_id)
+    if not doc:
+        raise HTTPException(404, detail="Document not found")
+    
+    if not doc.text_length:
+        raise HTTPException(400, detail="Document must have extracted text for AI analysis")
     
-    append_event(db, actor="system", type="ai_analysis", payload={"doc_id": doc_id, "analysis_type": analysis_type})
+    analysis_id, analysis_result = await run_in_session(_analyze_document, doc_id, analysis_type)
+    await append_event_async(db, actor="system", type="ai_analysis", payload={"doc_id": doc_id, "analysis_type": analysis_type})
     return {"analysis_id": analysis_id, "result": analysis_result}
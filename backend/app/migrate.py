@@ -0,0 +1,36 @@
+"""Bring the database schema to the latest alembic revision.
+
+Run once per deploy before starting workers:
+
+    python -m app.migrate
+
+Databases created by the old import-time create_all have the tables but no
+alembic_version; those are stamped at the initial revision before upgrading.
+"""
+import os
+import sys
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from .db import engine
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INITIAL_REVISION = "0001"
+
+
+def alembic_config() -> Config:
+    cfg = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(BASE_DIR, "alembic"))
+    return cfg
+
+
+def migrate(revision: str = "head"):
+    cfg = alembic_config()
+    tables = set(inspect(engine).get_table_names())
+    if "alembic_version" not in tables and "loans" in tables:
+        command.stamp(cfg, INITIAL_REVISION)
+    command.upgrade(cfg, revision)
+
+
+if __name__ == "__main__":
+    migrate(sys.argv[1] if len(sys.argv) > 1 else "head")
@@ -1,8 +1,9 @@
 
-from sqlalchemy import Column, Integer, String, Date, Float, JSON, Text, ForeignKey, DateTime, Boolean, Numeric
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Date, Float, JSON, Text, ForeignKey, DateTime, Boolean, Numeric, LargeBinary, BigInteger
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from .db import Base
+from .utils.compression import CompressedJSON, CompressedText
 
 class Loan(Base):
     __tablename__ = "loans"
@@ -17,6 +18,7 @@ class Loan(Base):
     collateral_id = Column(String, nullable=True)
     geography = Column(String, nullable=True)
     features = Column(JSON, nullable=True)
+    tape_hash = Column(BigInteger, nullable=True)  # fingerprint of the last tape row applied (services.ingestion)
     
     # Enhanced fields for AI analytics
     risk_score = Column(Float, nullable=True)
@@ -44,14 +46,17 @@ class Document(Base):
     type = Column(String, index=True)
     path = Column(String, nullable=False)
     sha256 = Column(String, index=True)
-    extracted_text = Column(Text, nullable=True)
+    # Large payloads load only when asked for (undefer / explicit column select)
+    extracted_text = deferred(Column("text_z", CompressedText, nullable=True))
+    text_preview = Column(String, nullable=True)
+    text_length = Column(Integer, nullable=True)
     meta = Column(JSON, nullable=True)
     
     # Enhanced document processing
     processing_status = Column(String, default="pending")
     extracted_fields = Column(JSON, nullable=True)
     confidence_score = Column(Float, nullable=True)
-    ai_analysis = Column(JSON, nullable=True)
+    ai_analysis = deferred(Column("ai_analysis_z", CompressedJSON, nullable=True))
     
     loan = relationship("Loan", back_populates="documents")
     chunks = relationship("DocChunk", back_populates="document")
@@ -77,8 +82,14 @@ class DocChunk(Base):
     chunk_id = Column(String, primary_key=True, index=True)
     doc_id = Column(String, ForeignKey("documents.doc_id"), index=True, nullable=False)
     ord = Column(Integer, index=True, default=0)
-    text = Column(Text, nullable=False)
-    vec = Column(JSON, nullable=True)  # hashed embedding vector (list[float])
+    # Chunks normally point into the parent text; text is only kept when CHUNK_TEXT_COPY is on
+    text = deferred(Column("text_z", CompressedText, nullable=True))
+    start_char = Column(Integer, nullable=True)
+    end_char = Column(Integer, nullable=True)
+    vec = Column(JSON, nullable=True)  # embedding vector (list[float])
+    # Vector space the embedding belongs to; only vectors of one model are compared
+    embedding_model = Column(String, index=True, nullable=True)
+    dim = Column(Integer, nullable=True)
     
     # Enhanced chunk metadata
     chunk_type = Column(String, default="text")
@@ -161,4 +172,48 @@ class AIAnalysis(Base):
     # Analysis metadata
     processing_time = Column(Float, nullable=True)
     tokens_used = Column(Integer, nullable=True)
-    cost = Column(Float, nullable=True)
\ No newline at end of file
+    cost = Column(Float, nullable=True)
+
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+    provider = Column(String, primary_key=True)
+    model_version = Column(String, primary_key=True)
+    text_hash = Column(String, primary_key=True)  # sha256 of the chunk text
+    dim = Column(Integer, nullable=False)
+    vec = Column(LargeBinary, nullable=False)  # float32 array
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+    # One monotonic counter per logical dataset, bumped after every committed write
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class PortfolioSnapshot(Base):
+    __tablename__ = "portfolio_snapshots"
+    # One row per portfolio per day; portfolio_id "*" is the whole book
+    portfolio_id = Column(String, primary_key=True)
+    as_of = Column(Date, primary_key=True)
+    total_loans = Column(Integer, nullable=False)
+    total_value = Column(Float, nullable=False)
+    weighted_average_rate = Column(Float, nullable=False)
+    average_delinquency = Column(Float, nullable=False)
+    compliance_score = Column(Float, nullable=False)
+    risk_low = Column(Integer, nullable=False)
+    risk_moderate = Column(Integer, nullable=False)
+    risk_high = Column(Integer, nullable=False)
+    risk_critical = Column(Integer, nullable=False)
+    dpd_current = Column(Integer, nullable=False)
+    dpd_30_60 = Column(Integer, nullable=False)
+    dpd_60_90 = Column(Integer, nullable=False)
+    dpd_90_plus = Column(Integer, nullable=False)
+    taken_at = Column(DateTime, default=datetime.utcnow)
+
+class TextDictionary(Base):
+    __tablename__ = "text_dictionaries"
+    dict_id = Column(Integer, primary_key=True)
+    codec = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    sample_docs = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
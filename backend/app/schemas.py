@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, List, Optional, Dict, Any
 from datetime import datetime, date
 from enum import Enum
 
@@ -25,21 +25,43 @@ class DocumentType(str, Enum):
     PAYMENT_HISTORY = "payment_history"
     GENERIC = "generic"
 
+class Schema(BaseModel):
+    """Base for API schemas: validators are built on first use, not at import
+    or route registration, which keeps worker startup inside its budget"""
+    model_config = ConfigDict(defer_build=True, experimental_defer_build_mode=("model", "type_adapter"))
+
 # Base schemas
-class IngestLoansResult(BaseModel):
+class LoanChangeSet(Schema):
+    created: List[str]
+    updated: List[str]
+    removed: List[str]
+    changed_columns: Dict[str, int] = Field(default_factory=dict, description="Updated loans per changed tape column")
+
+class IngestLoansResult(Schema):
     loans_processed: int
     loans_created: int
     loans_updated: int
+    loans_unchanged: int = 0
+    loans_removed: int = 0
     errors: List[str]
+    changes: Optional[LoanChangeSet] = None
 
-class UploadResult(BaseModel):
+class UploadResult(Schema):
     doc_id: str
     loan_id: Optional[str]
     type: str
     path: str
 
+class BulkIngestResult(Schema):
+    documents: int
+    linked: int
+    unlinked: List[str]
+    errors: List[str]
+    doc_ids: List[str]
+    job_id: Optional[str] = None
+
 # Loan schemas
-class LoanBase(BaseModel):
+class LoanBase(Schema):
     loan_id: str
     orig_date: Optional[date]
     balance: Optional[float]
@@ -60,7 +82,7 @@ class LoanBase(BaseModel):
 class LoanCreate(LoanBase):
     pass
 
-class LoanUpdate(BaseModel):
+class LoanUpdate(Schema):
     balance: Optional[float]
     status: Optional[str]
     delinquency_days: Optional[int]
@@ -74,7 +96,7 @@ class LoanResponse(LoanBase):
     compliance_score: Optional[float]
 
 # Document schemas
-class DocumentBase(BaseModel):
+class DocumentBase(Schema):
     doc_id: str
     loan_id: Optional[str]
     type: str
@@ -94,7 +116,7 @@ class DocumentResponse(DocumentBase):
     preview: Optional[str]
 
 # Compliance schemas
-class ComplianceRuleBase(BaseModel):
+class ComplianceRuleBase(Schema):
     name: str
     description: Optional[str]
     rule_type: str
@@ -110,7 +132,7 @@ class ComplianceRuleResponse(ComplianceRuleBase):
     created_at: datetime
     updated_at: datetime
 
-class ComplianceEventBase(BaseModel):
+class ComplianceEventBase(Schema):
     loan_id: Optional[str]
     rule_id: Optional[str]
     event_type: str
@@ -128,7 +150,9 @@ class ComplianceEventResponse(ComplianceEventBase):
     resolved_at: Optional[datetime]
 
 # Risk Assessment schemas
-class RiskAssessmentBase(BaseModel):
+class RiskAssessmentBase(Schema):
+    model_config = ConfigDict(protected_namespaces=())  # model_version is a field name, not pydantic's
+
     loan_id: str
     risk_score: float
     default_probability: Optional[float]
@@ -144,8 +168,16 @@ class RiskAssessmentResponse(RiskAssessmentBase):
     assessment_id: str
     assessment_date: datetime
 
+class RiskBatchResult(Schema):
+    received: int
+    written: int
+    rejected: int
+    missing_loans: int
+    chunks: int
+    errors: List[str]
+
 # Portfolio schemas
-class PortfolioBase(BaseModel):
+class PortfolioBase(Schema):
     name: str
     description: Optional[str]
     strategy: str
@@ -165,7 +197,9 @@ class PortfolioResponse(PortfolioBase):
     updated_at: datetime
 
 # AI Analysis schemas
-class AIAnalysisBase(BaseModel):
+class AIAnalysisBase(Schema):
+    model_config = ConfigDict(protected_namespaces=())
+
     loan_id: Optional[str]
     doc_id: Optional[str]
     analysis_type: str
@@ -185,20 +219,21 @@ class AIAnalysisResponse(AIAnalysisBase):
     cost: Optional[float]
 
 # RAG schemas
-class RAGQuery(BaseModel):
+class RAGQuery(Schema):
     q: str = Field(..., description="Natural language query")
     loan_id: Optional[str] = Field(None, description="Filter by specific loan")
     doc_type: Optional[str] = Field(None, description="Filter by document type")
     limit: int = Field(5, description="Number of results to return")
+    nprobe: Optional[int] = Field(None, ge=0, description="IVF cells to scan (0 = exact search; default VECTOR_IVF_NPROBE)")
 
-class RAGResponse(BaseModel):
+class RAGResponse(Schema):
     answers: List[Dict[str, Any]]
     query: str
     total_results: int
     processing_time: float
 
 # Compliance findings schemas
-class ComplianceFinding(BaseModel):
+class ComplianceFinding(Schema):
     loan_id: str
     rule_name: str
     severity: str
@@ -208,7 +243,7 @@ class ComplianceFinding(BaseModel):
     missing_documents: List[str]
 
 # Portfolio analytics schemas
-class PortfolioAnalytics(BaseModel):
+class PortfolioAnalytics(Schema):
     total_loans: int
     total_value: float
     weighted_average_rate: float
@@ -218,11 +253,84 @@ class PortfolioAnalytics(BaseModel):
     delinquency_distribution: Dict[str, int]
     geography_distribution: Dict[str, int]
 
+class AnalyticsPoint(Schema):
+    period: date = Field(..., description="First day of the day/week/month bucket")
+    as_of: date = Field(..., description="Snapshot the bucket reports (its latest)")
+    total_loans: int
+    total_value: float
+    weighted_average_rate: float
+    average_delinquency: float
+    compliance_score: float
+    risk_distribution: Dict[str, int]
+    delinquency_distribution: Dict[str, int]
+
+class AnalyticsHistory(Schema):
+    portfolio_id: Optional[str]
+    interval: str
+    points: List[AnalyticsPoint]
+
+class SnapshotResult(Schema):
+    as_of: date
+    portfolios: int
+    total_loans: int
+
+class LoanPricing(Schema):
+    loan_id: str
+    balance: float
+    price: Optional[float]
+    yield_rate: Optional[float]
+    wal: Optional[float]
+    modified_duration: Optional[float]
+    convexity: Optional[float]
+
+class StressScenario(Schema):
+    name: str
+    rate_shock_bps: float = 0.0
+    hpi_drop: float = Field(0.0, ge=0, le=1, description="Fractional home price decline")
+    geographies: Optional[List[str]] = Field(None, description="Geographies hit by the HPI drop; all when omitted")
+
+class SimulationRequest(Schema):
+    portfolio_id: Optional[str] = None
+    paths: int = Field(10000, ge=1, le=1_000_000)
+    seed: int = 0
+    scenarios: List[str | StressScenario] = Field(["baseline"], description="Preset names or custom scenarios")
+    confidence: List[Annotated[float, Field(gt=0, lt=1)]] = Field([0.95, 0.99], description="VaR/ES confidence levels, each strictly between 0 and 1")
+    systematic_correlation: float = Field(0.12, ge=0, lt=1)
+    geography_correlation: float = Field(0.08, ge=0, lt=1)
+
+class Job(Schema):
+    """Status of a background job (scoring, document processing)"""
+    job_id: str
+    status: str
+    progress: float
+    submitted_at: datetime
+    finished_at: Optional[datetime]
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+
+class SimulationJob(Job):
+    pass
+
+class PortfolioPricing(Schema):
+    portfolio_id: Optional[str]
+    curve: List[List[float]]
+    spread: float
+    total_balance: float
+    price: Optional[float]
+    price_pct: Optional[float]
+    yield_rate: Optional[float]
+    wal: Optional[float]
+    modified_duration: Optional[float]
+    convexity: Optional[float]
+    loans_total: Optional[int]
+    loans: Optional[List[LoanPricing]]
+
 # 410A Draft schemas
-class Form410ADraft(BaseModel):
+class Form410ADraft(Schema):
     loan_id: str
     fields: Dict[str, Any]
     confidence: float
     pdf_url: Optional[str]
     missing_information: List[str]
-    recommendations: List[str]
\ No newline at end of file
+    recommendations: List[str]
+    field_sources: Dict[str, Dict[str, Any]] = {}
\ No newline at end of file
@@ -0,0 +1,341 @@
+"""Bulk document ingestion from ZIP packages or multipart batches.
+
+Entries are streamed to upload storage and hashed on a thread pool, mapped to
+loans through a manifest CSV (filename, loan_id, doc_type) or a filename
+pattern, and inserted as Document rows in one transaction. Extraction and RAG
+indexing then run for the whole batch as one background job.
+
+Multipart requests are capped at 1000 parts by the form parser, so large
+packages (thousands of files) should come as a ZIP.
+"""
+import csv
+import io
+import os
+import re
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime
+from typing import IO, Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from ..crud import set_document_text
+from ..models import Document, DocChunk, Loan
+from ..utils.jobs import update
+from ..utils.lazy import lazy_import
+from ..utils import versions
+from ..utils.ledger import append_event
+from .extract import extract_pdf_text
+from .fields import index_document_fields
+from .storage import save_stream
+from .textstore import chunk_rows
+
+vectorstore = lazy_import("app.services.vectorstore")
+
+MANIFEST_NAMES = {"manifest.csv"}
+LOOKUP_BATCH = 500
+MAX_TEXT_CHARS = 1_000_000
+
+
+@dataclass
+class Entry:
+    name: str  # path inside the package, or the uploaded filename
+    size: int
+    open: Callable[[], IO[bytes]]
+
+
+def _skip(name: str) -> bool:
+    base = os.path.basename(name)
+    return not base or base.startswith(".") or name.startswith("__MACOSX/")
+
+
+def zip_entries(zf: zipfile.ZipFile) -> Tuple[List[Entry], Optional[str]]:
+    """Files in a ZIP package plus the text of its manifest.csv, if it has one"""
+    entries, manifest = [], None
+    for info in zf.infolist():
+        if info.is_dir() or _skip(info.filename):
+            continue
+        if os.path.basename(info.filename).lower() in MANIFEST_NAMES:
+            manifest = zf.read(info).decode("utf-8-sig", errors="ignore")
+            continue
+        entries.append(Entry(info.filename, info.file_size, lambda info=info: zf.open(info)))
+    return entries, manifest
+
+
+def upload_entries(files: Iterable) -> List[Entry]:
+    """Entries for multipart uploads (objects with .filename, .size and .file)"""
+    entries = []
+    for f in files:
+        if _skip(f.filename or ""):
+            continue
+        entries.append(Entry(f.filename, f.size or 0, lambda f=f: _rewound(f.file)))
+    return entries
+
+
+def _rewound(fp):
+    fp.seek(0)
+    return fp
+
+
+def _check_limits(entries: List[Entry], max_files: int, max_bytes: int):
+    """Refuse a batch up front from its declared sizes; ingest() meters the bytes actually copied"""
+    if len(entries) > max_files:
+        raise ValueError(f"Batch has {len(entries)} files; the limit is {max_files}")
+    total = sum(e.size for e in entries)
+    if total > max_bytes:
+        raise ValueError(f"Batch expands to {total} bytes; the limit is {max_bytes}")
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+class _Quota:
+    """Bytes left for the whole batch, shared by the copying threads (None = no limit)"""
+
+    def __init__(self, limit: Optional[int]):
+        self.limit, self.left, self.lock = limit, limit, threading.Lock()
+
+    def take(self, n: int):
+        with self.lock:
+            self.left -= n
+            if self.left < 0:
+                raise BatchTooLarge(f"Batch expands past {self.limit} bytes")
+
+
+class _Metered:
+    """File-like reader charging every block it returns to a _Quota"""
+
+    def __init__(self, src: IO[bytes], quota: _Quota):
+        self.src, self.quota = src, quota
+
+    def read(self, n: int = -1) -> bytes:
+        block = self.src.read(n)
+        self.quota.take(len(block))
+        return block
+
+
+def read_manifest(text: str) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """basename (lower-cased) -> (loan_id, doc_type) from a manifest CSV"""
+    reader = csv.DictReader(io.StringIO(text))
+    fields = {(h or "").strip().lower(): h for h in reader.fieldnames or []}
+    name_col = fields.get("filename") or fields.get("file")
+    if not name_col:
+        raise ValueError("Manifest needs a filename column")
+    loan_col = fields.get("loan_id")
+    type_col = fields.get("doc_type") or fields.get("type")
+    out = {}
+    for row in reader:
+        name = (row.get(name_col) or "").strip()
+        if name:
+            out[os.path.basename(name).lower()] = (
+                (row.get(loan_col) or "").strip() or None if loan_col else None,
+                (row.get(type_col) or "").strip() or None if type_col else None,
+            )
+    return out
+
+
+def compile_pattern(pattern: str) -> re.Pattern:
+    try:
+        rx = re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"Invalid filename pattern: {e}")
+    if "loan_id" not in rx.groupindex:
+        raise ValueError("Filename pattern needs a (?P<loan_id>...) group")
+    return rx
+
+
+def _doc_type(token: Optional[str]) -> Optional[str]:
+    if not token:
+        return None
+    return "410A" if token.upper() == "410A" else token.lower()
+
+
+def resolve(name: str, manifest: Dict, pattern: re.Pattern, loan_id: Optional[str], doc_type: str) -> Tuple[Optional[str], str]:
+    """(loan_id, doc_type) for one file: manifest first, then the filename pattern, then the defaults"""
+    base = os.path.basename(name)
+    if base.lower() in manifest:
+        m_loan, m_type = manifest[base.lower()]
+        return m_loan or loan_id, _doc_type(m_type) or doc_type
+    m = pattern.match(os.path.splitext(base)[0])
+    if not m:
+        return loan_id, doc_type
+    groups = m.groupdict()
+    return groups.get("loan_id") or loan_id, _doc_type(groups.get("doc_type")) or doc_type
+
+
+def _store(entry: Entry, quota: _Quota, max_file_bytes: Optional[int]):
+    suffix = os.path.splitext(entry.name)[1].lower() or ".bin"
+    with entry.open() as src:
+        return save_stream(src if quota.limit is None else _Metered(src, quota), suffix, max_file_bytes)
+
+
+def _remove(paths: Iterable[str]):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _existing_loans(db: Session, loan_ids: set) -> set:
+    ids, found = sorted(loan_ids), set()
+    for i in range(0, len(ids), LOOKUP_BATCH):
+        found.update(db.execute(select(Loan.loan_id).where(Loan.loan_id.in_(ids[i:i + LOOKUP_BATCH]))).scalars())
+    return found
+
+
+def ingest(
+    db: Session,
+    entries: List[Entry],
+    manifest: Optional[str] = None,
+    pattern: str = "",
+    loan_id: Optional[str] = None,
+    doc_type: str = "generic",
+    workers: int = 4,
+    source: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    max_file_bytes: Optional[int] = None,
+) -> dict:
+    """Store every entry and insert its Document row in one transaction.
+
+    Files are copied and hashed concurrently; loan ids that don't exist are
+    left unlinked rather than failing the batch. Sizes are enforced on the
+    bytes copied, not the declared ones: a file over max_file_bytes is
+    skipped with an error, and a batch over max_bytes fails as a whole.
+    """
+    mapping = read_manifest(manifest) if manifest else {}
+    rx = compile_pattern(pattern)
+
+    quota = _Quota(max_bytes)
+    stored, errors, too_large = [], [], None
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        futures = [(e, pool.submit(_store, e, quota, max_file_bytes)) for e in entries]
+        for e, fut in futures:
+            try:
+                stored.append((e, *fut.result()))
+            except BatchTooLarge as ex:
+                too_large = ex
+            except Exception as ex:
+                errors.append(f"{e.name}: {ex}")
+    if too_large:
+        _remove(path for _, path, *_ in stored)
+        raise too_large
+
+    targets = [resolve(e.name, mapping, rx, loan_id, doc_type) for e, *_ in stored]
+    known = _existing_loans(db, {t[0] for t in targets if t[0]})
+    rows, unlinked = [], []
+    for (e, path, sha, size), (lid, dtype) in zip(stored, targets):
+        if lid and lid not in known:
+            unlinked.append(e.name)
+            lid = None
+        rows.append({
+            "doc_id": str(uuid.uuid4()),
+            "loan_id": lid,
+            "type": dtype,
+            "path": path,
+            "sha256": sha,
+            "processing_status": "pending",
+            "meta": {"filename": e.name, "size": size, "source": source},
+        })
+
+    try:
+        if rows:
+            # render_nulls keeps linked and unlinked rows in one executemany
+            db.execute(insert(Document).execution_options(render_nulls=True), rows)
+        # The ledger commit also commits the inserted rows
+        append_event(db, actor="system", type="ingest_documents", payload={
+            "source": source, "documents": len(rows), "unlinked": len(unlinked), "errors": len(errors),
+        })
+        versions.bump(db, "documents")
+    except Exception:
+        db.rollback()
+        _remove(r["path"] for r in rows)
+        raise
+
+    return {
+        "documents": len(rows),
+        "linked": len(rows) - sum(1 for r in rows if not r["loan_id"]),
+        "unlinked": unlinked[:50],
+        "errors": errors[:50],
+        "doc_ids": [r["doc_id"] for r in rows],
+        "loan_ids_410a": sorted({r["loan_id"] for r in rows if r["loan_id"] and r["type"] == "410A"}),
+    }
+
+
+def ingest_uploads(db: Session, uploads: List, manifest: Optional[str] = None, max_files: int = 10_000, max_bytes: int = 4 << 30, **kw) -> dict:
+    """ingest() for uploaded files, expanding any ZIP packages among them"""
+    with ExitStack() as stack:
+        entries, plain = [], []
+        for u in uploads:
+            if not (u.filename or "").lower().endswith(".zip"):
+                plain.append(u)
+                continue
+            try:
+                zf = stack.enter_context(zipfile.ZipFile(_rewound(u.file)))
+            except zipfile.BadZipFile:
+                raise ValueError(f"{u.filename} is not a valid ZIP file")
+            found, packaged = zip_entries(zf)
+            entries.extend(found)
+            manifest = manifest or packaged
+        entries.extend(upload_entries(plain))
+        _check_limits(entries, max_files, max_bytes)
+        return ingest(db, entries, manifest, source=",".join(u.filename or "" for u in uploads)[:200], max_bytes=max_bytes, **kw)
+
+
+def _extract(path: str) -> Optional[str]:
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == ".pdf":
+        with open(path, "rb") as f:
+            text = extract_pdf_text(f)
+        return None if text.startswith("Error extracting text") else text
+    if suffix == ".txt":
+        with open(path, "rb") as f:
+            return f.read().decode("utf-8", errors="ignore")
+    return ""  # no extractor for this type
+
+
+def process_documents(db: Session, job: dict, doc_ids: List[str], index: bool = True, batch_size: int = 50, workers: int = 4) -> dict:
+    """Extract (and optionally RAG-index) a batch of documents, committing per batch_size.
+
+    Text extraction runs on the thread pool; each batch's chunks are then
+    embedded together through the embedding cache.
+    """
+    update(job, status="running")
+    summary = {"extracted": 0, "indexed": 0, "chunks": 0, "failed": 0, "skipped": 0}
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        for i in range(0, len(doc_ids), batch_size):
+            docs = db.execute(select(Document).where(Document.doc_id.in_(doc_ids[i:i + batch_size]))).scalars().all()
+            extracted = []
+            for doc, text in zip(docs, pool.map(lambda d: _extract(d.path), docs)):
+                if text is None:
+                    doc.processing_status = "failed"
+                    summary["failed"] += 1
+                    continue
+                if not text:
+                    summary["skipped"] += 1
+                    continue
+                set_document_text(doc, text[:MAX_TEXT_CHARS])
+                index_document_fields(db, doc)
+                doc.processing_status = "extracted"
+                summary["extracted"] += 1
+                extracted.append(doc)
+            if index and extracted:
+                chunks = chunk_rows(db, [(doc.doc_id, doc.extracted_text) for doc in extracted])
+                if chunks:
+                    db.execute(insert(DocChunk), chunks)
+                for doc in extracted:
+                    doc.processing_status = "indexed"
+                summary["indexed"] += len(extracted)
+                summary["chunks"] += len(chunks)
+            db.commit()
+            if index and extracted:
+                versions.bump(db, "documents", "chunks")
+                vectorstore.index_rows(db, chunks)
+            else:
+                versions.bump(db, "documents")
+            update(job, progress=round(min(i + batch_size, len(doc_ids)) / len(doc_ids), 4))
+    append_event(db, actor="system", type="process_documents", payload={"job_id": job["job_id"], **summary})
+    update(job, status="completed", progress=1.0, finished_at=datetime.utcnow(), result=summary)
+    return summary
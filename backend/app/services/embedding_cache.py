@@ -0,0 +1,87 @@
+"""Persistent embedding cache keyed by (provider, model version, text hash).
+
+Re-indexing a document, or indexing identical boilerplate in another one,
+reuses stored vectors; only unseen texts reach the model.
+"""
+import hashlib
+from array import array
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+from ..models import EmbeddingCache
+from ..settings import settings
+from .embeddings import EmbeddingProvider, get_provider
+
+LOOKUP_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pack(vec: Sequence[float]) -> bytes:
+    return array("f", vec).tobytes()
+
+
+def unpack(blob: bytes) -> List[float]:
+    out = array("f")
+    out.frombytes(bytes(blob))
+    return out.tolist()
+
+
+def lookup(db: Session, provider: EmbeddingProvider, hashes: Sequence[str]) -> Dict[str, List[float]]:
+    found = {}
+    keys = sorted(set(hashes))
+    for i in range(0, len(keys), LOOKUP_BATCH):
+        rows = db.execute(
+            select(EmbeddingCache.text_hash, EmbeddingCache.vec).where(
+                EmbeddingCache.provider == provider.name,
+                EmbeddingCache.model_version == provider.model,
+                EmbeddingCache.text_hash.in_(keys[i:i + LOOKUP_BATCH]),
+            )
+        ).all()
+        found.update((h, unpack(v)) for h, v in rows)
+    return found
+
+
+def _insert_ignoring_duplicates(db: Session):
+    """INSERT that skips keys another worker cached concurrently"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(EmbeddingCache)
+    return dialect_insert(EmbeddingCache).on_conflict_do_nothing()
+
+
+def embed_cached(db: Session, texts: Sequence[str], provider: Optional[EmbeddingProvider] = None) -> List[List[float]]:
+    """Vectors for texts, computing only cache misses (in provider batches); caller commits"""
+    provider = provider or get_provider()
+    hashes = [text_hash(t) for t in texts]
+    vecs = lookup(db, provider, hashes)
+    missing = {}
+    for h, t in zip(hashes, texts):
+        if h not in vecs:
+            missing.setdefault(h, t)
+    if missing:
+        todo = list(missing.items())
+        step = max(1, settings.EMBEDDING_BATCH_SIZE)
+        rows = []
+        for i in range(0, len(todo), step):
+            part = todo[i:i + step]
+            for (h, _), v in zip(part, provider.embed_batch([t for _, t in part])):
+                blob = pack(v)
+                vecs[h] = unpack(blob)  # same float32 values a later cache hit returns
+                rows.append({"provider": provider.name, "model_version": provider.model, "text_hash": h, "dim": len(v), "vec": blob})
+        db.execute(_insert_ignoring_duplicates(db), rows)
+    return [vecs[h] for h in hashes]
+
+
+def stats(db: Session) -> List[dict]:
+    rows = db.execute(
+        select(EmbeddingCache.provider, EmbeddingCache.model_version, EmbeddingCache.dim, func.count())
+        .group_by(EmbeddingCache.provider, EmbeddingCache.model_version, EmbeddingCache.dim)
+    ).all()
+    return [{"provider": p, "model_version": m, "dim": d, "vectors": n} for p, m, d, n in rows]
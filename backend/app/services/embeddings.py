@@ -1,8 +1,13 @@
-import re, math, hashlib, json, uuid
-from typing import List
+import re, math, hashlib
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List, Optional, Sequence, Tuple
 
 DIM = 128
 TOKEN_RE = re.compile(r"[A-Za-z0-9_]+")
+WORD_RE = re.compile(r"\S+")
 
 
 def _tokenize(text: str) -> List[str]:
@@ -27,16 +32,129 @@ def embed(text: str) -> List[float]:
     return [x/norm for x in vec]
 
 
+class EmbeddingProvider(ABC):
+    """Turns texts into vectors; version identifies the vector space for caching and search"""
+
+    name = "base"
+    model = ""
+    dim = 0
+
+    @property
+    def version(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    @abstractmethod
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        ...
+
+    def close(self):
+        pass
+
+
+class HashedProvider(EmbeddingProvider):
+    """Hashed bag-of-words; no model, cheap enough to run inline"""
+
+    name = "hashed"
+    model = f"bow-{DIM}"
+    dim = DIM
+
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        return [embed(t) for t in texts]
+
+
+# State of the sentence-transformers worker process
+_st_model = None
+
+
+def _st_init(model: str, revision: Optional[str], threads: int):
+    global _st_model
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    from sentence_transformers import SentenceTransformer
+    _st_model = SentenceTransformer(model, revision=revision, device="cpu")
+
+
+def _st_dim() -> int:
+    return int(_st_model.get_sentence_embedding_dimension())
+
+
+def _st_encode(texts: List[str], batch_size: int) -> List[List[float]]:
+    vecs = _st_model.encode(texts, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True)
+    return vecs.astype("float32").tolist()
+
+
+class SentenceTransformerProvider(EmbeddingProvider):
+    """Local sentence-transformer model, run batched on CPU in a dedicated worker process.
+
+    Keeping torch out of the API process avoids its import cost and lets
+    inference run without holding the GIL of request-serving threads.
+    """
+
+    name = "sentence-transformers"
+
+    def __init__(self, model: str, revision: Optional[str] = None, batch_size: int = 64, threads: int = 0):
+        self.model = f"{model}@{revision}" if revision else model
+        self.batch_size = batch_size
+        self._pool = ProcessPoolExecutor(1, mp_context=get_context("spawn"), initializer=_st_init, initargs=(model, revision, threads))
+        try:
+            self.dim = self._pool.submit(_st_dim).result()
+        except Exception as e:
+            self._pool.shutdown(cancel_futures=True)
+            raise RuntimeError(f"Could not load embedding model {model}: {e}") from e
+
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._pool.submit(_st_encode, list(texts), self.batch_size).result()
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
+
+
+PROVIDERS = {"hashed": HashedProvider, "sentence-transformers": SentenceTransformerProvider}
+_provider: Optional[EmbeddingProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> EmbeddingProvider:
+    """The configured provider, created on first use"""
+    global _provider
+    if _provider is None:
+        from ..settings import settings
+        with _provider_lock:
+            if _provider is None:
+                name = settings.EMBEDDING_PROVIDER
+                if name not in PROVIDERS:
+                    raise ValueError(f"Unknown embedding provider: {name}")
+                if name == "hashed":
+                    _provider = HashedProvider()
+                else:
+                    _provider = PROVIDERS[name](
+                        settings.EMBEDDING_MODEL, settings.EMBEDDING_MODEL_REVISION,
+                        settings.EMBEDDING_BATCH_SIZE, settings.EMBEDDING_THREADS,
+                    )
+    return _provider
+
+
+def close_provider():
+    global _provider
+    with _provider_lock:
+        if _provider is not None:
+            _provider.close()
+            _provider = None
+
+
 def cosine(a: List[float], b: List[float]) -> float:
     return float(sum(x*y for x,y in zip(a,b)))
 
 
-def chunk(text: str, target=800, overlap=100) -> List[str]:
-    words = text.split()
-    chunks, i = [], 0
+def chunk_spans(text: str, target=800, overlap=100) -> List[Tuple[int, int]]:
+    """Character (start, end) offsets of overlapping windows of `target` words"""
+    words = [(m.start(), m.end()) for m in WORD_RE.finditer(text)]
+    spans, i = [], 0
     while i < len(words):
         piece = words[i:i+target]
-        if not piece: break
-        chunks.append(" ".join(piece))
+        spans.append((piece[0][0], piece[-1][1]))
         i += target - overlap
-    return chunks or ([text] if text else [])
\ No newline at end of file
+    return spans or ([(0, len(text))] if text else [])
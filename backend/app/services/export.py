@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Callable, Iterator, List
+from sqlalchemy import select
+from ..db import ReadSessionLocal
+from ..models import Loan, Document, ComplianceEvent, RiskAssessment
+
+BATCH_SIZE = 5000
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+# Large payload columns are left out of document exports, bookkeeping ones out of loans
+DATASETS = {
+    "loans": (Loan, [c.name for c in Loan.__table__.columns if c.name != "tape_hash"]),
+    "documents": (Document, [c.name for c in Document.__table__.columns if c.name not in ("text_z", "ai_analysis_z")]),
+    "compliance_events": (ComplianceEvent, [c.name for c in ComplianceEvent.__table__.columns]),
+    "risk_assessments": (RiskAssessment, [c.name for c in RiskAssessment.__table__.columns]),
+}
+
+
+def export_statement(dataset: str, where: Callable = None):
+    """Column-only select for a dataset, ordered by primary key"""
+    model, columns = DATASETS[dataset]
+    stmt = select(*[getattr(model, c) for c in columns])
+    if where is not None:
+        stmt = where(stmt)
+    pk = model.__table__.primary_key.columns[0]
+    return stmt.order_by(getattr(model, pk.name))
+
+
+def iter_batches(stmt, batch_size: int = BATCH_SIZE) -> Iterator[List[tuple]]:
+    """Server-side cursor over stmt; its own session so it outlives the request handler"""
+    db = ReadSessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        for part in result.partitions():
+            yield part
+    finally:
+        db.close()
+
+
+def _json_default(v):
+    """Same ISO format as the CSV writer; str() would drop the 'T' separator"""
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    return str(v)
+
+
+def _cell(v):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, (dict, list)):
+        return json.dumps(v)
+    return v
+
+
+def csv_chunks(batches, columns) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows([[_cell(v) for v in row] for row in batch])
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def ndjson_chunks(batches, columns) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(json.dumps(dict(zip(columns, row)), default=_json_default) + "\n" for row in batch).encode()
+
+
+def _arrow_schema(dataset: str):
+    import pyarrow as pa
+    from sqlalchemy import Boolean, Date, DateTime, Float, Integer
+
+    model, columns = DATASETS[dataset]
+    fields = []
+    for name in columns:
+        t = model.__table__.columns[name].type
+        if isinstance(t, Boolean):
+            at = pa.bool_()
+        elif isinstance(t, Integer):
+            at = pa.int64()
+        elif isinstance(t, Float):
+            at = pa.float64()
+        elif isinstance(t, DateTime):
+            at = pa.timestamp("us")
+        elif isinstance(t, Date):
+            at = pa.date32()
+        else:
+            at = pa.string()  # strings, text and JSON (serialized)
+        fields.append((name, at))
+    return pa.schema(fields)
+
+
+def parquet_chunks(batches, columns, dataset: str) -> Iterator[bytes]:
+    """One row group per batch, flushed as it is written"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(dataset)
+    sink = io.BytesIO()
+    writer = pq.ParquetWriter(sink, schema)
+    for batch in batches:
+        data = {}
+        for i, c in enumerate(columns):
+            values = [row[i] for row in batch]
+            if pa.types.is_string(schema.field(c).type):
+                values = [json.dumps(v) if isinstance(v, (dict, list)) else v for v in values]
+            data[c] = values
+        writer.write_table(pa.table(data, schema=schema))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    writer.close()
+    yield sink.getvalue()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    z = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def stream_export(dataset: str, fmt: str, where: Callable = None, gzip: bool = False) -> Iterator[bytes]:
+    """Encoded byte stream for a dataset export; memory is bounded by one batch"""
+    _, columns = DATASETS[dataset]
+    batches = iter_batches(export_statement(dataset, where))
+    if fmt == "parquet":
+        chunks = parquet_chunks(batches, columns, dataset)
+    else:
+        chunks = {"csv": csv_chunks, "ndjson": ndjson_chunks}[fmt](batches, columns)
+    return gzip_chunks(chunks) if gzip else chunks
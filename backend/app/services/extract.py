@@ -1,9 +1,10 @@
 import io
-from pdfminer.high_level import extract_text_to_fp
-from pdfminer.layout import LAParams
 
 def extract_pdf_text(file_obj):
     """Extract text from a PDF file object"""
+    # pdfminer is slow to import; load it on first extraction
+    from pdfminer.high_level import extract_text_to_fp
+    from pdfminer.layout import LAParams
     try:
         output = io.StringIO()
         extract_text_to_fp(file_obj, output, laparams=LAParams())
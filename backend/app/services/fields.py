@@ -0,0 +1,135 @@
+import re
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..models import Document
+from ..utils import versions
+
+# Bump when extractors change so stored indexes are rebuilt on next access
+EXTRACTOR_VERSION = "1"
+
+AMOUNT = r"\$?\s*([0-9][0-9,]*(?:\.[0-9]{2})?)"
+NAME = r"([A-Z][A-Za-z.'\-]*(?:[ \t]+[A-Z][A-Za-z.'\-]*){0,3})"
+
+# field -> [(pattern, confidence)], first capture group is the value
+EXTRACTORS = {
+    "case_number": [
+        (re.compile(r"(?i:case\s*(?:no\.?|number|#))\s*[:.]?\s*((?:\d{1,2}:)?\d{2}-(?:[a-z]{2,3}-)?\d{3,6})", re.I), 0.95),
+        (re.compile(r"\b(\d{1,2}:\d{2}-[a-z]{2,3}-\d{3,6})\b", re.I), 0.8),
+    ],
+    "debtor_name": [
+        (re.compile(r"(?i:debtor|borrower)(?:\(s\))?(?:[ \t]+(?i:name))?[ \t]*[:\-][ \t]*" + NAME), 0.9),
+        (re.compile(r"(?i:in\s+re:?)[ \t]+" + NAME), 0.75),
+    ],
+    "arrears": [
+        (re.compile(r"(?i:(?:total\s+)?(?:pre-?petition\s+)?arrear(?:age|s)?(?:\s+amount)?)\s*[:\-]?\s*" + AMOUNT), 0.9),
+        (re.compile(r"(?i:amount\s+(?:past\s+due|necessary\s+to\s+cure))\s*[:\-]?\s*" + AMOUNT), 0.8),
+    ],
+    "escrow_shortage": [
+        (re.compile(r"(?i:escrow\s+(?:shortage|deficiency)(?:\s+amount)?)\s*[:\-]?\s*" + AMOUNT), 0.9),
+    ],
+    "escrow_payment": [
+        (re.compile(r"(?i:(?:monthly\s+)?escrow\s+payment(?:\s+amount)?)\s*[:\-]?\s*" + AMOUNT), 0.85),
+    ],
+    "payment_history_ref": [
+        (re.compile(r"(?i:payment\s+history)[^\n]{0,40}?(?i:exhibit|attachment|schedule|ref(?:erence)?\.?)\s*[:#]?\s*([A-Z0-9][\w\-.]*)"), 0.85),
+        (re.compile(r"((?i:payment\s+history)[^\n]{0,60})"), 0.4),
+    ],
+}
+
+AMOUNT_FIELDS = {"arrears", "escrow_shortage", "escrow_payment"}
+
+
+def _value(field: str, raw: str):
+    raw = raw.strip()
+    if field in AMOUNT_FIELDS:
+        try:
+            return float(raw.replace(",", ""))
+        except ValueError:
+            return None
+    return raw
+
+
+def extract_fields(text: str) -> Dict[str, dict]:
+    """Run every extractor over text and keep the most confident match per field"""
+    found = {}
+    for field, patterns in EXTRACTORS.items():
+        for pattern, confidence in patterns:
+            m = pattern.search(text)
+            if not m:
+                continue
+            value = _value(field, m.group(1))
+            if value is None:
+                continue
+            found[field] = {
+                "value": value,
+                "text": m.group(1).strip(),
+                "start": m.start(1),
+                "end": m.end(1),
+                "confidence": confidence,
+            }
+            break
+    return found
+
+
+def is_current(index: Optional[dict], sha256: Optional[str]) -> bool:
+    return bool(index) and index.get("version") == EXTRACTOR_VERSION and index.get("sha256") == sha256
+
+
+def build_index(sha256: Optional[str], text: str) -> dict:
+    fields = extract_fields(text or "")
+    confidence = round(sum(f["confidence"] for f in fields.values()) / len(fields), 3) if fields else 0.0
+    return {"version": EXTRACTOR_VERSION, "sha256": sha256, "fields": fields, "confidence": confidence}
+
+
+def index_document_fields(db: Session, doc: Document) -> dict:
+    """Populate doc.extracted_fields once per document version (sha256); caller commits"""
+    if is_current(doc.extracted_fields, doc.sha256):
+        return doc.extracted_fields
+
+    # Identical uploads share a sha256, so reuse an index built for any of them
+    index = None
+    if doc.sha256:
+        for other in db.execute(
+            select(Document.extracted_fields).where(
+                Document.sha256 == doc.sha256,
+                Document.doc_id != doc.doc_id,
+                Document.extracted_fields.isnot(None),
+            )
+        ).scalars():
+            if is_current(other, doc.sha256):
+                index = other
+                break
+    if index is None:
+        index = build_index(doc.sha256, doc.extracted_text)
+
+    doc.extracted_fields = index
+    doc.confidence_score = index["confidence"]
+    return index
+
+
+def loan_fields(db: Session, loan_id: str) -> tuple[Dict[str, dict], int]:
+    """Merge the field indexes of a loan's documents, best confidence wins.
+
+    Returns (fields, number of documents with text). Documents whose index is
+    missing or stale are indexed on the way through and committed.
+    """
+    rows = db.execute(
+        select(Document.doc_id, Document.sha256, Document.extracted_fields)
+        .where(Document.loan_id == loan_id, Document.extracted_text.isnot(None))
+    ).all()
+
+    stale = [r.doc_id for r in rows if not is_current(r.extracted_fields, r.sha256)]
+    indexes: List[dict] = [r.extracted_fields for r in rows if r.doc_id not in stale]
+    if stale:
+        for doc in db.execute(select(Document).where(Document.doc_id.in_(stale))).scalars():
+            indexes.append(index_document_fields(db, doc))
+        db.commit()
+        versions.bump(db, "documents")
+
+    merged: Dict[str, dict] = {}
+    for index in indexes:
+        for field, hit in index.get("fields", {}).items():
+            if field not in merged or hit["confidence"] > merged[field]["confidence"]:
+                merged[field] = hit
+    return merged, len(rows)
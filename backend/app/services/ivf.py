@@ -0,0 +1,87 @@
+"""Inverted-file (IVF) index pieces for approximate vector search, in NumPy.
+
+A spherical k-means coarse quantizer splits the space into nlist cells; each
+vector is filed under its nearest centroid. A query scores only the rows in
+its nprobe best cells, trading recall for a scan of roughly nprobe/nlist of
+the corpus. Persistence and segment bookkeeping live in vectorstore.
+"""
+import math
+from typing import Optional
+import numpy as np
+
+# Rows x centroids scored at once during assignment (bounds the temporary matrix)
+ASSIGN_CELLS = 1 << 24
+
+
+def default_nlist(rows: int) -> int:
+    return int(min(65536, max(16, 4 * math.sqrt(max(rows, 1)))))
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by dot product) for every row, in batches"""
+    out = np.empty(len(x), dtype=np.int32)
+    step = max(1, ASSIGN_CELLS // max(len(centroids), 1))
+    for i in range(0, len(x), step):
+        out[i:i + step] = np.argmax(np.asarray(x[i:i + step], dtype=np.float32) @ centroids.T, axis=1)
+    return out
+
+
+def kmeans(x: np.ndarray, nlist: int, iters: int = 20, seed: int = 0) -> np.ndarray:
+    """Spherical k-means: unit-length centroids maximizing dot product with their rows"""
+    rng = np.random.default_rng(seed)
+    x = _normalize(np.asarray(x, dtype=np.float32))
+    nlist = min(nlist, len(x))
+    centroids = x[rng.choice(len(x), nlist, replace=False)].copy()
+    for _ in range(iters):
+        labels = assign(x, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=nlist)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.zeros_like(centroids)
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(x[order], starts[filled])
+        empty = np.flatnonzero(~filled)
+        if empty.size:
+            # Reseed empty cells with the rows their centroids fit worst
+            fit = np.einsum("ij,ij->i", x, centroids[labels])
+            sums[empty] = x[np.argsort(fit)[:empty.size]]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def train(x: np.ndarray, nlist: int = 0, sample: int = 64, iters: int = 15, seed: int = 0) -> np.ndarray:
+    """Centroids for x, fitted on at most `sample` rows per cell"""
+    nlist = nlist or default_nlist(len(x))
+    n = min(len(x), nlist * sample)
+    rows = np.sort(np.random.default_rng(seed).choice(len(x), n, replace=False)) if n < len(x) else slice(None)
+    return kmeans(np.asarray(x[rows]), nlist, iters, seed)
+
+
+def inverted_lists(labels: np.ndarray, nlist: int) -> np.ndarray:
+    """Offsets (nlist + 1) followed by row numbers grouped by cell, as one int64 array"""
+    order = np.argsort(labels, kind="stable")
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=nlist), out=offsets[1:])
+    return np.concatenate([offsets, order.astype(np.int64)])
+
+
+def probe(centroids: np.ndarray, q: np.ndarray, nprobe: int) -> np.ndarray:
+    scores = centroids @ q
+    if nprobe >= len(scores):
+        return np.arange(len(scores))
+    return np.argpartition(-scores, nprobe - 1)[:nprobe]
+
+
+def candidates(lists: np.ndarray, nlist: int, cells: np.ndarray) -> Optional[np.ndarray]:
+    """Sorted row numbers filed under the given cells"""
+    offsets = lists[:nlist + 1]
+    parts = [lists[nlist + 1 + offsets[c]:nlist + 1 + offsets[c + 1]] for c in cells]
+    if not parts:
+        return np.array([], dtype=np.int64)
+    return np.sort(np.concatenate(parts))
@@ -0,0 +1,349 @@
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..crud import ON_BOOK
+from ..models import Loan, Document
+from ..utils import versions
+
+NUMERIC = ("balance", "rate", "delinquency_days", "risk_score")
+CATEGORICAL = ("status", "geography", "servicer_id", "portfolio_id", "compliance_status")
+# Incremental refresh beyond this share of the table is slower than a rebuild
+REBUILD_FRACTION = 0.1
+
+
+class DictColumn:
+    """Dictionary-encoded string column: int32 codes into a list of distinct values"""
+
+    def __init__(self):
+        self.values: List[Optional[str]] = []
+        self.index: Dict[Optional[str], int] = {}
+        self.codes = np.zeros(0, np.int32)
+
+    def encode(self, values: Iterable[Optional[str]]) -> np.ndarray:
+        out = []
+        for v in values:
+            code = self.index.get(v)
+            if code is None:
+                code = self.index[v] = len(self.values)
+                self.values.append(v)
+            out.append(code)
+        return np.array(out, np.int32)
+
+    def code(self, value) -> int:
+        return self.index.get(value, -1)
+
+    def decode(self, i: int) -> Optional[str]:
+        return self.values[self.codes[i]]
+
+    def nbytes(self) -> int:
+        return self.codes.nbytes + sum(sys.getsizeof(v) for v in self.values)
+
+    def copy(self) -> "DictColumn":
+        c = DictColumn()
+        c.values, c.index, c.codes = list(self.values), dict(self.index), self.codes.copy()
+        return c
+
+
+def _f(x) -> float:
+    return np.nan if x is None else float(x)
+
+
+def _opt(x):
+    return None if np.isnan(x) else float(x)
+
+
+class LoanTape:
+    """Resident columnar snapshot of the loans on the book (removed loans are left out)"""
+
+    def __init__(self):
+        self.loan_id = np.zeros(0, object)
+        self.pos: Dict[str, int] = {}
+        self.num = {k: np.zeros(0) for k in NUMERIC}
+        self.cat = {k: DictColumn() for k in CATEGORICAL}
+        self.has_410a = np.zeros(0, bool)
+        self.alive = np.zeros(0, bool)
+        self._order = None
+
+    # -- loading -----------------------------------------------------------
+    @staticmethod
+    def _fetch(db: Session, loan_ids: Optional[List[str]] = None):
+        cols = [getattr(Loan, k) for k in NUMERIC + CATEGORICAL]
+        stmt = select(Loan.loan_id, *cols).where(ON_BOOK)
+        docs = select(Document.loan_id).where(Document.type == "410A", Document.loan_id.isnot(None))
+        if loan_ids is not None:
+            stmt = stmt.where(Loan.loan_id.in_(loan_ids))
+            docs = docs.where(Document.loan_id.in_(loan_ids))
+        return db.execute(stmt).all(), set(db.execute(docs.distinct()).scalars())
+
+    def load(self, db: Session):
+        rows, with_410a = self._fetch(db)
+        self.loan_id = np.array([r.loan_id for r in rows], object)
+        self.pos = {x: i for i, x in enumerate(self.loan_id)}
+        self.num = {k: np.array([_f(getattr(r, k)) for r in rows], float) for k in NUMERIC}
+        self.cat = {k: DictColumn() for k in CATEGORICAL}
+        for k in CATEGORICAL:
+            self.cat[k].codes = self.cat[k].encode(getattr(r, k) for r in rows)
+        self.has_410a = np.array([x in with_410a for x in self.loan_id], bool)
+        self.alive = np.ones(len(rows), bool)
+        self._order = None
+
+    def copy(self) -> "LoanTape":
+        """Independent copy to refresh while readers keep using this one"""
+        t = LoanTape()
+        t.loan_id, t.pos = self.loan_id.copy(), dict(self.pos)
+        t.num = {k: a.copy() for k, a in self.num.items()}
+        t.cat = {k: c.copy() for k, c in self.cat.items()}
+        t.has_410a, t.alive = self.has_410a.copy(), self.alive.copy()
+        return t
+
+    def upsert(self, db: Session, loan_ids: List[str]):
+        rows, with_410a = self._fetch(db, loan_ids)
+        seen = set()
+        new = []
+        for r in rows:
+            seen.add(r.loan_id)
+            i = self.pos.get(r.loan_id)
+            if i is None:
+                new.append(r)
+                continue
+            for k in NUMERIC:
+                self.num[k][i] = _f(getattr(r, k))
+            for k in CATEGORICAL:
+                self.cat[k].codes[i] = self.cat[k].encode([getattr(r, k)])[0]
+            self.has_410a[i] = r.loan_id in with_410a
+            self.alive[i] = True
+        for x in loan_ids:
+            if x not in seen and x in self.pos:
+                self.alive[self.pos[x]] = False
+        if new:
+            start = len(self.loan_id)
+            self.loan_id = np.concatenate([self.loan_id, np.array([r.loan_id for r in new], object)])
+            self.pos.update({r.loan_id: start + j for j, r in enumerate(new)})
+            for k in NUMERIC:
+                self.num[k] = np.concatenate([self.num[k], [_f(getattr(r, k)) for r in new]])
+            for k in CATEGORICAL:
+                c = self.cat[k]
+                c.codes = np.concatenate([c.codes, c.encode(getattr(r, k) for r in new)])
+            self.has_410a = np.concatenate([self.has_410a, [r.loan_id in with_410a for r in new]])
+            self.alive = np.concatenate([self.alive, np.ones(len(new), bool)])
+            self._order = None
+
+    def refresh_410a(self, db: Session):
+        """Re-read which loans have a 410A document (documents changed, loans did not)"""
+        docs = select(Document.loan_id).where(Document.type == "410A", Document.loan_id.isnot(None)).distinct()
+        with_410a = set(db.execute(docs).scalars())
+        self.has_410a = np.array([x in with_410a for x in self.loan_id], bool)
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def nbytes(self) -> int:
+        ids = self.loan_id.nbytes + sum(sys.getsizeof(x) for x in self.loan_id)
+        return (
+            ids
+            + sum(a.nbytes for a in self.num.values())
+            + sum(c.nbytes() for c in self.cat.values())
+            + self.has_410a.nbytes + self.alive.nbytes
+        )
+
+    # -- queries -----------------------------------------------------------
+    def order(self) -> np.ndarray:
+        """Row positions sorted by loan_id (what ORDER BY loan_id would return)"""
+        if self._order is None:
+            self._order = np.argsort(self.loan_id, kind="stable")
+        return self._order
+
+    def mask(self, status=None, delinquency_min=None, risk_min=None, portfolio_id=None) -> np.ndarray:
+        m = self.alive.copy()
+        if status:
+            m &= self.cat["status"].codes == self.cat["status"].code(status)
+        if delinquency_min is not None:
+            m &= self.num["delinquency_days"] >= delinquency_min  # NaN compares False
+        if risk_min is not None:
+            m &= self.num["risk_score"] >= risk_min
+        if portfolio_id:
+            m &= self.cat["portfolio_id"].codes == self.cat["portfolio_id"].code(portfolio_id)
+        return m
+
+    def page(self, m: np.ndarray, page: int, page_size: int) -> np.ndarray:
+        ordered = self.order()
+        hits = ordered[m[ordered]]
+        return hits[(page - 1) * page_size:(page - 1) * page_size + page_size]
+
+    def summary(self) -> dict:
+        m = self.alive
+        bal, rate = self.num["balance"][m], self.num["rate"][m]
+        rate = rate[~np.isnan(rate)]
+        return {
+            "total": int(m.sum()),
+            ">60dpd": int((self.num["delinquency_days"][m] > 60).sum()),
+            "missing_410A": int((~self.has_410a[m]).sum()),
+            "total_value": float(np.nansum(bal)),
+            "average_rate": float(rate.mean()) if rate.size else 0.0,
+            "high_risk_loans": int((self.num["risk_score"][m] > 0.7).sum()),
+        }
+
+    def analytics(self, portfolio_id: Optional[str] = None) -> dict:
+        m = self.mask(portfolio_id=portfolio_id)
+        n = int(m.sum())
+        if not n:
+            return {
+                "total_loans": 0, "total_value": 0.0, "weighted_average_rate": 0.0,
+                "average_delinquency": 0.0, "compliance_score": 0.0,
+                "risk_distribution": {}, "delinquency_distribution": {}, "geography_distribution": {},
+            }
+        bal = np.nan_to_num(self.num["balance"][m])
+        rate = np.nan_to_num(self.num["rate"][m])
+        dpd = np.nan_to_num(self.num["delinquency_days"][m])
+        risk = np.nan_to_num(self.num["risk_score"][m])
+        total_value = float(bal.sum())
+        compliant = self.cat["compliance_status"].codes[m] == self.cat["compliance_status"].code("compliant")
+
+        scored = risk[risk != 0]
+        risk_distribution = {
+            "low": int((scored < 0.3).sum()),
+            "moderate": int(((scored >= 0.3) & (scored < 0.6)).sum()),
+            "high": int(((scored >= 0.6) & (scored < 0.8)).sum()),
+            "critical": int((scored >= 0.8).sum()),
+        }
+        delinquency_distribution = {
+            "current": int((dpd == 0).sum()),
+            "30-60": int(((dpd != 0) & (dpd <= 60)).sum()),
+            "60-90": int(((dpd > 60) & (dpd <= 90)).sum()),
+            "90+": int((dpd > 90).sum()),
+        }
+        geo = self.cat["geography"]
+        counts = np.bincount(geo.codes[m], minlength=len(geo.values))
+        geography_distribution = {geo.values[c]: int(k) for c, k in enumerate(counts) if k and geo.values[c]}
+
+        return {
+            "total_loans": n,
+            "total_value": total_value,
+            "weighted_average_rate": float((bal * rate).sum() / total_value) if total_value > 0 else 0.0,
+            "average_delinquency": float(dpd.sum() / n),
+            "compliance_score": float(compliant.sum() / n),
+            "risk_distribution": risk_distribution,
+            "delinquency_distribution": delinquency_distribution,
+            "geography_distribution": geography_distribution,
+        }
+
+    def search_item(self, i: int) -> dict:
+        dpd = self.num["delinquency_days"][i]
+        return {
+            "loan_id": self.loan_id[i],
+            "status": self.cat["status"].decode(i),
+            "delinquency_days": None if np.isnan(dpd) else int(dpd),
+            "balance": _opt(self.num["balance"][i]),
+            "rate": _opt(self.num["rate"][i]),
+            "geography": self.cat["geography"].decode(i),
+            "servicer_id": self.cat["servicer_id"].decode(i),
+            "risk_score": _opt(self.num["risk_score"][i]),
+            "compliance_status": self.cat["compliance_status"].decode(i),
+            "missing_410A": not bool(self.has_410a[i]),
+            "portfolio_id": self.cat["portfolio_id"].decode(i),
+        }
+
+
+# Process-wide snapshot, keyed by the dataset versions it reflects. Writers in
+# this process record dirty loan ids; versions their bumps produced are "own",
+# so the tape can be patched with those ids. Any other step in the loans
+# version is another worker's write and forces a rebuild.
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_tape: Optional[LoanTape] = None
+_tape_key: Tuple[int, int] = (-1, -1)  # (loans, documents) versions the tape reflects
+_dirty: Optional[set] = set()   # None means "rebuild everything"
+_own_loans: Set[int] = set()
+_stats = {"hits": 0, "full_refreshes": 0, "incremental_refreshes": 0, "last_refresh_seconds": 0.0}
+
+
+def mark_changed(loan_ids: Optional[Iterable[str]] = None):
+    """Record a write to the loans table (all loans when loan_ids is None)"""
+    global _dirty
+    with _lock:
+        if loan_ids is None or _dirty is None:
+            _dirty = None
+            _own_loans.clear()  # the next refresh rebuilds whatever the versions say
+        else:
+            _dirty.update(x for x in loan_ids if x)
+
+
+def _own_bump(produced: Dict[str, int]):
+    # Without a resident tape the next refresh is a full load anyway, so a
+    # process with the cache off doesn't collect versions forever
+    if "loans" in produced and _tape is not None:
+        with _lock:
+            _own_loans.add(produced["loans"])
+
+
+versions.on_bump(_own_bump)
+
+
+def current(db: Session, enabled: bool) -> Optional[LoanTape]:
+    """The snapshot for the current dataset versions, or None when the cache is disabled.
+
+    A refresh builds a new tape (or patches a copy) outside _lock and swaps
+    it in, so mark_changed() never waits on the DB; _refresh_lock keeps
+    concurrent callers from loading the table twice.
+    """
+    global _tape, _tape_key, _dirty
+    if not enabled:
+        return None
+    seen = versions.read(db)
+    key = (seen.get("loans", 0), seen.get("documents", 0))
+    with _lock:
+        if _fresh(key):
+            _stats["hits"] += 1
+            return _tape
+    with _refresh_lock:
+        with _lock:
+            if _fresh(key):
+                _stats["hits"] += 1
+                return _tape
+            base, dirty, (loans, docs) = _tape, _dirty, _tape_key
+            foreign = key[0] < loans or not set(range(loans + 1, key[0] + 1)) <= _own_loans
+            _dirty = set()  # writes from here on are picked up by the next refresh
+        started = time.perf_counter()
+        rebuild = base is None or dirty is None or foreign or len(dirty) > REBUILD_FRACTION * max(len(base.loan_id), 1)
+        try:
+            if rebuild:
+                tape = LoanTape()
+                tape.load(db)
+            else:
+                tape = base.copy()
+                ids = list(dirty)
+                for i in range(0, len(ids), 5000):
+                    tape.upsert(db, ids[i:i + 5000])
+                if key[1] != docs:
+                    tape.refresh_410a(db)
+        except BaseException:
+            with _lock:
+                _dirty = None if dirty is None or _dirty is None else _dirty | dirty
+            raise
+        with _lock:
+            _tape, _tape_key = tape, key
+            _own_loans.difference_update([v for v in _own_loans if v <= key[0]])
+            _stats["full_refreshes" if rebuild else "incremental_refreshes"] += 1
+            _stats["last_refresh_seconds"] = round(time.perf_counter() - started, 4)
+        return tape
+
+
+def _fresh(key: Tuple[int, int]) -> bool:
+    return _tape is not None and _tape_key == key and _dirty == set()
+
+
+def stats(enabled: bool) -> dict:
+    with _lock:
+        return {
+            "enabled": enabled,
+            "loaded": _tape is not None,
+            "snapshot_versions": {"loans": _tape_key[0], "documents": _tape_key[1]},
+            "rows": len(_tape) if _tape is not None else 0,
+            "memory_bytes": _tape.nbytes() if _tape is not None else 0,
+            "pending_changes": None if _dirty is None else len(_dirty),
+            **_stats,
+        }
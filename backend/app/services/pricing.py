@@ -0,0 +1,178 @@
+import threading
+from collections import OrderedDict
+from dataclasses import astuple, replace
+from datetime import date
+from typing import Dict, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from ..crud import iter_loan_columns
+from ..models import Loan
+from ..utils import versions
+from .cashflow import Assumptions, loan_arrays, project, project_portfolio
+
+DEFAULT_CURVE = "0.25:0.05,30:0.05"
+CACHE_SIZE = 8
+METRICS = ("price", "yield", "wal", "modified_duration", "convexity")
+
+# Projected flows don't depend on the curve, so a curve move only re-discounts.
+# Keys start with the "loans" data version, so any worker's write retires them.
+_flow_cache: "OrderedDict[tuple, Dict[str, np.ndarray]]" = OrderedDict()
+_result_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def parse_curve(text: Optional[str]) -> Tuple[Tuple[float, float], ...]:
+    """Parse "tenor_years:zero_rate,..." into sorted (tenor, rate) pairs"""
+    points = []
+    for part in (text or DEFAULT_CURVE).split(","):
+        tenor, rate = part.split(":")
+        points.append((float(tenor), float(rate)))
+    if not points:
+        raise ValueError("Curve needs at least one point")
+    return tuple(sorted(points))
+
+
+def discount_factors(curve, periods: int, spread: float = 0.0) -> np.ndarray:
+    """Monthly-compounded discount factors off linearly interpolated zero rates"""
+    t = np.arange(1, periods + 1)
+    tenors, rates = zip(*curve)
+    z = np.interp(t / 12.0, tenors, rates) + spread
+    return (1.0 + z / 12.0) ** -t
+
+
+def price_yield(cf: np.ndarray, principal: np.ndarray, df: np.ndarray, iterations: int = 50, tol: float = 1e-10) -> Dict[str, np.ndarray]:
+    """Price, yield, WAL, modified duration and convexity for rows of cash flows.
+
+    Yields are solved for every row at once with vectorized Newton steps on
+    P(y) = sum CF_t (1 + y/12)^-t. Rows without cash flow come back as NaN.
+    """
+    cf = np.atleast_2d(cf)
+    principal = np.atleast_2d(principal)
+    t = np.arange(1, cf.shape[1] + 1, dtype=float)
+    price = cf @ df
+
+    y = np.full(cf.shape[0], 0.05)
+    for _ in range(iterations):
+        log_v = np.log1p(y / 12.0)
+        v = np.exp(-np.outer(log_v, t))
+        p = (cf * v).sum(axis=1)
+        dp = -((cf * v) @ t) / 12.0 / (1.0 + y / 12.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            delta = np.where(dp != 0, (p - price) / dp, 0.0)
+        y = np.clip(y - delta, -0.99, 10.0)
+        if np.nanmax(np.abs(delta), initial=0.0) < tol:
+            break
+
+    v = np.exp(-np.outer(np.log1p(y / 12.0), t))
+    pv = cf * v
+    p = pv.sum(axis=1)
+    g = 1.0 + y / 12.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mod_dur = (pv @ t) / 12.0 / g / p
+        convexity = (pv @ (t * (t + 1))) / 144.0 / g ** 2 / p
+        wal = (principal @ t) / 12.0 / principal.sum(axis=1)
+    empty = p <= 0
+    out = {"price": price, "yield": y, "wal": wal, "modified_duration": mod_dur, "convexity": convexity}
+    return {k: np.where(empty, np.nan, v) for k, v in out.items()}
+
+
+def _principal(flows: Dict[str, np.ndarray]) -> np.ndarray:
+    return flows["scheduled_principal"] + flows["prepayment"] + flows["recovery"]
+
+
+def _lookup(cache: OrderedDict, key):
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _remember(cache: OrderedDict, key, value):
+    with _cache_lock:
+        # Entries of older loan versions can never be hit again
+        for stale in [k for k in cache if k[0] != key[0]]:
+            del cache[stale]
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+    return value
+
+
+def _clean(x) -> Optional[float]:
+    x = float(x)
+    return None if np.isnan(x) else round(x, 6)
+
+
+def loan_page(result: dict, page: int, page_size: int) -> list:
+    """Slice one page of per-loan metrics out of a by_loan result"""
+    loans = result.get("loans")
+    if not loans:
+        return []
+    lo = (page - 1) * page_size
+    hi = min(lo + page_size, len(loans["loan_id"]))
+    return [
+        {"loan_id": loans["loan_id"][i], "balance": float(loans["balance"][i]), **{k: _clean(loans[k][i]) for k in METRICS}}
+        for i in range(lo, hi)
+    ]
+
+
+def portfolio_pricing(
+    db: Session,
+    curve,
+    a: Assumptions,
+    portfolio_id: Optional[str] = None,
+    spread: float = 0.0,
+    by_loan: bool = False,
+    chunk_size: int = 20_000,
+    workers: int = 1,
+    loan_chunk_size: int = 2_000,
+) -> dict:
+    """Portfolio (and optionally per-loan) pricing analytics, cached per key.
+
+    by_loan projects loan_chunk_size loans at a time; each chunk holds
+    loans x periods float arrays, so it is kept far below chunk_size.
+    """
+    if a.as_of is None:
+        a = replace(a, as_of=date.today())
+    flow_key = (versions.read(db).get("loans", 0), portfolio_id, astuple(a))
+    key = (*flow_key, curve, spread, by_loan)
+    result = _lookup(_result_cache, key)
+    if result is not None:
+        return result
+
+    flows = _lookup(_flow_cache, flow_key)
+    if flows is None:
+        flows = _remember(_flow_cache, flow_key, project_portfolio(db, a, portfolio_id, chunk_size, workers))
+
+    df = discount_factors(curve, a.periods, spread)
+    total = price_yield(flows["cash_flow"], _principal(flows), df)
+    balance = float(flows["balance"][0] + flows["scheduled_principal"][0] + flows["prepayment"][0] + flows["default"][0])
+    result = {
+        "portfolio_id": portfolio_id,
+        "total_balance": balance,
+        **{k: _clean(v[0]) for k, v in total.items()},
+        "price_pct": _clean(100.0 * total["price"][0] / balance) if balance else None,
+        "loans": None,
+    }
+
+    if by_loan:
+        # Kept columnar so a cached 1M-loan result stays compact; see loan_page
+        ids, balances, metrics = [], [], {k: [] for k in METRICS}
+        columns = [Loan.balance, Loan.rate, Loan.term, Loan.orig_date, Loan.delinquency_days]
+        for rows in iter_loan_columns(db, columns, loan_chunk_size, portfolio_id):
+            arrays = loan_arrays(rows, a.as_of)
+            lf = project(arrays, a, by_loan=True)
+            m = price_yield(lf["cash_flow"], _principal(lf), df)
+            ids.extend(r.loan_id for r in rows)
+            balances.append(arrays["balance"])
+            for k in METRICS:
+                metrics[k].append(m[k])
+        result["loans"] = {
+            "loan_id": ids,
+            "balance": np.concatenate(balances) if balances else np.zeros(0),
+            **{k: np.concatenate(v) if v else np.zeros(0) for k, v in metrics.items()},
+        }
+
+    return _remember(_result_cache, key, result)
@@ -0,0 +1,214 @@
+import asyncio
+import codecs
+import csv
+import json
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, List
+import numpy as np
+from sqlalchemy import select, insert, update
+from sqlalchemy.orm import Session
+from ..models import Loan, RiskAssessment
+from ..schemas import RiskBatchResult
+from . import loan_cache
+
+MAX_ERRORS = 100
+NUMERIC = ("risk_score", "default_probability", "yield_impact")
+JSON_FIELDS = ("risk_factors", "confidence_interval")
+
+
+def batch_format(content_type: str | None) -> str:
+    """Map a request content type onto json / ndjson / csv"""
+    ct = (content_type or "").split(";")[0].strip().lower()
+    if ct in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"):
+        return "ndjson"
+    if ct in ("text/csv", "application/csv"):
+        return "csv"
+    if ct in ("", "application/json"):
+        return "json"
+    raise ValueError(f"Unsupported content type: {content_type}")
+
+
+async def _lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buf = b""
+    async for part in stream:
+        buf += part
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="ignore") + "\n"
+    if buf:
+        yield buf.decode("utf-8", errors="ignore")
+
+
+async def _csv_rows(stream: AsyncIterator[bytes]) -> AsyncIterator[list]:
+    """CSV rows from a byte stream; quoted fields may span lines"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    text, record, quotes = "", [], 0
+    async for part in stream:
+        text += decoder.decode(part)
+        *lines, text = text.split("\n")
+        for line in lines:
+            record.append(line + "\n")
+            quotes += line.count('"')
+            # A newline ends the record only outside quotes ("" escapes keep the count even)
+            if quotes % 2 == 0:
+                yield next(csv.reader(record), [])
+                record, quotes = [], 0
+    text += decoder.decode(b"", final=True)
+    if text:
+        record.append(text)
+    if record:
+        yield next(csv.reader(record), [])
+
+
+def _csv_record(row: dict) -> dict:
+    rec = {k: (v if v != "" else None) for k, v in row.items() if k}
+    for k in JSON_FIELDS:
+        if isinstance(rec.get(k), str):
+            rec[k] = json.loads(rec[k])
+    return rec
+
+
+async def iter_records(stream: AsyncIterator[bytes], fmt: str) -> AsyncIterator[dict]:
+    """Yield raw assessment dicts from a request body without buffering NDJSON/CSV"""
+    if fmt == "json":
+        body = b"".join([part async for part in stream])
+        data = json.loads(body or b"[]")
+        if isinstance(data, dict):
+            data = data.get("assessments", [])
+        if not isinstance(data, list):
+            raise ValueError("Expected a JSON array of assessments")
+        for rec in data:
+            yield rec
+    elif fmt == "ndjson":
+        async for line in _lines(stream):
+            if line.strip():
+                yield json.loads(line)
+    else:
+        header = None
+        # Rows are parsed one by one so the body is never held in memory
+        async for row in _csv_rows(stream):
+            if header is None:
+                header = row
+                continue
+            if not any(f.strip() for f in row):
+                continue
+            yield _csv_record(dict(zip(header, row)))
+
+
+def _column(records: List[dict], key: str) -> np.ndarray:
+    out = np.full(len(records), np.nan)
+    for i, rec in enumerate(records):
+        v = rec.get(key) if isinstance(rec, dict) else None
+        if v is None:
+            continue
+        try:
+            out[i] = float(v)
+        except (TypeError, ValueError):
+            out[i] = np.inf  # flagged as invalid below
+    return out
+
+
+def validate_chunk(records: List[dict], offset: int = 0) -> tuple[List[dict], List[str]]:
+    """Validate a chunk column-wise; returns (clean rows, error messages)"""
+    ids = np.array([str(r.get("loan_id") or "") if isinstance(r, dict) else "" for r in records], dtype=object)
+    cols = {k: _column(records, k) for k in NUMERIC}
+
+    risk, pd_, yi = cols["risk_score"], cols["default_probability"], cols["yield_impact"]
+    ok = ids != ""
+    ok &= np.isfinite(risk) & (risk >= 0) & (risk <= 1)
+    ok &= np.isnan(pd_) | ((pd_ >= 0) & (pd_ <= 1))
+    ok &= np.isnan(yi) | np.isfinite(yi)
+
+    errors = [f"row {offset + i}: invalid assessment for loan_id={ids[i] or '?'}" for i in np.flatnonzero(~ok)]
+    rows = []
+    for i in np.flatnonzero(ok):
+        rec = records[i]
+        rows.append({
+            "loan_id": ids[i],
+            "risk_score": float(risk[i]),
+            "default_probability": None if np.isnan(pd_[i]) else float(pd_[i]),
+            "yield_impact": None if np.isnan(yi[i]) else float(yi[i]),
+            "risk_factors": rec.get("risk_factors"),
+            "model_version": rec.get("model_version"),
+            "confidence_interval": rec.get("confidence_interval"),
+        })
+    return rows, errors
+
+
+class BatchAborted(ValueError):
+    """A batch stopped part way; `result` counts what the committed chunks wrote"""
+
+    def __init__(self, message: str, result: RiskBatchResult):
+        super().__init__(message)
+        self.result = result
+
+
+def write_chunk(db: Session, rows: List[dict], now: datetime | None = None) -> tuple[int, List[str]]:
+    """Bulk insert RiskAssessment rows and bulk update their loans in one transaction"""
+    if not rows:
+        return 0, []
+    now = now or datetime.utcnow()
+    ids = {r["loan_id"] for r in rows}
+    existing = set(db.execute(select(Loan.loan_id).where(Loan.loan_id.in_(ids))).scalars())
+    missing = sorted(ids - existing)
+    rows = [r for r in rows if r["loan_id"] in existing]
+    if rows:
+        db.execute(insert(RiskAssessment), [
+            {"assessment_id": str(uuid.uuid4()), "assessment_date": now, **r} for r in rows
+        ])
+        db.execute(update(Loan), [
+            {
+                "loan_id": r["loan_id"],
+                "risk_score": r["risk_score"],
+                "default_probability": r["default_probability"],
+                "yield_impact": r["yield_impact"],
+                "last_risk_assessment": now,
+            } for r in rows
+        ])
+    db.commit()
+    loan_cache.mark_changed(r["loan_id"] for r in rows)
+    return len(rows), missing
+
+
+def _flush(db: Session, buf: List[dict], offset: int):
+    rows, errors = validate_chunk(buf, offset)
+    written, missing = write_chunk(db, rows)
+    return len(buf), written, missing, errors
+
+
+async def write_assessment_stream(db: Session, stream: AsyncIterator[bytes], fmt: str, chunk_size: int) -> RiskBatchResult:
+    """Consume an assessment stream in chunked transactions on a sync session.
+
+    Each chunk commits on its own, so a parse error part way through leaves
+    the earlier chunks written: it raises BatchAborted carrying the result so
+    far, and the caller reports how many landed.
+    """
+    result = RiskBatchResult(received=0, written=0, rejected=0, missing_loans=0, chunks=0, errors=[])
+    buf: List[dict] = []
+
+    async def flush():
+        # Validation and the DB round trips run on a worker thread
+        received, written, missing, errors = await asyncio.to_thread(_flush, db, list(buf), result.received)
+        result.received += received
+        result.written += written
+        result.missing_loans += len(missing)
+        result.rejected += len(errors) + len(missing)
+        result.chunks += 1
+        room = MAX_ERRORS - len(result.errors)
+        if room > 0:
+            result.errors.extend((errors + [f"loan not found: {x}" for x in missing])[:room])
+        buf.clear()
+
+    try:
+        async for rec in iter_records(stream, fmt):
+            buf.append(rec)
+            if len(buf) >= chunk_size:
+                await flush()
+    except (json.JSONDecodeError, csv.Error) as e:
+        raise BatchAborted(f"Failed to parse assessments: {str(e)}", result)
+    except ValueError as e:
+        raise BatchAborted(str(e), result)
+    if buf:
+        await flush()
+    return result
@@ -0,0 +1,151 @@
+"""Daily per-portfolio analytics snapshots for trend charts.
+
+take() aggregates the loan tape in one GROUP BY and stores a narrow row per
+portfolio (plus "*" for the whole book) for the day, replacing any earlier
+snapshot of that day. Loans keep no history, so the series starts with the
+first snapshot; history() reads it back, optionally downsampled to the last
+snapshot of each week or month.
+
+    python -m app.services.snapshots take [--as-of 2026-10-01]
+"""
+import argparse
+import asyncio
+import json
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.orm import Session
+from ..crud import ON_BOOK
+from ..db import run_in_session
+from ..models import Loan, PortfolioSnapshot
+from ..utils import versions
+from ..utils.ledger import append_event
+
+logger = logging.getLogger("app.snapshots")
+
+BOOK = "*"
+RISK_BUCKETS = {"low": "risk_low", "moderate": "risk_moderate", "high": "risk_high", "critical": "risk_critical"}
+DPD_BUCKETS = {"current": "dpd_current", "30-60": "dpd_30_60", "60-90": "dpd_60_90", "90+": "dpd_90_plus"}
+TOTALS = ("loans", "balance", "balance_rate", "dpd", "compliant", *RISK_BUCKETS.values(), *DPD_BUCKETS.values())
+
+
+def _count(cond):
+    return func.sum(case((cond, 1), else_=0))
+
+
+def _sums(db: Session) -> Dict[Optional[str], dict]:
+    """Additive per-portfolio totals, bucketed like the live analytics endpoint"""
+    balance = func.coalesce(Loan.balance, 0.0)
+    dpd = func.coalesce(Loan.delinquency_days, 0)
+    risk = Loan.risk_score
+    stmt = select(
+        Loan.portfolio_id,
+        func.count().label("loans"),
+        func.sum(balance).label("balance"),
+        func.sum(balance * func.coalesce(Loan.rate, 0.0)).label("balance_rate"),
+        func.sum(dpd).label("dpd"),
+        _count(Loan.compliance_status == "compliant").label("compliant"),
+        # Unscored (NULL or 0) loans fall in no risk bucket
+        _count((risk != 0) & (risk < 0.3)).label("risk_low"),
+        _count((risk >= 0.3) & (risk < 0.6)).label("risk_moderate"),
+        _count((risk >= 0.6) & (risk < 0.8)).label("risk_high"),
+        _count(risk >= 0.8).label("risk_critical"),
+        _count(dpd == 0).label("dpd_current"),
+        _count((dpd != 0) & (dpd <= 60)).label("dpd_30_60"),
+        _count((dpd > 60) & (dpd <= 90)).label("dpd_60_90"),
+        _count(dpd > 90).label("dpd_90_plus"),
+    ).where(ON_BOOK).group_by(Loan.portfolio_id)
+    return {r.portfolio_id: {k: v or 0 for k, v in r._mapping.items() if k != "portfolio_id"} for r in db.execute(stmt)}
+
+
+def _row(portfolio_id: str, as_of: date, s: dict) -> dict:
+    n = s["loans"]
+    return {
+        "portfolio_id": portfolio_id,
+        "as_of": as_of,
+        "total_loans": n,
+        "total_value": float(s["balance"]),
+        "weighted_average_rate": s["balance_rate"] / s["balance"] if s["balance"] > 0 else 0.0,
+        "average_delinquency": s["dpd"] / n if n else 0.0,
+        "compliance_score": s["compliant"] / n if n else 0.0,
+        **{c: int(s[c]) for c in (*RISK_BUCKETS.values(), *DPD_BUCKETS.values())},
+    }
+
+
+def take(db: Session, as_of: date = None) -> dict:
+    """Snapshot every portfolio and the whole book for as_of (default today, UTC); commits"""
+    as_of = as_of or datetime.utcnow().date()
+    sums = _sums(db)
+    book = {k: sum(s[k] for s in sums.values()) for k in TOTALS}
+    rows = [_row(BOOK, as_of, book)]
+    rows += [_row(pid, as_of, s) for pid, s in sums.items() if pid is not None]
+    db.execute(delete(PortfolioSnapshot).where(PortfolioSnapshot.as_of == as_of))
+    db.execute(insert(PortfolioSnapshot), rows)
+    db.commit()
+    versions.bump(db, "snapshots")
+    res = {"as_of": as_of.isoformat(), "portfolios": len(rows) - 1, "total_loans": rows[0]["total_loans"]}
+    append_event(db, actor="system", type="portfolio_snapshot", payload=res)
+    return res
+
+
+def taken(db: Session, as_of: date = None) -> bool:
+    as_of = as_of or datetime.utcnow().date()
+    return db.scalar(select(PortfolioSnapshot.as_of).where(
+        (PortfolioSnapshot.portfolio_id == BOOK) & (PortfolioSnapshot.as_of == as_of)
+    )) is not None
+
+
+async def run_daily(check_seconds: float):
+    """Take today's snapshot whenever it is missing; runs for the life of the app"""
+    while True:
+        try:
+            if not await run_in_session(taken, read_only=True):
+                logger.info("portfolio snapshot taken: %s", await run_in_session(take))
+        except Exception:
+            logger.exception("portfolio snapshot failed")
+        await asyncio.sleep(check_seconds)
+
+
+def _period(d: date, interval: str) -> date:
+    if interval == "week":
+        return d - timedelta(days=d.weekday())
+    if interval == "month":
+        return d.replace(day=1)
+    return d
+
+
+def history(rows, interval: str = "day") -> List[dict]:
+    """Snapshot column rows (ordered by as_of) as response points, keeping the last one per period"""
+    last = {}
+    for r in rows:
+        last[_period(r.as_of, interval)] = r
+    points = []
+    for period, r in last.items():
+        m = r._mapping
+        points.append({
+            "period": period.isoformat(),
+            "as_of": m["as_of"].isoformat(),
+            "total_loans": m["total_loans"],
+            "total_value": m["total_value"],
+            "weighted_average_rate": m["weighted_average_rate"],
+            "average_delinquency": m["average_delinquency"],
+            "compliance_score": m["compliance_score"],
+            "risk_distribution": {k: m[c] for k, c in RISK_BUCKETS.items()},
+            "delinquency_distribution": {k: m[c] for k, c in DPD_BUCKETS.items()},
+        })
+    return points
+
+
+if __name__ == "__main__":
+    from ..db import SessionLocal
+
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("command", choices=["take"])
+    p.add_argument("--as-of", type=date.fromisoformat, help="snapshot date label (default: today, UTC)")
+    args = p.parse_args()
+    session = SessionLocal()
+    try:
+        print(json.dumps(take(session, args.as_of), indent=2))
+    finally:
+        session.close()
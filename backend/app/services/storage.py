@@ -2,23 +2,38 @@ import os
 import hashlib
 import uuid
 from pathlib import Path
+from ..settings import settings
+
+COPY_BLOCK = 1024 * 1024
+
+def save_stream(src, suffix: str = ".pdf", max_bytes: int | None = None):
+    """Copy a file-like object into upload storage block by block, hashing as it goes.
+
+    Returns (path, sha256, size) without holding the whole file in memory.
+    Past max_bytes the copy stops with ValueError; a failed copy leaves no file.
+    """
+    upload_dir = Path(settings.UPLOAD_DIR)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    file_path = upload_dir / f"{uuid.uuid4()}{suffix}"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(file_path, "wb") as f:
+            while True:
+                block = src.read(COPY_BLOCK)
+                if not block:
+                    break
+                size += len(block)
+                if max_bytes is not None and size > max_bytes:
+                    raise ValueError(f"File is larger than {max_bytes} bytes")
+                digest.update(block)
+                f.write(block)
+    except BaseException:
+        file_path.unlink(missing_ok=True)
+        raise
+    return str(file_path), digest.hexdigest(), size
 
 def save_upload(file_obj, content_type):
     """Save uploaded file and return path and SHA256 hash"""
-    # Create uploads directory if it doesn't exist
-    upload_dir = Path("uploads")
-    upload_dir.mkdir(exist_ok=True)
-    
-    # Generate unique filename
-    filename = f"{uuid.uuid4()}.pdf"  # Assuming PDF for now
-    file_path = upload_dir / filename
-    
-    # Save file
-    with open(file_path, "wb") as f:
-        content = file_obj.read()
-        f.write(content)
-    
-    # Calculate SHA256 hash
-    sha256 = hashlib.sha256(content).hexdigest()
-    
-    return str(file_path), sha256
\ No newline at end of file
+    path, sha256, _ = save_stream(file_obj)  # Assuming PDF for now
+    return path, sha256
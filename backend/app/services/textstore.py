@@ -0,0 +1,182 @@
+"""Compressed document text: dictionary training, recompression and lookups.
+
+    python -m app.services.textstore stats
+    python -m app.services.textstore train --samples 2000
+    python -m app.services.textstore recompress
+"""
+import argparse
+import json
+import uuid
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from ..crud import PREVIEW_CHARS
+from ..models import Document, DocChunk, TextDictionary
+from ..settings import settings
+from ..utils import compression
+from .embedding_cache import embed_cached
+from .embeddings import chunk_spans, get_provider
+
+
+def train(db: Session, samples: int = 2000, size: int = 64 * 1024, codec: Optional[int] = None) -> Optional[int]:
+    """Train a shared dictionary on a sample of stored texts; it becomes the active one"""
+    codec = compression.preferred_codec() if codec is None else codec
+    if codec == compression.CODEC_RAW:
+        return None
+    texts = db.execute(
+        select(Document.extracted_text).where(Document.text_length > 0).order_by(func.random()).limit(samples)
+    ).scalars().all()
+    if len(texts) < 10:
+        return None
+    try:
+        data = compression.train_dictionary(list(texts), codec, size)
+    except Exception:  # zstd refuses sample sets too small to learn from
+        return None
+    if not data:
+        return None
+    dict_id = (db.scalar(select(func.max(TextDictionary.dict_id))) or 0) + 1
+    db.add(TextDictionary(dict_id=dict_id, codec=codec, data=data, sample_docs=len(texts)))
+    db.commit()
+    compression.register_dictionary(dict_id, codec, data)
+    return dict_id
+
+
+def recompress(db: Session, batch_size: int = 200) -> int:
+    """Re-encode every stored document text with the current codec and dictionary"""
+    done, last = 0, ""
+    while True:
+        rows = db.execute(
+            select(Document.doc_id, Document.extracted_text, Document.ai_analysis)
+            .where(Document.doc_id > last).order_by(Document.doc_id).limit(batch_size)
+        ).all()
+        if not rows:
+            return done
+        db.execute(update(Document), [{"doc_id": r.doc_id, "extracted_text": r.extracted_text, "ai_analysis": r.ai_analysis} for r in rows])
+        db.commit()
+        done += len(rows)
+        last = rows[-1].doc_id
+
+
+def stats(db: Session) -> dict:
+    raw = db.scalar(select(func.coalesce(func.sum(Document.text_length), 0)))
+    stored = db.scalar(select(func.coalesce(func.sum(func.length(Document.__table__.c.text_z)), 0)))
+    chunk_bytes = db.scalar(select(func.coalesce(func.sum(func.length(DocChunk.__table__.c.text_z)), 0)))
+    return {
+        "documents": db.scalar(select(func.count(Document.doc_id))),
+        "text_chars": int(raw),
+        "text_stored_bytes": int(stored),
+        "ratio": round(raw / stored, 2) if stored else None,
+        "chunk_text_stored_bytes": int(chunk_bytes),
+        "codec": {v: k for k, v in compression.CODECS.items()}[compression.preferred_codec()],
+        "dictionaries": db.scalar(select(func.count(TextDictionary.dict_id))),
+    }
+
+
+def chunk_rows(db: Session, docs: List[Tuple[str, str]]) -> List[dict]:
+    """DocChunk rows (offsets plus embedding) for (doc_id, text) pairs, ready for a bulk insert.
+
+    All chunks are embedded in one cached batch, tagged with the provider's
+    vector space. Cache entries are added to db; the caller commits.
+    """
+    provider = get_provider()
+    spans = [(doc_id, text, a, b) for doc_id, text in docs for a, b in chunk_spans(text)]
+    vecs = embed_cached(db, [text[a:b] for _, text, a, b in spans], provider)
+    rows, ords = [], {}
+    for (doc_id, text, a, b), v in zip(spans, vecs):
+        i = ords[doc_id] = ords.get(doc_id, -1) + 1
+        rows.append({
+            "chunk_id": str(uuid.uuid4()),
+            "doc_id": doc_id,
+            "ord": i,
+            "text": text[a:b] if settings.CHUNK_TEXT_COPY else None,
+            "start_char": a,
+            "end_char": b,
+            "vec": v,
+            "embedding_model": provider.version,
+            "dim": len(v),
+        })
+    return rows
+
+
+def embed_chunks(db: Session, docs: List[Tuple[str, str]]) -> List[dict]:
+    """chunk_rows() that commits the new cache entries itself (for run_in_session callers)"""
+    rows = chunk_rows(db, docs)
+    db.commit()
+    return rows
+
+
+def chunk_texts(db: Session, chunks: List) -> Dict[str, str]:
+    """Text for the given chunk rows (chunk_id, doc_id, start_char, end_char).
+
+    Copied chunk text is used when present; otherwise each parent document is
+    decompressed once and sliced.
+    """
+    ids = [c.chunk_id for c in chunks]
+    copies = dict(db.execute(select(DocChunk.chunk_id, DocChunk.text).where(DocChunk.chunk_id.in_(ids), DocChunk.text.isnot(None))).all())
+    need = {c.doc_id for c in chunks if c.chunk_id not in copies}
+    parents = dict(db.execute(select(Document.doc_id, Document.extracted_text).where(Document.doc_id.in_(need))).all()) if need else {}
+    out = {}
+    for c in chunks:
+        if c.chunk_id in copies:
+            out[c.chunk_id] = copies[c.chunk_id]
+        else:
+            out[c.chunk_id] = (parents.get(c.doc_id) or "")[c.start_char:c.end_char]
+    return out
+
+
+def search_text(db: Session, q: str, limit: int, scan_limit: Optional[int] = None, batch_size: int = 50) -> List[dict]:
+    """Case-insensitive substring search over document text (the LIKE fallback).
+
+    Previews are a plain column, so those matches come from SQL. Everything
+    else is compressed and is decompressed here: texts longer than their
+    preview, then copied chunk text, at most `scan_limit` rows in all
+    (TEXT_SEARCH_SCAN_LIMIT), so a query with no hits cannot read the whole
+    store.
+    """
+    scan_limit = settings.TEXT_SEARCH_SCAN_LIMIT if scan_limit is None else scan_limit
+    like = "%" + q.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    found = list(db.scalars(
+        select(Document.doc_id).where(func.lower(Document.text_preview).like(like, escape="\\"))
+        .order_by(Document.doc_id).limit(limit)
+    ))
+    hits = {}
+    if found:
+        hits = {doc_id: text[:500] for doc_id, text in db.execute(select(Document.doc_id, Document.extracted_text).where(Document.doc_id.in_(found)))}
+    needle = q.lower()
+    scans = (
+        select(Document.doc_id, Document.extracted_text)
+        .where(Document.text_length > PREVIEW_CHARS, Document.doc_id.notin_(found)).order_by(Document.doc_id),
+        select(DocChunk.doc_id, DocChunk.text)
+        .where(DocChunk.text.isnot(None), DocChunk.doc_id.notin_(found)).order_by(DocChunk.doc_id, DocChunk.ord),
+    )
+    for stmt in scans:
+        if len(hits) >= limit or scan_limit <= 0:
+            break
+        with db.execute(stmt.limit(scan_limit).execution_options(yield_per=batch_size)) as result:
+            for doc_id, text in result:
+                scan_limit -= 1
+                if doc_id not in hits and needle in text.lower():
+                    hits[doc_id] = text[:500]
+                    if len(hits) >= limit:
+                        break
+    return [{"doc_id": doc_id, "text": text} for doc_id, text in sorted(hits.items())][:limit]
+
+
+if __name__ == "__main__":
+    from ..db import SessionLocal
+
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("command", choices=["stats", "train", "recompress"])
+    p.add_argument("--samples", type=int, default=2000)
+    p.add_argument("--size", type=int, default=64 * 1024, help="dictionary size in bytes (zlib caps at 32 KiB)")
+    args = p.parse_args()
+    session = SessionLocal()
+    try:
+        if args.command == "train":
+            print(json.dumps({"dict_id": train(session, args.samples, args.size)}))
+        elif args.command == "recompress":
+            print(json.dumps({"documents": recompress(session)}))
+        else:
+            print(json.dumps(stats(session), indent=2))
+    finally:
+        session.close()
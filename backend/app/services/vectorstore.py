@@ -0,0 +1,644 @@
+"""Memory-mapped, segment-based vector store for RAG chunks.
+
+Each vector space (embedding model version) gets a directory under
+VECTOR_STORE_DIR holding:
+
+    manifest.json         live segments, next segment id, synced flag
+    seg-000001.vec.npy    float32 (rows, dim) matrix
+    seg-000001.meta.npy   chunk_id / doc_id / loan_id / doc_type sidecar
+    tombstones            chunk ids deleted since their segment was written
+
+Segments are immutable and append-only; rag_index writes a new one and
+tombstones the chunks it replaced. Small segments are merged in the
+background, dropping tombstoned rows. Files are opened with mmap, so cold
+start reads only the manifest and resident memory is left to the page
+cache. Large stores are searched segment-by-segment on a process pool.
+
+Once a space reaches VECTOR_IVF_MIN_ROWS an IVF index (see ivf.py) is
+trained in the background: centroids plus per-segment inverted lists, kept
+current as segments are added or merged. Queries then scan only the nprobe
+cells nearest to the query; nprobe=0 forces an exact scan.
+
+doc_chunks stays the source of truth; `python -m app.services.vectorstore
+rebuild` recreates a space from it, and a space is only used for queries
+once it is marked synced (by a rebuild, or by being written from empty).
+"""
+import argparse
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from ..models import DocChunk, Document
+from ..settings import settings
+from . import ivf
+
+logger = logging.getLogger("app.vectorstore")
+
+REBUILD_BATCH = 20_000
+TRAIN_SAMPLE = 64  # k-means rows per IVF cell
+Hit = Tuple[float, str, str]  # (score, chunk_id, doc_id)
+
+
+def space_dir(version: str) -> str:
+    return os.path.join(settings.VECTOR_STORE_DIR, re.sub(r"[^A-Za-z0-9_.-]+", "_", version))
+
+
+@contextmanager
+def _locked(path: str):
+    """Exclusive lock for manifest/tombstone writers across processes"""
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "LOCK"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write_json(path: str, data: dict):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def read_manifest(path: str) -> dict:
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"segments": [], "next_id": 1, "synced": False, "dim": None}
+
+
+# Per-process caches of mapped files, tombstone masks and IVF centroids
+_maps: Dict[str, tuple] = {}
+_masks: Dict[str, tuple] = {}
+_tombstones: Dict[str, tuple] = {}
+_centroids: Dict[str, np.ndarray] = {}
+
+
+def _mapped(file: str) -> np.ndarray:
+    # Keyed by inode too, so a rebuilt space reusing a file name is remapped
+    ino = os.stat(file).st_ino
+    cached = _maps.get(file)
+    if cached is None or cached[0] != ino:
+        # Unmap files a merge has deleted so their disk space is released
+        for old in [f for f in _maps if not os.path.exists(f)]:
+            _maps.pop(old, None)
+            _masks.pop(old[:-len(".vec.npy")], None)
+        cached = _maps[file] = (ino, np.load(file, mmap_mode="r"))
+    return cached[1]
+
+
+def _open_segment(seg_path: str):
+    return _mapped(seg_path + ".vec.npy"), _mapped(seg_path + ".meta.npy")
+
+
+def _lists_file(path: str, name: str, gen: int) -> str:
+    return os.path.join(path, f"{name}.ivf-{gen}.npy")
+
+
+def _centroids_file(path: str, gen: int) -> str:
+    return os.path.join(path, f"ivf-{gen}.centroids.npy")
+
+
+def _load_centroids(path: str, gen: int) -> np.ndarray:
+    file = _centroids_file(path, gen)
+    if file not in _centroids:
+        _centroids[file] = np.load(file)
+    return _centroids[file]
+
+
+def _tombstone_ids(path: str) -> Tuple[tuple, np.ndarray]:
+    """(file version, sorted ids) of the space's tombstones, re-read when the file changes"""
+    file = os.path.join(path, "tombstones")
+    try:
+        st = os.stat(file)
+    except FileNotFoundError:
+        return (), np.array([], dtype="S1")
+    version = (st.st_size, st.st_mtime_ns, st.st_ino)
+    cached = _tombstones.get(path)
+    if cached and cached[0] == version:
+        return cached
+    with open(file, "rb") as f:
+        ids = np.unique(np.array(f.read().split(), dtype=bytes))
+    _tombstones[path] = (version, ids)
+    return _tombstones[path]
+
+
+def _dead_mask(path: str, seg_path: str, meta) -> Optional[np.ndarray]:
+    version, ids = _tombstone_ids(path)
+    if not ids.size:
+        return None
+    cached = _masks.get(seg_path)
+    if cached and cached[0] == version:
+        return cached[1]
+    mask = np.isin(meta["chunk_id"], ids)
+    _masks[seg_path] = (version, mask if mask.any() else None)
+    return _masks[seg_path][1]
+
+
+def _search_segment(path: str, name: str, q: np.ndarray, k: int, loan_id: Optional[str], doc_type: Optional[str],
+                    cells: Optional[tuple] = None) -> List[Hit]:
+    """Top-k of one segment; cells = (gen, nlist, probed cell ids) limits the scan to those IVF lists"""
+    seg_path = os.path.join(path, name)
+    mat, seg_meta = _open_segment(seg_path)
+    meta = seg_meta
+    if cells is None:
+        rows = None
+        scores = mat @ q
+    else:
+        gen, nlist, probed = cells
+        rows = ivf.candidates(_mapped(_lists_file(path, name, gen)), nlist, probed)
+        scores = mat[rows] @ q
+        meta = seg_meta[rows]
+    keep = np.ones(len(scores), dtype=bool)
+    if loan_id is not None:
+        keep &= meta["loan_id"] == loan_id.encode()
+    if doc_type is not None:
+        keep &= meta["doc_type"] == doc_type.encode()
+    dead = _dead_mask(path, seg_path, seg_meta)
+    if dead is not None:
+        keep &= ~(dead if rows is None else dead[rows])
+    idx = np.flatnonzero(keep)
+    if not idx.size:
+        return []
+    if idx.size > k:
+        idx = idx[np.argpartition(-scores[idx], k - 1)[:k]]
+    return [(float(scores[i]), meta["chunk_id"][i].decode(), meta["doc_id"][i].decode()) for i in idx]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _search_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = settings.VECTOR_SEARCH_WORKERS or os.cpu_count() or 1
+                _pool = ProcessPoolExecutor(workers, mp_context=get_context("spawn"))
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def is_synced(version: str) -> bool:
+    return bool(read_manifest(space_dir(version)).get("synced"))
+
+
+def search(version: str, query: Sequence[float], k: int, loan_id: Optional[str] = None, doc_type: Optional[str] = None,
+           nprobe: Optional[int] = None) -> List[Hit]:
+    """Top-k chunks by dot product (cosine for normalized vectors) across all live segments.
+
+    With an IVF index only the nprobe nearest cells are scanned (default
+    VECTOR_IVF_NPROBE; 0 scans everything). A filtered query that finds
+    fewer than k hits that way is repeated exactly.
+    """
+    path = space_dir(version)
+    q = np.asarray(query, dtype=np.float32)
+    if nprobe is None:
+        nprobe = settings.VECTOR_IVF_NPROBE
+    for attempt in range(3):
+        manifest = read_manifest(path)
+        segments = manifest["segments"]
+        if not segments or k <= 0:
+            return []
+        if manifest.get("dim") and q.shape[0] != manifest["dim"]:
+            raise ValueError(f"Query has {q.shape[0]} dims; {version} vectors have {manifest['dim']}")
+        rows = sum(s["rows"] for s in segments)
+        try:
+            cells = None
+            index = manifest.get("ivf")
+            if index and nprobe > 0:
+                probed = ivf.probe(_load_centroids(path, index["gen"]), q, nprobe)
+                cells = (index["gen"], index["nlist"], probed)
+                rows = rows * len(probed) // index["nlist"]
+            args = [(path, s["name"], q, k, loan_id, doc_type, cells) for s in segments]
+            if len(segments) > 1 and rows >= settings.VECTOR_PARALLEL_MIN_ROWS:
+                pool = _search_pool()
+                parts = [f.result() for f in [pool.submit(_search_segment, *a) for a in args]]
+            else:
+                parts = [_search_segment(*a) for a in args]
+            break
+        except FileNotFoundError:
+            if attempt == 2:
+                raise
+            # A merge or retrain replaced some of these files; retry against the new manifest
+    hits = [h for part in parts for h in part]
+    if cells is not None and (loan_id or doc_type) and len(hits) < k:
+        return search(version, query, k, loan_id, doc_type, nprobe=0)
+    hits.sort(key=lambda h: h[0], reverse=True)
+    return hits[:k]
+
+
+def _write_segment(path: str, name: str, vecs: np.ndarray, meta: np.ndarray):
+    for suffix, arr in ((".vec.npy", vecs), (".meta.npy", meta)):
+        tmp = os.path.join(path, f"{name}{suffix}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp, os.path.join(path, name + suffix))
+
+
+META_FIELDS = ("chunk_id", "doc_id", "loan_id", "doc_type")
+
+
+def _write_lists(path: str, name: str, gen: int, labels: np.ndarray, nlist: int):
+    file = _lists_file(path, name, gen)
+    with open(file + ".tmp", "wb") as f:
+        np.save(f, ivf.inverted_lists(labels, nlist))
+    os.replace(file + ".tmp", file)
+
+
+def _labels(path: str, name: str, gen: int, nlist: int, rows: int) -> np.ndarray:
+    """Cell of every row in a segment, recovered from its inverted lists"""
+    lists = np.load(_lists_file(path, name, gen))
+    labels = np.empty(rows, dtype=np.int32)
+    labels[lists[nlist + 1:]] = np.repeat(np.arange(nlist, dtype=np.int32), np.diff(lists[:nlist + 1]))
+    return labels
+
+
+def _meta_array(chunk_ids, doc_ids, loan_ids, doc_types) -> np.ndarray:
+    cols = [np.array([(v or "").encode() for v in c], dtype=bytes) for c in (chunk_ids, doc_ids, loan_ids, doc_types)]
+    meta = np.empty(len(cols[0]), dtype=[(n, "S%d" % max(c.dtype.itemsize, 1)) for n, c in zip(META_FIELDS, cols)])
+    for n, c in zip(META_FIELDS, cols):
+        meta[n] = c
+    return meta
+
+
+def _concat_meta(parts: List[np.ndarray]) -> np.ndarray:
+    """Concatenate sidecars whose string fields may have different widths"""
+    dtype = [(n, "S%d" % max(p.dtype[n].itemsize for p in parts)) for n in META_FIELDS]
+    out = np.empty(sum(len(p) for p in parts), dtype=dtype)
+    i = 0
+    for p in parts:
+        for n in META_FIELDS:
+            out[n][i:i + len(p)] = p[n]
+        i += len(p)
+    return out
+
+
+def add(version: str, rows: List[dict], docs: Dict[str, Tuple[Optional[str], Optional[str]]],
+        deleted: Iterable[str] = (), synced: Optional[bool] = None) -> Optional[str]:
+    """Append chunk rows (chunk_id, doc_id, vec) as a new segment and tombstone deleted chunk ids.
+
+    docs maps doc_id -> (loan_id, doc_type) for the query-time filters.
+    synced is applied only when the space is created.
+    """
+    path = space_dir(version)
+    deleted = list(deleted)
+    name = None
+    with _locked(path):
+        manifest = read_manifest(path)
+        if not os.path.exists(os.path.join(path, "manifest.json")) and synced is not None:
+            manifest["synced"] = synced
+        dim = len(rows[0]["vec"]) if rows else manifest.get("dim")
+        if manifest.get("dim") not in (None, dim):
+            raise ValueError(f"{version} holds {manifest['dim']}-dim vectors, got {dim}")
+        manifest["dim"] = dim
+        if deleted:
+            with open(os.path.join(path, "tombstones"), "ab") as f:
+                f.write(b"".join(c.encode() + b"\n" for c in deleted))
+        if rows:
+            name = "seg-%06d" % manifest["next_id"]
+            vecs = np.asarray([r["vec"] for r in rows], dtype=np.float32).reshape(len(rows), dim)
+            meta = _meta_array(
+                [r["chunk_id"] for r in rows], [r["doc_id"] for r in rows],
+                [docs.get(r["doc_id"], (None, None))[0] for r in rows],
+                [docs.get(r["doc_id"], (None, None))[1] for r in rows],
+            )
+            _write_segment(path, name, vecs, meta)
+            index = manifest.get("ivf")
+            if index:
+                labels = ivf.assign(vecs, _load_centroids(path, index["gen"]))
+                _write_lists(path, name, index["gen"], labels, index["nlist"])
+            manifest["segments"].append({"name": name, "rows": len(rows)})
+            manifest["next_id"] += 1
+        _write_json(os.path.join(path, "manifest.json"), manifest)
+    if name and _small_segments(manifest) >= settings.VECTOR_MERGE_SEGMENTS:
+        in_background(version, "merge", merge)
+    if name and _needs_training(manifest):
+        in_background(version, "train", train)
+    return name
+
+
+def _small_segments(manifest: dict) -> int:
+    return sum(1 for s in manifest["segments"] if s["rows"] < settings.VECTOR_SEGMENT_ROWS)
+
+
+def _needs_training(manifest: dict) -> bool:
+    """No index yet past VECTOR_IVF_MIN_ROWS, or 4x the rows the index was trained on"""
+    if not settings.VECTOR_IVF_MIN_ROWS:
+        return False
+    rows = sum(s["rows"] for s in manifest["segments"])
+    index = manifest.get("ivf")
+    if not index:
+        return rows >= settings.VECTOR_IVF_MIN_ROWS
+    return rows >= 4 * index["rows"]
+
+
+_running = set()
+_running_lock = threading.Lock()
+
+
+def in_background(version: str, kind: str, fn: Callable[[str], object]):
+    """Run fn(version) on a daemon thread, one per (space, kind) at a time"""
+    key = (version, kind)
+    with _running_lock:
+        if key in _running:
+            return
+        _running.add(key)
+
+    def run():
+        try:
+            fn(version)
+        except Exception:
+            logger.exception("vector store %s failed for %s", kind, version)
+        finally:
+            with _running_lock:
+                _running.discard(key)
+
+    threading.Thread(target=run, name=f"vector-{kind}-{version}", daemon=True).start()
+
+
+def merge(version: str, everything: bool = False) -> Optional[str]:
+    """Rewrite small segments (or all of them) as one, dropping tombstoned rows.
+
+    The heavy copy runs outside the lock; segments appended meanwhile are kept.
+    """
+    path = space_dir(version)
+    manifest = read_manifest(path)
+    picked = [s for s in manifest["segments"] if everything or s["rows"] < settings.VECTOR_SEGMENT_ROWS]
+    if len(picked) < 2 and not (picked and os.path.exists(os.path.join(path, "tombstones"))):
+        return None
+    _, dead = _tombstone_ids(path)
+    vec_parts, meta_parts, kept_rows, dropped = [], [], [], set()
+    for s in picked:
+        mat, meta = _open_segment(os.path.join(path, s["name"]))
+        gone = np.isin(meta["chunk_id"], dead) if dead.size else np.zeros(len(meta), dtype=bool)
+        kept_rows.append(~gone)
+        if (~gone).any():
+            vec_parts.append(np.asarray(mat[~gone]))
+            meta_parts.append(np.asarray(meta[~gone]))
+        dropped.update(meta["chunk_id"][gone].tolist())
+    if everything:
+        # Every tombstone read above predates all picked segments, so none is needed after this
+        dropped.update(dead.tolist())
+
+    with _locked(path):
+        current = read_manifest(path)
+        names = {s["name"] for s in picked}
+        if not names <= {s["name"] for s in current["segments"]}:
+            return None  # another process merged these already
+        name = None
+        kept = [s for s in current["segments"] if s["name"] not in names]
+        if meta_parts:
+            name = "seg-%06d" % current["next_id"]
+            current["next_id"] += 1
+            merged = _concat_meta(meta_parts)
+            _write_segment(path, name, np.concatenate(vec_parts), merged)
+            index = current.get("ivf")
+            if index:
+                # Cells carry over from the picked segments' lists, so nothing is re-assigned
+                labels = np.concatenate([
+                    _labels(path, s["name"], index["gen"], index["nlist"], s["rows"])[keep]
+                    for s, keep in zip(picked, kept_rows)
+                ])
+                _write_lists(path, name, index["gen"], labels, index["nlist"])
+            kept.insert(0, {"name": name, "rows": len(merged)})
+        current["segments"] = kept
+        _write_json(os.path.join(path, "manifest.json"), current)
+        # Tombstones for rows dropped here are no longer needed
+        _, now_dead = _tombstone_ids(path)
+        remaining = [c for c in now_dead.tolist() if c not in dropped]
+        tmp = os.path.join(path, "tombstones.tmp")
+        with open(tmp, "wb") as f:
+            f.write(b"".join(c + b"\n" for c in remaining))
+        os.replace(tmp, os.path.join(path, "tombstones"))
+        for f in os.listdir(path):
+            if f.split(".", 1)[0] in names:
+                os.remove(os.path.join(path, f))
+    return name
+
+
+def train(version: str, nlist: int = 0) -> Optional[dict]:
+    """Fit IVF centroids on the space's live vectors and file every segment under them.
+
+    The fitting and assignment run outside the lock; segments written
+    meanwhile are assigned before the new index is switched in.
+    """
+    path = space_dir(version)
+    with _locked(path):
+        manifest = read_manifest(path)
+        gen = manifest.get("ivf_next", 1)
+        manifest["ivf_next"] = gen + 1
+        _write_json(os.path.join(path, "manifest.json"), manifest)
+    segments = manifest["segments"]
+    total = sum(s["rows"] for s in segments)
+    if not total:
+        return None
+    nlist = min(nlist or settings.VECTOR_IVF_NLIST or ivf.default_nlist(total), total)
+    # Sample rows evenly across segments for the k-means fit
+    share = min(1.0, nlist * TRAIN_SAMPLE / total)
+    rng = np.random.default_rng(gen)
+    mats = {}
+    for s in segments:
+        try:
+            mats[s["name"]] = _open_segment(os.path.join(path, s["name"]))[0]
+        except FileNotFoundError:
+            pass  # merged away since the manifest was read; its replacement is assigned below
+    sample = []
+    for mat in mats.values():
+        n = max(1, int(round(len(mat) * share)))
+        sample.append(np.asarray(mat[np.sort(rng.choice(len(mat), min(n, len(mat)), replace=False))]))
+    centroids = ivf.train(np.concatenate(sample), nlist, sample=TRAIN_SAMPLE, seed=gen)
+    nlist = len(centroids)
+    np.save(_centroids_file(path, gen), centroids)
+    for name, mat in mats.items():
+        _write_lists(path, name, gen, ivf.assign(mat, centroids), nlist)
+
+    with _locked(path):
+        current = read_manifest(path)
+        for s in current["segments"]:
+            if s["name"] not in mats:
+                mat, _ = _open_segment(os.path.join(path, s["name"]))
+                _write_lists(path, s["name"], gen, ivf.assign(mat, centroids), nlist)
+        old = current.get("ivf")
+        current["ivf"] = {"gen": gen, "nlist": nlist, "rows": total}
+        _write_json(os.path.join(path, "manifest.json"), current)
+        # Drop other generations, and lists left behind by segments merged away meanwhile
+        live = {s["name"] for s in current["segments"]}
+        for f in os.listdir(path):
+            m = re.search(r"ivf-(\d+)(\.centroids)?\.npy$", f)
+            if m and (int(m.group(1)) != gen or not (m.group(2) or f.split(".", 1)[0] in live)):
+                os.remove(os.path.join(path, f))
+    return {"version": version, "gen": gen, "nlist": nlist, "rows": total, "replaced": old and old["gen"]}
+
+
+def index_rows(db: Session, rows: List[dict], deleted: Iterable[Tuple[str, Optional[str]]] = ()):
+    """Mirror committed DocChunk rows, and (chunk_id, embedding_model) deletions, into the store.
+
+    A space seen for the first time counts as synced only when these rows
+    are all it holds in doc_chunks; otherwise it waits for a rebuild.
+    """
+    if not settings.VECTOR_STORE_ENABLED:
+        return
+    spaces: Dict[str, List[dict]] = {}
+    for r in rows:
+        if r.get("vec") and r.get("embedding_model"):
+            spaces.setdefault(r["embedding_model"], []).append(r)
+    gone: Dict[str, List[str]] = {}
+    for chunk_id, version in deleted:
+        if version:
+            gone.setdefault(version, []).append(chunk_id)
+    doc_ids = list({r["doc_id"] for r in rows})
+    docs = {}
+    for i in range(0, len(doc_ids), 500):
+        docs.update((d, (l, t)) for d, l, t in db.execute(
+            select(Document.doc_id, Document.loan_id, Document.type).where(Document.doc_id.in_(doc_ids[i:i + 500]))
+        ).all())
+    for version in set(spaces) | set(gone):
+        part = spaces.get(version, [])
+        synced = None
+        if part and not os.path.exists(os.path.join(space_dir(version), "manifest.json")):
+            held = db.scalar(select(func.count()).select_from(DocChunk).where(DocChunk.embedding_model == version))
+            synced = held == len(part)
+        if part or os.path.isdir(space_dir(version)):
+            try:
+                add(version, part, docs, gone.get(version, ()), synced)
+            except Exception:
+                # doc_chunks is already committed; fall back to it until a rebuild
+                logger.exception("vector store write failed for %s; marking it unsynced", version)
+                mark_unsynced(version)
+
+
+def mark_unsynced(version: str):
+    path = space_dir(version)
+    with _locked(path):
+        manifest = read_manifest(path)
+        manifest["synced"] = False
+        _write_json(os.path.join(path, "manifest.json"), manifest)
+
+
+def rebuild(db: Session, version: str) -> dict:
+    """Recreate one space from doc_chunks and mark it synced.
+
+    Rows are streamed into VECTOR_SEGMENT_ROWS-sized segments in a scratch
+    directory that then replaces the live one. Chunks indexed while this
+    runs may be missed; pause indexing or rebuild again afterwards.
+    """
+    import shutil
+
+    path = space_dir(version)
+    scratch = path + ".rebuild"
+    shutil.rmtree(scratch, ignore_errors=True)
+    os.makedirs(scratch)
+    previous = read_manifest(path)
+    manifest = {"segments": [], "next_id": previous["next_id"], "ivf_next": previous.get("ivf_next", 1), "synced": True, "dim": None}
+    stmt = (
+        select(DocChunk.chunk_id, DocChunk.doc_id, DocChunk.vec, Document.loan_id, Document.type)
+        .join(Document, Document.doc_id == DocChunk.doc_id)
+        .where(DocChunk.embedding_model == version, DocChunk.vec.isnot(None))
+        .order_by(DocChunk.chunk_id)
+        .execution_options(yield_per=REBUILD_BATCH)
+    )
+    pending, total = [], 0
+
+    def flush():
+        nonlocal pending, total
+        if not pending:
+            return
+        name = "seg-%06d" % manifest["next_id"]
+        vecs = np.asarray([p[2] for p in pending], dtype=np.float32)
+        meta = _meta_array(*zip(*[(p[0], p[1], p[3], p[4]) for p in pending]))
+        _write_segment(scratch, name, vecs, meta)
+        manifest["dim"] = manifest["dim"] or vecs.shape[1]
+        manifest["segments"].append({"name": name, "rows": len(pending)})
+        manifest["next_id"] += 1
+        total += len(pending)
+        pending = []
+
+    for row in db.execute(stmt):
+        if row.vec:
+            pending.append(tuple(row))
+        if len(pending) >= settings.VECTOR_SEGMENT_ROWS:
+            flush()
+    flush()
+    _write_json(os.path.join(scratch, "manifest.json"), manifest)
+
+    with _locked(path):
+        old = path + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        for name in os.listdir(path):
+            if name != "LOCK":
+                os.makedirs(old, exist_ok=True)
+                os.replace(os.path.join(path, name), os.path.join(old, name))
+        for name in os.listdir(scratch):
+            os.replace(os.path.join(scratch, name), os.path.join(path, name))
+    shutil.rmtree(old, ignore_errors=True)
+    shutil.rmtree(scratch, ignore_errors=True)
+    index = train(version) if settings.VECTOR_IVF_MIN_ROWS and total >= settings.VECTOR_IVF_MIN_ROWS else None
+    return {"version": version, "rows": total, "segments": len(manifest["segments"]), "ivf": index}
+
+
+def stats() -> List[dict]:
+    out = []
+    root = settings.VECTOR_STORE_DIR
+    for name in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        path = os.path.join(root, name)
+        if not os.path.exists(os.path.join(path, "manifest.json")):
+            continue
+        manifest = read_manifest(path)
+        _, dead = _tombstone_ids(path)
+        out.append({
+            "space": name,
+            "dim": manifest.get("dim"),
+            "synced": manifest.get("synced", False),
+            "segments": len(manifest["segments"]),
+            "rows": sum(s["rows"] for s in manifest["segments"]),
+            "tombstones": int(dead.size),
+            "ivf": manifest.get("ivf"),
+            "bytes": sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path) if f.endswith(".npy")),
+        })
+    return out
+
+
+if __name__ == "__main__":
+    from ..db import SessionLocal
+
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("command", choices=["stats", "rebuild", "compact", "train"])
+    p.add_argument("--model", help="embedding model version (default: every model in doc_chunks)")
+    p.add_argument("--nlist", type=int, default=0, help="IVF cells for train (default: VECTOR_IVF_NLIST or ~4*sqrt(rows))")
+    args = p.parse_args()
+    session = SessionLocal()
+    try:
+        versions = [args.model] if args.model else session.execute(
+            select(DocChunk.embedding_model).where(DocChunk.embedding_model.isnot(None)).distinct()
+        ).scalars().all()
+        if args.command == "rebuild":
+            print(json.dumps([rebuild(session, v) for v in versions], indent=2))
+        elif args.command == "train":
+            print(json.dumps([train(v, args.nlist) for v in versions], indent=2))
+        elif args.command == "compact":
+            print(json.dumps({v: merge(v, everything=True) for v in versions}, indent=2))
+        else:
+            print(json.dumps(stats(), indent=2))
+    finally:
+        session.close()
@@ -7,6 +7,106 @@ class Settings(BaseSettings):
     
     # Database settings
     DATABASE_URL: str = "sqlite:///./fixed_income.db"
+    ASYNC_DATABASE_URL: str | None = None  # derived from DATABASE_URL when unset
+    READ_REPLICA_URL: str | None = None  # GET endpoints read from here when set
+    SCHEMA_AUTO_CREATE: bool = False  # create_all at startup (local dev); deploys run `python -m app.migrate`
+    
+    # SQLite profile (applied per connection)
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE: int = -65536  # negative = KiB, i.e. 64 MiB
+    SQLITE_MMAP_SIZE: int = 268435456
+    
+    # Server database profile (Postgres)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # 0 disables
+    
+    # Document text storage
+    TEXT_COMPRESSION: str = "auto"  # auto (zstd when installed, else zlib) | zstd | zlib | none
+    CHUNK_TEXT_COPY: bool = False  # store chunk text as well as its offsets into the document
+    TEXT_SEARCH_SCAN_LIMIT: int = 2000  # compressed texts and chunk copies the RAG text fallback decompresses per query
+    
+    # Embeddings for RAG
+    EMBEDDING_PROVIDER: str = "hashed"  # hashed | sentence-transformers
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_MODEL_REVISION: str | None = None  # part of the cache key, pin it for reproducible vectors
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_THREADS: int = 0  # torch threads in the inference worker; 0 = library default
+    
+    # On-disk vector store (mmapped segments) for RAG search
+    VECTOR_STORE_ENABLED: bool = True
+    VECTOR_STORE_DIR: str = "vectors"
+    VECTOR_SEARCH_WORKERS: int = 0  # search processes; 0 = one per CPU
+    VECTOR_PARALLEL_MIN_ROWS: int = 200_000  # below this, segments are scanned in-process
+    VECTOR_MERGE_SEGMENTS: int = 8  # small segments that trigger a background merge
+    VECTOR_SEGMENT_ROWS: int = 250_000  # segments at this size are left alone by merges
+    VECTOR_IVF_MIN_ROWS: int = 100_000  # train an IVF index past this many vectors; 0 = always exact
+    VECTOR_IVF_NLIST: int = 0  # IVF cells; 0 = about 4*sqrt(rows)
+    VECTOR_IVF_NPROBE: int = 32  # cells scanned per query unless RAGQuery.nprobe says otherwise
+    
+    # Bulk document ingestion (ZIP / multipart batches)
+    UPLOAD_DIR: str = "uploads"
+    BULK_INGEST_WORKERS: int = 4  # threads copying/hashing files and extracting text
+    BULK_FILENAME_PATTERN: str = r"^(?P<loan_id>[A-Za-z0-9]+)(?:[_\-. ](?P<doc_type>[A-Za-z0-9]+))?"
+    BULK_MAX_FILES: int = 10000
+    BULK_MAX_BYTES: int = 4 << 30  # uncompressed bytes per batch
+    BULK_MAX_FILE_BYTES: int = 256 << 20  # bytes per stored file; larger ones are skipped with an error
+    BULK_PROCESS_BATCH: int = 50  # documents extracted/indexed per commit
+    
+    # Resident columnar loan-tape snapshot for read-heavy endpoints
+    LOAN_CACHE_ENABLED: bool = False
+    
+    # ETag revalidation on read endpoints
+    DATA_VERSION_TTL: float = 1.0  # seconds a worker trusts its last view of the dataset versions
+    
+    # Daily portfolio analytics snapshots
+    SNAPSHOT_SCHEDULE: bool = True  # each worker takes today's snapshot when it is missing
+    SNAPSHOT_CHECK_SECONDS: float = 3600.0
+    SNAPSHOT_ON_INGEST: bool = True  # refresh today's snapshot after each loan-tape upload
+    
+    # Admission control, per worker; routes are classed in main.py and unlisted (cheap) ones are never queued
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_HEAVY_LIMIT: int = 0  # concurrent heavy requests; 0 = half the CPUs, at most half of DB_POOL_SIZE
+    ADMISSION_HEAVY_QUEUE: int = 0  # waiting requests past this get 429; 0 = twice the limit
+    ADMISSION_HEAVY_WAIT: float = 10.0  # seconds in the queue before a 503
+    ADMISSION_HEAVY_DEADLINE: float = 30.0  # seconds to start responding before cancellation; 0 = none
+    ADMISSION_BATCH_LIMIT: int = 1  # 0 = derived as for heavy
+    ADMISSION_BATCH_QUEUE: int = 4
+    ADMISSION_BATCH_WAIT: float = 60.0
+    ADMISSION_BATCH_DEADLINE: float = 0.0  # batch writes run to completion
+
+    # Response serialization
+    JSON_FAST_PATH: bool = True  # orjson rendering of row-built responses; off = FastAPI's default encoding
+    JSON_STREAM_MIN_ROWS: int = 1000  # pages at least this large are streamed as they are fetched
+    JSON_STREAM_BATCH: int = 500  # rows fetched and written per streamed chunk
+    
+    # Batch write settings
+    RISK_BATCH_CHUNK_SIZE: int = 5000
+    
+    # In-process risk scoring
+    RISK_MODEL_PATH: str | None = None  # joblib bundle; builtin logistic model when unset
+    SCORING_CHUNK_SIZE: int = 50000
+    SCORING_WORKERS: int = 0  # 0 = one per CPU
+    
+    # Cash-flow projection
+    CASHFLOW_CHUNK_SIZE: int = 50000
+    CASHFLOW_WORKERS: int = 0  # 0 = one per CPU
+    PRICING_LOAN_CHUNK_SIZE: int = 2000  # loans per chunk for per-loan pricing; each holds loans x periods arrays
+    
+    # Monte Carlo credit-loss simulation
+    SIMULATION_WORKERS: int = 0  # 0 = one per CPU
+    
+    # Request instrumentation
+    PROFILING_ENABLED: bool = True
+    SLOW_QUERY_MS: float = 200.0
+    N_PLUS_ONE_THRESHOLD: int = 10  # same statement this many times in one request
+    PROFILE_HEADER: str = "X-Debug-Profile"
+    PROFILE_TOKEN: str | None = None  # header value that enables cProfile capture; unset disables
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,195 @@
+"""Admission control for expensive routes.
+
+Routes are classed cheap, heavy or batch (see ADMISSION_ROUTES in main.py).
+Heavy and batch each get a per-worker concurrency cap and a bounded FIFO wait
+queue: a request over the cap waits for a slot, is refused with 429 when the
+queue is full and with 503 once it has waited ADMISSION_*_WAIT seconds, both
+with Retry-After. A request that has not started its response by the class
+deadline is cancelled and answered 503. Cheap routes are never queued, so
+dashboard reads keep their latency while a burst of heavy queries waits.
+
+Left at 0, a cap is half the CPUs (the other half stays free for cheap reads)
+and at most half the DB pool, and its queue is twice the cap, so a burst
+larger than the worker can run is refused rather than stacked up.
+
+Cancellation stops a handler at its next await and frees its slot. Work it
+had handed to a thread (a running SQL statement, a sync handler) cannot be
+interrupted and finishes in the background, bounded on Postgres by
+DB_STATEMENT_TIMEOUT_MS.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Callable, Dict, List, Mapping, Union
+from urllib.parse import parse_qsl
+from fastapi.responses import JSONResponse
+from starlette.routing import compile_path
+from ..settings import settings
+
+CHEAP, HEAVY, BATCH = "cheap", "heavy", "batch"
+MAX_RETRY_AFTER = 60
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status, self.detail, self.retry_after = status, detail, retry_after
+
+    def response(self) -> JSONResponse:
+        return JSONResponse(status_code=self.status, content={"detail": self.detail}, headers={"Retry-After": str(self.retry_after)})
+
+
+class Gate:
+    """Concurrency cap (0 = unlimited) with a bounded FIFO wait queue; event-loop only"""
+
+    def __init__(self, name: str, limit: int, queue: int, wait: float, deadline: float):
+        self.name, self.limit, self.queue, self.wait, self.deadline = name, limit, queue, wait, deadline
+        self.active = 0
+        self.waiters: deque = deque()
+        self.admitted = self.queue_full = self.wait_timeouts = self.deadline_exceeded = 0
+        self.avg_seconds = 0.0
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead has likely drained, from recent service times"""
+        per_slot = (len(self.waiters) + 1) / max(self.limit, 1)
+        return min(MAX_RETRY_AFTER, max(1, math.ceil((self.avg_seconds or 1.0) * per_slot)))
+
+    async def acquire(self):
+        if not self.limit or (self.active < self.limit and not self.waiters):
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self.waiters) >= self.queue:
+            self.queue_full += 1
+            raise Rejected(429, f"Too many concurrent {self.name} requests", self.retry_after())
+        slot = asyncio.get_running_loop().create_future()
+        self.waiters.append(slot)
+        try:
+            await asyncio.wait((slot,), timeout=self.wait or None)
+        except asyncio.CancelledError:
+            if slot.done():
+                self.release()  # handed a slot just as the caller went away
+            else:
+                self.waiters.remove(slot)
+            raise
+        if not slot.done():
+            self.waiters.remove(slot)
+            self.wait_timeouts += 1
+            raise Rejected(503, f"Timed out waiting for a {self.name} request slot", self.retry_after())
+        self.admitted += 1
+
+    def release(self):
+        # The slot passes straight to the oldest waiter, so newcomers cannot jump the queue
+        if self.waiters:
+            self.waiters.popleft().set_result(None)
+        else:
+            self.active -= 1
+
+    def finished(self, seconds: float):
+        self.avg_seconds = seconds if not self.avg_seconds else 0.8 * self.avg_seconds + 0.2 * seconds
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit, "queue_limit": self.queue, "wait_seconds": self.wait, "deadline_seconds": self.deadline,
+            "active": self.active, "queued": len(self.waiters), "admitted": self.admitted,
+            "rejected_queue_full": self.queue_full, "rejected_wait_timeout": self.wait_timeouts,
+            "deadline_exceeded": self.deadline_exceeded, "avg_seconds": round(self.avg_seconds, 4),
+        }
+
+
+def default_limit() -> int:
+    return max(1, min((os.cpu_count() or 1) // 2, settings.DB_POOL_SIZE // 2))
+
+
+def _gate(name: str) -> Gate:
+    opt = lambda key: getattr(settings, f"ADMISSION_{name.upper()}_{key}")
+    limit = opt("LIMIT") or default_limit()
+    return Gate(name, limit, opt("QUEUE") or 2 * limit, opt("WAIT"), opt("DEADLINE"))
+
+
+GATES: Dict[str, Gate] = {name: _gate(name) for name in (HEAVY, BATCH)}
+
+RouteClass = Union[str, Callable[[Dict[str, str]], str]]
+
+
+class AdmissionMiddleware:
+    """Gates requests by route class; `routes` maps "METHOD /path/{param}" to a
+    class, or to fn(query params) -> class when the parameters decide the cost.
+    Unlisted routes are cheap."""
+
+    def __init__(self, app, routes: Mapping[str, RouteClass]):
+        self.app = app
+        self.routes = []
+        for key, cls in routes.items():
+            method, path = key.split(" ", 1)
+            self.routes.append((method, compile_path(path)[0], cls))
+
+    def classify(self, scope) -> str:
+        for method, regex, cls in self.routes:
+            if scope["method"] == method and regex.match(scope["path"]):
+                return cls(dict(parse_qsl(scope["query_string"].decode("latin-1")))) if callable(cls) else cls
+        return CHEAP
+
+    async def __call__(self, scope, receive, send):
+        gate = GATES.get(self.classify(scope)) if scope["type"] == "http" else None
+        if gate is None:
+            return await self.app(scope, receive, send)
+        try:
+            await gate.acquire()
+        except Rejected as e:
+            return await e.response()(scope, receive, send)
+        started = time.perf_counter()
+        try:
+            await self._run(gate, scope, receive, send)
+        finally:
+            gate.finished(time.perf_counter() - started)
+            gate.release()
+
+    async def _run(self, gate: Gate, scope, receive, send):
+        if not gate.deadline:
+            return await self.app(scope, receive, send)
+        responded = timed_out = False
+
+        async def send_once(message):
+            nonlocal responded
+            if timed_out:
+                return  # the client already has its 503
+            responded = responded or message["type"] == "http.response.start"
+            await send(message)
+
+        task = asyncio.ensure_future(self.app(scope, receive, send_once))
+        try:
+            await asyncio.wait_for(asyncio.shield(task), gate.deadline)
+        except asyncio.TimeoutError:
+            if responded:
+                return await task  # already streaming; let it finish
+            timed_out = True
+            task.cancel()
+            gate.deadline_exceeded += 1
+            await Rejected(503, "Request exceeded its deadline", gate.retry_after()).response()(scope, receive, send)
+            # Let the handler unwind (sessions close) before the slot is freed
+            await asyncio.wait((task,))
+            if not task.cancelled():
+                task.exception()
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+
+
+def stats() -> dict:
+    return {"enabled": settings.ADMISSION_ENABLED, **{name: g.stats() for name, g in GATES.items()}}
+
+
+def metric_lines() -> List[str]:
+    """Prometheus lines for queue depth, in-flight requests and rejections"""
+    lines = ["# HELP admission_active Requests holding an admission slot", "# TYPE admission_active gauge"]
+    lines += [f'admission_active{{class="{n}"}} {g.active}' for n, g in GATES.items()]
+    lines += ["# HELP admission_queued Requests waiting for an admission slot", "# TYPE admission_queued gauge"]
+    lines += [f'admission_queued{{class="{n}"}} {len(g.waiters)}' for n, g in GATES.items()]
+    lines += ["# HELP admission_rejected_total Requests refused or cancelled by admission control", "# TYPE admission_rejected_total counter"]
+    for n, g in GATES.items():
+        for reason, count in (("queue_full", g.queue_full), ("wait_timeout", g.wait_timeouts), ("deadline", g.deadline_exceeded)):
+            lines.append(f'admission_rejected_total{{class="{n}",reason="{reason}"}} {count}')
+    return lines
@@ -0,0 +1,168 @@
+import json
+import struct
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+from ..settings import settings
+
+CODEC_RAW, CODEC_ZLIB, CODEC_ZSTD = 0, 1, 2
+CODECS = {"none": CODEC_RAW, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+# Blob layout: codec (1 byte), dictionary id (2 bytes, 0 = none), payload
+HEADER = struct.Struct(">BH")
+ZLIB_DICT_MAX = 32 * 1024  # zlib only looks back 32 KiB, so a larger preset dictionary is wasted
+
+try:
+    import zstandard
+except ImportError:  # zlib fallback
+    zstandard = None
+
+# dict_id -> (codec, bytes); loaded from text_dictionaries on first use
+_dicts: Dict[int, Tuple[int, bytes]] = {}
+_active: Dict[int, int] = {}
+_loaded = False
+_lock = threading.Lock()
+
+
+def zstd_available() -> bool:
+    return zstandard is not None
+
+
+def preferred_codec() -> int:
+    name = settings.TEXT_COMPRESSION
+    if name == "auto":
+        return CODEC_ZSTD if zstd_available() else CODEC_ZLIB
+    codec = CODECS[name]
+    if codec == CODEC_ZSTD and not zstd_available():
+        return CODEC_ZLIB
+    return codec
+
+
+def register_dictionary(dict_id: int, codec: int, data: bytes, active: bool = True):
+    with _lock:
+        _dicts[dict_id] = (codec, data)
+        if active and dict_id >= _active.get(codec, 0):
+            _active[codec] = dict_id
+
+
+def _load_dictionaries(dict_id: Optional[int] = None):
+    """Pull stored dictionaries into the registry (all of them, or one on a miss)"""
+    global _loaded
+    from sqlalchemy import text
+    from ..db import engine
+
+    sql = "SELECT dict_id, codec, data FROM text_dictionaries"
+    params = {}
+    if dict_id is not None:
+        sql += " WHERE dict_id = :dict_id"
+        params["dict_id"] = dict_id
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text(sql), params).all()
+    except Exception:
+        rows = []  # table not created yet
+    for r in rows:
+        register_dictionary(r.dict_id, r.codec, bytes(r.data))
+    if dict_id is None:
+        _loaded = True
+
+
+def _dictionary(dict_id: int) -> Tuple[int, bytes]:
+    if dict_id not in _dicts:
+        _load_dictionaries(dict_id)
+    if dict_id not in _dicts:
+        raise ValueError(f"Unknown compression dictionary {dict_id}")
+    return _dicts[dict_id]
+
+
+def compress(value: str, codec: Optional[int] = None, dict_id: Optional[int] = None) -> bytes:
+    """Encode text with the active shared dictionary for the codec, if any"""
+    if dict_id is None and not _loaded:
+        _load_dictionaries()
+    codec = preferred_codec() if codec is None else codec
+    data = value.encode("utf-8")
+    if codec == CODEC_RAW:
+        return HEADER.pack(CODEC_RAW, 0) + data
+    dict_id = _active.get(codec, 0) if dict_id is None else dict_id
+    zdict = _dictionary(dict_id)[1] if dict_id else None
+    if codec == CODEC_ZSTD:
+        d = zstandard.ZstdCompressionDict(zdict) if zdict else None
+        payload = zstandard.ZstdCompressor(level=3, dict_data=d).compress(data)
+    else:
+        z = zlib.compressobj(6, zdict=zdict) if zdict else zlib.compressobj(6)
+        payload = z.compress(data) + z.flush()
+    return HEADER.pack(codec, dict_id) + payload
+
+
+def decompress(blob: bytes) -> str:
+    codec, dict_id = HEADER.unpack_from(blob)
+    payload = memoryview(blob)[HEADER.size:]
+    if codec == CODEC_RAW:
+        return bytes(payload).decode("utf-8")
+    zdict = _dictionary(dict_id)[1] if dict_id else None
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed text")
+        d = zstandard.ZstdCompressionDict(zdict) if zdict else None
+        return zstandard.ZstdDecompressor(dict_data=d).decompressobj().decompress(payload).decode("utf-8")
+    z = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+    return (z.decompress(payload) + z.flush()).decode("utf-8")
+
+
+def train_dictionary(samples: List[str], codec: int, size: int = 64 * 1024) -> bytes:
+    """Build a shared dictionary from representative documents.
+
+    zstd uses its own trainer. For zlib, lines that recur across documents
+    (boilerplate, headers, legal language) are packed with the most common
+    last, since zlib matches nearer back-references more cheaply.
+    """
+    if codec == CODEC_ZSTD:
+        return zstandard.train_dictionary(size, [s.encode("utf-8") for s in samples]).as_bytes()
+    size = min(size, ZLIB_DICT_MAX)
+    freq = Counter()
+    for s in samples:
+        freq.update({line.strip() for line in s.replace(". ", ".\n").splitlines() if len(line.strip()) > 8})
+    common = [line for line, n in freq.most_common() if n > 1]
+    picked, total = [], 0
+    for line in common:
+        b = line.encode("utf-8") + b"\n"
+        if total + len(b) > size:
+            break
+        picked.append(b)
+        total += len(b)
+    return b"".join(reversed(picked))
+
+
+class CompressedText(TypeDecorator):
+    """Text stored as a compressed blob; decoded when the column is loaded"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress(bytes(value))
+
+
+class CompressedJSON(CompressedText):
+    """JSON document stored as a compressed blob"""
+
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress(json.dumps(value, default=str))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return json.loads(decompress(bytes(value)))
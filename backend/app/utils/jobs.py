@@ -0,0 +1,37 @@
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+# Background job registry; results live in process memory
+_jobs: Dict[str, dict] = {}
+_jobs_lock = threading.Lock()
+
+
+def create_job(params: dict) -> dict:
+    job = {
+        "job_id": str(uuid.uuid4()),
+        "status": "queued",
+        "progress": 0.0,
+        "submitted_at": datetime.utcnow(),
+        "finished_at": None,
+        "params": params,
+        "result": None,
+        "error": None,
+    }
+    with _jobs_lock:
+        _jobs[job["job_id"]] = job
+    return job
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    return _jobs.get(job_id)
+
+
+def update(job: dict, **kw):
+    with _jobs_lock:
+        job.update(kw)
+
+
+def fail_job(job: dict, error: str):
+    update(job, status="failed", error=error, finished_at=datetime.utcnow())
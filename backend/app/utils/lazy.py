@@ -0,0 +1,24 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name: str):
+    """Import a module whose body only runs on first attribute access.
+
+    Keeps numpy/scipy-backed services off the startup path until a request
+    actually needs them.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
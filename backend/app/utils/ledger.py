@@ -1,5 +1,7 @@
 import hashlib
 import json
+import uuid
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from ..models import Event
 
@@ -7,7 +9,8 @@ def append_event(db: Session, actor: str, type: str, payload: dict, loan_id: str
     """Append an event to the ledger"""
     # For MVP, just create a basic event
     # In production, you'd implement proper blockchain-style hashing
-    event_id = f"evt_{hashlib.md5(f'{actor}{type}{json.dumps(payload)}'.encode()).hexdigest()[:16]}"
+    # Nonce keeps ids unique when the same payload is logged twice
+    event_id = f"evt_{hashlib.md5(f'{actor}{type}{json.dumps(payload, default=str)}{uuid.uuid4()}'.encode()).hexdigest()[:16]}"
     
     event = Event(
         event_id=event_id,
@@ -20,4 +23,8 @@ def append_event(db: Session, actor: str, type: str, payload: dict, loan_id: str
     
     db.add(event)
     db.commit()
-    return event
\ No newline at end of file
+    return event
+
+async def append_event_async(db: AsyncSession, actor: str, type: str, payload: dict, loan_id: str = None):
+    """append_event for handlers holding an AsyncSession"""
+    return await db.run_sync(append_event, actor, type, payload, loan_id)
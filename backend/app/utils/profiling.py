@@ -0,0 +1,208 @@
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("app.profiling")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+MAX_PROFILES = 50
+MAX_PARAMS_CHARS = 500
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a label tuple (Prometheus semantics)"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self.series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: tuple, value: float):
+        with self._lock:
+            s = self.series.get(key)
+            if s is None:
+                s = self.series[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    s[0][i] += 1
+            s[1] += 1
+            s[2] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, count, total) in sorted(self.series.items()):
+                lbl = _labels(self.labels, key)
+                for b, c in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{lbl}{"," if lbl else ""}le="{b}"}} {c}')
+                lines.append(f'{self.name}_bucket{{{lbl}{"," if lbl else ""}le="+Inf"}} {count}')
+                lines.append(f"{self.name}_count{{{lbl}}} {count}")
+                lines.append(f"{self.name}_sum{{{lbl}}} {total}")
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...]):
+        self.name, self.help, self.labels = name, help, labels
+        self.series: Dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, key: tuple, value: float = 1.0):
+        with self._lock:
+            self.series[key] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines += [f"{self.name}{{{_labels(self.labels, k)}}} {v}" for k, v in sorted(self.series.items())]
+        return lines
+
+
+def _labels(names, values) -> str:
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{n}="{esc(v)}"' for n, v in zip(names, values))
+
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency", ("method", "route", "status"), LATENCY_BUCKETS)
+REQUEST_QUERIES = Histogram("http_request_db_queries", "SQL statements per request", ("method", "route"), QUERY_BUCKETS)
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Time spent in SQL per request", ("method", "route"), LATENCY_BUCKETS)
+SLOW_QUERIES = CounterMetric("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ("route",))
+N_PLUS_ONE = CounterMetric("db_n_plus_one_total", "Requests repeating one statement past the N+1 threshold", ("route",))
+METRICS = (REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_DB_SECONDS, SLOW_QUERIES, N_PLUS_ONE)
+
+
+class RequestStats:
+    """SQL activity for one request; shared with worker threads via the context"""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float, page: bool = False):
+        with self._lock:
+            self.queries += 1
+            self.db_seconds += seconds
+            # Later pages of one batched insert aren't repeats for N+1 purposes
+            if not page:
+                self.statements[statement] += 1
+
+    def repeated(self, threshold: int):
+        return [(s, n) for s, n in self.statements.most_common(3) if n >= threshold]
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+_config = {"slow_query_ms": 200.0}
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    page = getattr(context, "_query_recorded", False)
+    context._query_recorded = True
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed, page)
+    if elapsed * 1000.0 >= _config["slow_query_ms"]:
+        route = stats.route if stats is not None else "-"
+        SLOW_QUERIES.inc((route,))
+        logger.warning(
+            "slow query %.1fms route=%s executemany=%s sql=%s params=%s",
+            elapsed * 1000.0, route, executemany, " ".join(statement.split()), repr(parameters)[:MAX_PARAMS_CHARS],
+        )
+
+
+def install(slow_query_ms: float):
+    """Attach statement timing to every engine (async engines included)"""
+    _config["slow_query_ms"] = slow_query_ms
+    if not event.contains(Engine, "before_cursor_execute", _before_execute):
+        event.listen(Engine, "before_cursor_execute", _before_execute)
+        event.listen(Engine, "after_cursor_execute", _after_execute)
+
+
+def start_request(route: str):
+    stats = RequestStats(route)
+    return stats, _current.set(stats)
+
+
+def finish_request(stats: RequestStats, token, method: str, route: str, status: int, seconds: float, n_plus_one: int):
+    _current.reset(token)
+    stats.route = route
+    REQUEST_SECONDS.observe((method, route, status), seconds)
+    REQUEST_QUERIES.observe((method, route), stats.queries)
+    REQUEST_DB_SECONDS.observe((method, route), stats.db_seconds)
+    repeated = stats.repeated(n_plus_one)
+    if repeated:
+        N_PLUS_ONE.inc((route,))
+        for statement, n in repeated:
+            logger.warning("possible N+1 route=%s repeats=%d sql=%s", route, n, " ".join(statement.split())[:MAX_PARAMS_CHARS])
+
+
+# Captured profiles, newest last; only one profiler can run at a time
+_profiles: "OrderedDict[str, dict]" = OrderedDict()
+_profile_lock = threading.Lock()
+
+
+def start_profile() -> Optional[cProfile.Profile]:
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profile(profiler: cProfile.Profile, method: str, route: str, path: str, seconds: float, limit: int = 40) -> str:
+    try:
+        profiler.disable()
+    finally:
+        _profile_lock.release()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    profile_id = uuid.uuid4().hex[:12]
+    _profiles[profile_id] = {
+        "profile_id": profile_id,
+        "method": method,
+        "route": route,
+        "path": path,
+        "seconds": round(seconds, 6),
+        "captured_at": time.time(),
+        "stats": out.getvalue(),
+    }
+    while len(_profiles) > MAX_PROFILES:
+        _profiles.popitem(last=False)
+    return profile_id
+
+
+def list_profiles(route: Optional[str] = None) -> list:
+    return [{k: v for k, v in p.items() if k != "stats"} for p in _profiles.values() if route is None or p["route"] == route]
+
+
+def get_profile(profile_id: str) -> Optional[dict]:
+    return _profiles.get(profile_id)
+
+
+def render_metrics(extra: list = ()) -> str:
+    lines = []
+    for m in METRICS:
+        lines += m.render()
+    lines += extra
+    return "\n".join(lines) + "\n"
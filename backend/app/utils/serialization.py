@@ -0,0 +1,105 @@
+"""JSON fast path for large responses.
+
+Handlers build plain data straight from row tuples and return it through
+json_response(), skipping response_model re-validation and jsonable_encoder.
+orjson renders it when installed. The bytes match what FastAPI's default
+path (jsonable_encoder + Starlette's JSONResponse) produces for the same
+data; tests/test_serialization.py checks this, and bench.run compares live
+responses with JSON_FAST_PATH on and off.
+"""
+import json
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, List, Mapping, Optional, Sequence, Type
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from ..settings import settings
+
+try:
+    import orjson
+except ImportError:  # stdlib json writes the same bytes, only slower
+    orjson = None
+
+# orjson writes exponents as 1e16 / 1e-7 where json writes 1e+16 / 1e-07
+_EXPONENT = re.compile(rb"[:,\[]-?[0-9]+(?:\.[0-9]+)?e-?[0-9]+[,\]}]")
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """Compact UTF-8 JSON, byte-identical to Starlette's JSONResponse rendering"""
+    if orjson is not None:
+        out = orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        if not _EXPONENT.search(out):
+            return out
+    return _stdlib(content)
+
+
+def _stdlib(content) -> bytes:
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"), default=_default
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_response(content, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> Response:
+    if settings.JSON_FAST_PATH:
+        return FastJSONResponse(content, status_code, headers)
+    return JSONResponse(jsonable_encoder(content), status_code, headers)
+
+
+def columns_for(model: Type[BaseModel], entity) -> list:
+    """Entity columns named like the model's fields, in field order"""
+    return [getattr(entity, f) for f in model.model_fields]
+
+
+def model_rows(model: Type[BaseModel], rows: Iterable[Sequence]) -> List:
+    """Row tuples from columns_for() as response dicts, unvalidated.
+
+    Values must already have the model's types (the DB columns do). With
+    JSON_FAST_PATH off the rows go through the model as before.
+    """
+    fields = list(model.model_fields)
+    if not settings.JSON_FAST_PATH:
+        return [model(**dict(zip(fields, r))) for r in rows]
+    return [dict(zip(fields, r)) for r in rows]
+
+
+def model_dict(model: Type[BaseModel], obj):
+    """One ORM object as a response dict (see model_rows)"""
+    return model_rows(model, [[getattr(obj, f) for f in model.model_fields]])[0]
+
+
+def stream_page(head: dict, batches: Iterable[list], key: str = "items",
+                headers: Optional[Mapping[str, str]] = None) -> StreamingResponse:
+    """`head` plus a `key` array written batch by batch as `batches` is consumed.
+
+    Same bytes as json_response({**head, key: [...]}); head must not be empty.
+    Like the exports, a sync iterator is drained on Starlette's threadpool.
+    """
+    render = dumps if settings.JSON_FAST_PATH else (lambda c: _stdlib(jsonable_encoder(c)))
+
+    def body():
+        yield render(head)[:-1] + b"," + render(key) + b":["
+        first = True
+        for batch in batches:
+            if batch:
+                yield (b"" if first else b",") + render(batch)[1:-1]
+                first = False
+        yield b"]}"
+
+    return StreamingResponse(body(), media_type="application/json", headers=headers)
@@ -0,0 +1,91 @@
+"""Monotonic per-dataset version counters for conditional (ETag) responses.
+
+Write paths call bump() after their data commits; read endpoints derive an
+ETag from current() and can answer If-None-Match without querying. Each
+process keeps the last counters it saw for DATA_VERSION_TTL seconds, so
+writes made by other workers are noticed within that window. Caches that
+patch themselves from this process's own writes register with on_bump() to
+learn which versions those writes produced; any other step is a foreign
+write.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..models import DataVersion
+from ..settings import settings
+
+DATASETS = ("loans", "documents", "portfolios", "rules", "chunks", "snapshots")
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = {}
+_fetched_at = 0.0
+_listeners: List[Callable[[Dict[str, int]], None]] = []
+
+
+def _remember(rows: Iterable) -> Dict[str, int]:
+    global _versions, _fetched_at
+    seen = dict(rows)
+    with _lock:
+        _versions = {n: seen.get(n, 0) for n in DATASETS}
+        _fetched_at = time.monotonic()
+        return _versions
+
+
+def bump(db: Session, *names: str):
+    """Advance the given datasets' versions (commits); call once the write itself is committed"""
+    advance = lambda name: db.scalar(
+        update(DataVersion).where(DataVersion.name == name)
+        .values(version=DataVersion.version + 1, updated_at=datetime.utcnow()).returning(DataVersion.version)
+    )
+    produced = {}
+    for name in names:
+        produced[name] = advance(name)
+        if produced[name] is None:
+            try:
+                with db.begin_nested():
+                    db.add(DataVersion(name=name, version=1))
+                produced[name] = 1
+            except IntegrityError:
+                # Another worker created the row first
+                produced[name] = advance(name)
+    db.commit()
+    for listener in _listeners:
+        listener(produced)
+    _remember(db.execute(select(DataVersion.name, DataVersion.version)).all())
+
+
+def on_bump(listener: Callable[[Dict[str, int]], None]):
+    """Call listener({name: version}) with the versions each bump() in this process produced"""
+    _listeners.append(listener)
+
+
+async def bump_async(db: AsyncSession, *names: str):
+    """bump for handlers holding an AsyncSession"""
+    await db.run_sync(bump, *names)
+
+
+def _fresh() -> bool:
+    return bool(_versions) and time.monotonic() - _fetched_at < settings.DATA_VERSION_TTL
+
+
+async def current(db: AsyncSession) -> Dict[str, int]:
+    """Dataset versions, read from the DB at most once per DATA_VERSION_TTL"""
+    if _fresh():
+        return _versions
+    return _remember((await db.execute(select(DataVersion.name, DataVersion.version))).all())
+
+
+def read(db: Session) -> Dict[str, int]:
+    """current() for code holding a sync Session"""
+    if _fresh():
+        return _versions
+    return _remember(db.execute(select(DataVersion.name, DataVersion.version)).all())
+
+
+def etag(versions: Dict[str, int], *names: str) -> str:
+    return '"' + "-".join(f"{n[0]}{versions.get(n, 0)}" for n in names) + '"'
@@ -0,0 +1,128 @@
+"""Recall and latency of IVF search against exact search in the vector store.
+
+    cd backend
+    python -m bench.ann --rows 1000000 --nprobe 4,16,32,64 --out ann-results.json
+
+Synthetic unit vectors (a Gaussian mixture, so the space has topic-like
+clusters) are written straight into a scratch store in VECTOR_SEGMENT_ROWS
+segments and an IVF index is trained over them. Each query is timed
+exactly and at every nprobe; recall@k is the share of the exact top-k found.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from .run import _git_commit, _percentile
+
+
+def vectors(rows: int, dim: int, topics: int, seed: int):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(topics, dim)).astype(np.float32)
+    step = 100_000
+    for i in range(0, rows, step):
+        n = min(step, rows - i)
+        x = centers[rng.integers(0, topics, n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+        x /= np.linalg.norm(x, axis=1, keepdims=True)
+        yield i, x
+
+
+def _latency(samples) -> dict:
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+    }
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--dim", type=int, default=128)
+    p.add_argument("--topics", type=int, default=2_000, help="mixture components in the synthetic data")
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument("--nprobe", default="4,8,16,32,64", help="comma-separated nprobe values")
+    p.add_argument("--nlist", type=int, default=0, help="IVF cells (default: about 4*sqrt(rows))")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--dir", help="store directory to reuse (default: a temporary one)")
+    p.add_argument("--out", help="write JSON results here (default: stdout)")
+    args = p.parse_args(argv)
+
+    os.environ["VECTOR_STORE_DIR"] = args.dir or tempfile.mkdtemp(prefix="fi-ann-")
+    os.environ["VECTOR_IVF_MIN_ROWS"] = "0"  # trained explicitly below
+    import numpy as np
+    from app.services import vectorstore
+    from app.settings import settings
+
+    version = "bench:synthetic"
+    started = time.perf_counter()
+    manifest = vectorstore.read_manifest(vectorstore.space_dir(version))
+    if sum(s["rows"] for s in manifest["segments"]) != args.rows:
+        docs = {"d": (None, None)}
+        pending = []
+        for i, x in vectors(args.rows, args.dim, args.topics, args.seed):
+            pending.extend({"chunk_id": f"c{i + j}", "doc_id": "d", "vec": v} for j, v in enumerate(x))
+            if len(pending) >= settings.VECTOR_SEGMENT_ROWS or i + len(x) >= args.rows:
+                vectorstore.add(version, pending, docs, synced=True)
+                pending = []
+    load_seconds = time.perf_counter() - started
+    print(f"{'load':30s} {load_seconds:9.2f} s", file=sys.stderr)
+
+    started = time.perf_counter()
+    index = vectorstore.train(version, args.nlist)
+    train_seconds = time.perf_counter() - started
+    print(f"{'train (nlist %d)' % index['nlist']:30s} {train_seconds:9.2f} s", file=sys.stderr)
+
+    # Queries are fresh draws from the same mixture, not stored rows
+    queries = next(vectors(args.queries, args.dim, args.topics, args.seed + 1))[1]
+    # Warm the page cache and the mapped files before timing
+    vectorstore.search(version, queries[0], args.k, nprobe=0)
+
+    exact, truth = [], []
+    for q in queries:
+        t = time.perf_counter()
+        hits = vectorstore.search(version, q, args.k, nprobe=0)
+        exact.append(time.perf_counter() - t)
+        truth.append({h[1] for h in hits})
+    results = {"exact": {"nprobe": 0, "recall": 1.0, **_latency(exact)}}
+    print(f"{'exact':30s} recall 1.000  p50 {results['exact']['p50_ms']:9.2f} ms  p99 {results['exact']['p99_ms']:9.2f} ms", file=sys.stderr)
+
+    for nprobe in [int(n) for n in args.nprobe.split(",") if n]:
+        samples, found = [], []
+        for q, want in zip(queries, truth):
+            t = time.perf_counter()
+            hits = vectorstore.search(version, q, args.k, nprobe=nprobe)
+            samples.append(time.perf_counter() - t)
+            found.append(len(want & {h[1] for h in hits}) / max(len(want), 1))
+        r = results[f"nprobe={nprobe}"] = {"nprobe": nprobe, "recall": round(float(np.mean(found)), 4), **_latency(samples)}
+        r["speedup_p50"] = round(results["exact"]["p50_ms"] / max(r["p50_ms"], 1e-9), 2)
+        print(f"{'nprobe=%d' % nprobe:30s} recall {r['recall']:.3f}  p50 {r['p50_ms']:9.2f} ms  p99 {r['p99_ms']:9.2f} ms", file=sys.stderr)
+    vectorstore.close_pool()
+
+    report = {
+        "meta": {
+            "rows": args.rows, "dim": args.dim, "topics": args.topics, "queries": args.queries, "k": args.k,
+            "nlist": index["nlist"], "segments": len(vectorstore.read_manifest(vectorstore.space_dir(version))["segments"]),
+            "load_seconds": round(load_seconds, 3), "train_seconds": round(train_seconds, 3),
+            "cpus": os.cpu_count(), "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
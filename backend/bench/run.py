@@ -0,0 +1,437 @@
+"""Benchmark the hot API endpoints in-process against a synthetic dataset.
+
+    cd backend
+    python -m bench.run --scale small --out bench-results.json
+    python -m bench.run --scale small --baseline bench-results.json --threshold 0.25
+
+The app is imported after DATABASE_URL points at a scratch SQLite file, so the
+real engine, middleware and handlers are exercised through TestClient. Cold
+import time is checked too (see bench.startup), and the list endpoints are
+fetched with JSON_FAST_PATH on and off to confirm identical bytes. A burst
+check times cheap dashboard reads while clients loop on heavy routes. Exits
+non-zero when a case's median regresses past the threshold, a request fails,
+the JSON bytes differ, a cheap read fails under the burst or startup is over
+budget.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+SCALES = {
+    # loans, documents, documents pre-chunked for RAG queries, rows per ingest upload, files per ZIP package,
+    # portfolios and compliance rules (each)
+    "tiny": dict(loans=1_000, docs=50, chunked=50, ingest_rows=500, ingest_docs=200, admin_rows=50),
+    "small": dict(loans=20_000, docs=500, chunked=300, ingest_rows=5_000, ingest_docs=1_000, admin_rows=500),
+    "medium": dict(loans=200_000, docs=3_000, chunked=1_000, ingest_rows=50_000, ingest_docs=5_000, admin_rows=2_000),
+    "large": dict(loans=1_000_000, docs=10_000, chunked=3_000, ingest_rows=200_000, ingest_docs=5_000, admin_rows=5_000),
+}
+
+CASES: List[tuple] = []
+
+# Must render byte-identically with JSON_FAST_PATH on and off (page_size 5000 is streamed)
+IDENTICAL = [
+    "/api/loans/search?page_size=50&status=delinquent",
+    "/api/loans/search?page_size=5000&page=2",
+    "/api/documents?page_size=200",
+    "/api/documents?page_size=2000",
+    "/api/portfolios?page_size=200",
+    "/api/compliance/rules?page_size=200",
+]
+
+
+def case(name: str):
+    """Register fn(client, ctx, i) -> response as a timed benchmark case"""
+    def register(fn: Callable):
+        CASES.append((name, fn))
+        return fn
+    return register
+
+
+@case("ingest_loans")
+def _ingest_loans(client, ctx, i):
+    # New loans as a correction file (full=false), so the seeded book is not marked removed
+    return client.post("/api/ingest/loans", data={"full": "false"}, files={"file": ("bench.csv", ctx["ingest_csv"], "text/csv")})
+
+
+@case("ingest_loans_monthly")
+def _ingest_monthly(client, ctx, i):
+    # Full-book tapes alternating with a copy where 5% of loans moved; each reload writes only those
+    tape = ctx["monthly_csv"][i % 2]
+    return client.post("/api/ingest/loans", data={"full": "true"}, files={"file": ("tape.csv", tape, "text/csv")})
+
+
+@case("ingest_documents_zip")
+def _ingest_documents_zip(client, ctx, i):
+    return client.post("/api/ingest/documents:batch", data={"process": "false"},
+                       files={"files": ("bench.zip", ctx["docs_zip"], "application/zip")})
+
+
+@case("loans_search_filter")
+def _search_filter(client, ctx, i):
+    return client.get("/api/loans/search", params={"status": "delinquent", "page": 1 + i % 5, "page_size": 50})
+
+
+@case("loans_search_risk")
+def _search_risk(client, ctx, i):
+    return client.get("/api/loans/search", params={"risk_min": 0.5, "delinquency_min": 30, "page_size": 50})
+
+
+@case("loans_search_text")
+def _search_text(client, ctx, i):
+    return client.get("/api/loans/search", params={"q": "BL000%d" % (i % 10), "page_size": 50})
+
+
+@case("loans_search_page_5000")
+def _search_page(client, ctx, i):
+    # Export-sized page: rows streamed straight from the cursor
+    return client.get("/api/loans/search", params={"page": 1 + i % 3, "page_size": 5000})
+
+
+@case("loans_summary")
+def _summary(client, ctx, i):
+    return client.get("/api/loans/summary")
+
+
+@case("loans_summary_revalidate")
+def _summary_revalidate(client, ctx, i):
+    # Dashboard re-fetch with the ETag from the last response; answered 304 from the version counters
+    if "summary_etag" not in ctx:
+        ctx["summary_etag"] = client.get("/api/loans/summary").headers["etag"]
+    return client.get("/api/loans/summary", headers={"If-None-Match": ctx["summary_etag"]})
+
+
+@case("portfolio_analytics")
+def _analytics(client, ctx, i):
+    return client.get("/api/portfolio/analytics")
+
+
+@case("portfolio_analytics_filtered")
+def _analytics_pf(client, ctx, i):
+    return client.get("/api/portfolio/analytics", params={"portfolio_id": "PF-%d" % (i % 4)})
+
+
+@case("documents_list_page")
+def _documents_page(client, ctx, i):
+    return client.get("/api/documents", params={"page_size": 500})
+
+
+@case("portfolios_list")
+def _portfolios(client, ctx, i):
+    return client.get("/api/portfolios", params={"page_size": 500})
+
+
+@case("compliance_rules_list")
+def _rules(client, ctx, i):
+    return client.get("/api/compliance/rules", params={"page_size": 500})
+
+
+@case("analytics_history_month")
+def _history(client, ctx, i):
+    # 24 months of daily snapshots downsampled to month-ends
+    return client.get("/api/portfolio/analytics/history", params={"portfolio_id": "PF-%d" % (i % 4), "interval": "month"})
+
+
+@case("rag_index")
+def _rag_index(client, ctx, i):
+    docs = ctx["unchunked_docs"] or ctx["doc_ids"]
+    return client.post(f"/api/rag/index/{docs[i % len(docs)]}")
+
+
+@case("rag_query")
+def _rag_query(client, ctx, i):
+    queries = ["escrow shortage amount", "prepetition arrearage", "trustee notice of payment change", "loan modification forbearance"]
+    return client.post("/api/rag/query", json={"q": queries[i % len(queries)], "limit": 10})
+
+
+def populate(scale: dict, seed: int) -> dict:
+    """Create the schema and bulk-load the synthetic dataset; returns case context"""
+    from datetime import timedelta
+    from sqlalchemy import insert, select
+    from app.db import Base, SessionLocal, engine
+    from app.models import Loan, Document, DocChunk, Portfolio, ComplianceRule, PortfolioSnapshot
+    from app.services.textstore import chunk_rows
+    from app.services import snapshots, vectorstore
+    from app.services.ingestion import fingerprint
+    from . import synthetic
+
+    Base.metadata.create_all(bind=engine)
+    loans = synthetic.loan_rows(scale["loans"], seed)
+    for r in loans:
+        r["tape_hash"] = fingerprint(r, synthetic.LOAN_COLUMNS)
+    docs = synthetic.document_rows(loans, scale["docs"], seed)
+    db = SessionLocal()
+    try:
+        for i in range(0, len(loans), 20_000):
+            db.execute(insert(Loan), loans[i:i + 20_000])
+        if docs:
+            db.execute(insert(Document), docs)
+        if scale["admin_rows"]:
+            db.execute(insert(Portfolio), synthetic.portfolio_rows(scale["admin_rows"], seed))
+            db.execute(insert(ComplianceRule), synthetic.rule_rows(scale["admin_rows"], seed))
+        chunks = chunk_rows(db, [(d["doc_id"], d["extracted_text"]) for d in docs[:scale["chunked"]]])
+        if chunks:
+            db.execute(insert(DocChunk), chunks)
+        db.commit()
+        for version in {c["embedding_model"] for c in chunks}:
+            vectorstore.rebuild(db, version)
+        # Today's snapshot, back-dated daily over two years
+        snapshots.take(db)
+        today = [dict(r._mapping) for r in db.execute(select(PortfolioSnapshot.__table__))]
+        db.execute(insert(PortfolioSnapshot), [{**r, "as_of": r["as_of"] - timedelta(days=d)} for d in range(1, 730) for r in today])
+        db.commit()
+    finally:
+        db.close()
+    ingest = synthetic.loan_rows(scale["ingest_rows"], seed + 7, start=scale["loans"])
+    return {
+        "ingest_csv": synthetic.loans_csv(ingest),
+        "monthly_csv": [synthetic.loans_csv(synthetic.next_month(loans, 0.05, seed + 13)), synthetic.loans_csv(loans)],
+        "docs_zip": synthetic.documents_zip(loans, scale["ingest_docs"], seed + 11),
+        "doc_ids": [d["doc_id"] for d in docs],
+        "unchunked_docs": [d["doc_id"] for d in docs[scale["chunked"]:]],
+        "chunks": len(chunks),
+    }
+
+
+def _percentile(xs: List[float], q: float) -> float:
+    xs = sorted(xs)
+    k = (len(xs) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+def time_case(client, ctx, fn, repeat: int, warmup: int) -> dict:
+    errors = []
+    for i in range(warmup):
+        fn(client, ctx, i)
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        r = fn(client, ctx, warmup + i)
+        samples.append(time.perf_counter() - started)
+        if r.status_code >= 400:
+            errors.append(f"{r.status_code}: {r.text[:200]}")
+    return {
+        "n": len(samples),
+        "mean": statistics.fmean(samples),
+        "median": statistics.median(samples),
+        "p95": _percentile(samples, 0.95),
+        "min": min(samples),
+        "max": max(samples),
+        "errors": errors[:5],
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[dict]:
+    """Cases whose median slowed down by more than threshold (a fraction) vs the baseline"""
+    regressions = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b or not b.get("median"):
+            continue
+        ratio = r["median"] / b["median"]
+        if ratio > 1.0 + threshold:
+            regressions.append({"case": name, "baseline": b["median"], "current": r["median"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def check_identical(client, urls: List[str]) -> List[str]:
+    """URLs whose body differs between the JSON fast path and FastAPI's default encoding"""
+    from app.settings import settings
+
+    saved = settings.JSON_FAST_PATH
+    differ = []
+    try:
+        for url in urls:
+            bodies = []
+            for fast in (True, False):
+                settings.JSON_FAST_PATH = fast
+                r = client.get(url)
+                bodies.append((r.status_code, r.content))
+            if bodies[0] != bodies[1] or bodies[0][0] != 200:
+                differ.append(url)
+    finally:
+        settings.JSON_FAST_PATH = saved
+    return differ
+
+
+def check_burst(client, threads: int, samples: int) -> dict:
+    """Cheap dashboard latency idle and while `threads` clients loop on heavy routes.
+
+    Heavy requests may be refused (429/503) by admission control, and their
+    clients then back off for Retry-After; cheap ones must all succeed.
+    """
+    import threading
+    from collections import Counter
+
+    cheap = ["/api/loans/summary", "/api/portfolio/analytics?portfolio_id=PF-1"]
+
+    def timed(n):
+        out, failed = [], 0
+        for i in range(n):
+            started = time.perf_counter()
+            r = client.get(cheap[i % len(cheap)])
+            out.append(time.perf_counter() - started)
+            failed += r.status_code != 200
+        return out, failed
+
+    idle, idle_failed = timed(samples)
+    stop, statuses, lock = threading.Event(), Counter(), threading.Lock()
+
+    def heavy(k):
+        i = 0
+        while not stop.is_set():
+            if (k + i) % 2:
+                r = client.post("/api/rag/query", json={"q": "escrow shortage amount", "limit": 10})
+            else:
+                r = client.get("/api/portfolio/analytics")
+            with lock:
+                statuses[r.status_code] += 1
+            if r.status_code in (429, 503):
+                stop.wait(float(r.headers.get("Retry-After", 1)))  # as a well-behaved client would
+            i += 1
+
+    workers = [threading.Thread(target=heavy, args=(k,), daemon=True) for k in range(threads)]
+    for t in workers:
+        t.start()
+    time.sleep(0.2)
+    try:
+        burst, burst_failed = timed(samples)
+    finally:
+        stop.set()
+        for t in workers:
+            t.join()
+    return {
+        "threads": threads,
+        "cheap_idle_median": statistics.median(idle),
+        "cheap_burst_median": statistics.median(burst),
+        "cheap_burst_p95": _percentile(burst, 0.95),
+        "cheap_failed": idle_failed + burst_failed,
+        "heavy_status": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--scale", choices=sorted(SCALES), default="small")
+    p.add_argument("--loans", type=int)
+    p.add_argument("--docs", type=int)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--repeat", type=int, default=10)
+    p.add_argument("--warmup", type=int, default=2)
+    p.add_argument("--cases", help="comma-separated case names (default: all)")
+    p.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="app setting override, e.g. LOAN_CACHE_ENABLED=true")
+    p.add_argument("--db", help="SQLite file to recreate for the run (default: a temporary file)")
+    p.add_argument("--out", help="write JSON results here (default: stdout)")
+    p.add_argument("--baseline", help="JSON results to compare against")
+    p.add_argument("--threshold", type=float, default=0.25, help="allowed median slowdown vs baseline (0.25 = 25%%)")
+    p.add_argument("--startup-runs", type=int, default=3, help="cold imports to time (0 skips the startup check)")
+    p.add_argument("--burst", type=int, default=8, help="heavy clients for the cheap-latency burst check (0 skips it)")
+    p.add_argument("--app-budget", type=float, default=0.4, help="max median seconds for the app's own imports")
+    args = p.parse_args(argv)
+
+    scale = dict(SCALES[args.scale])
+    if args.loans is not None:
+        scale["loans"] = args.loans
+    if args.docs is not None:
+        scale["docs"] = args.docs
+        scale["chunked"] = min(scale["chunked"], args.docs)
+
+    workdir = tempfile.mkdtemp(prefix="fi-bench-")
+    db_path = args.db or os.path.join(workdir, "bench.db")
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    os.environ["VECTOR_STORE_DIR"] = os.path.join(workdir, "vectors")
+    for kv in args.env:
+        key, _, value = kv.partition("=")
+        os.environ[key] = value
+
+    startup = None
+    if args.startup_runs:
+        from . import startup as startup_check
+        startup = startup_check.measure(args.startup_runs)
+        startup["problems"] = startup_check.check(startup, args.app_budget)
+        print(f"{'startup (app imports)':30s} median {startup['app_median'] * 1000:9.2f} ms", file=sys.stderr)
+
+    started = time.perf_counter()
+    ctx = populate(scale, args.seed)
+    setup_seconds = time.perf_counter() - started
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    selected = set(args.cases.split(",")) if args.cases else None
+    results = {}
+    with TestClient(app) as client:
+        for name, fn in CASES:
+            if selected and name not in selected:
+                continue
+            results[name] = time_case(client, ctx, fn, args.repeat, args.warmup)
+            print(f"{name:30s} median {results[name]['median'] * 1000:9.2f} ms  p95 {results[name]['p95'] * 1000:9.2f} ms", file=sys.stderr)
+        differ = check_identical(client, IDENTICAL)
+        burst = check_burst(client, args.burst, max(args.repeat, 20)) if args.burst else None
+        if burst:
+            print(f"{'cheap reads under burst':30s} median {burst['cheap_burst_median'] * 1000:9.2f} ms  "
+                  f"p95 {burst['cheap_burst_p95'] * 1000:9.2f} ms  (idle {burst['cheap_idle_median'] * 1000:.2f} ms, "
+                  f"heavy {burst['heavy_status']})", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "scale": args.scale, **scale, "chunks": ctx["chunks"], "seed": args.seed,
+            "repeat": args.repeat, "warmup": args.warmup, "env": args.env,
+            "setup_seconds": round(setup_seconds, 3),
+            "commit": _git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+        "startup": startup,
+        "json_mismatches": differ,
+        "burst": burst,
+    }
+    failures = {name: r["errors"][0] for name, r in results.items() if r["errors"]}
+    if differ:
+        failures["json"] = "fast-path bytes differ for " + ", ".join(differ)
+    if burst and (burst["cheap_failed"] or set(burst["heavy_status"]) - {"200", "429", "503"}):
+        failures["burst"] = f"{burst['cheap_failed']} cheap reads failed, heavy statuses {burst['heavy_status']}"
+    if startup and startup["problems"]:
+        failures["startup"] = "; ".join(startup["problems"])
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ("loans", "docs", "chunked", "ingest_rows", "ingest_docs", "admin_rows"):
+            if baseline["meta"].get(key) != report["meta"][key]:
+                print(f"warning: baseline {key}={baseline['meta'].get(key)} differs from this run ({report['meta'][key]})", file=sys.stderr)
+        report["regressions"] = compare(results, baseline["results"], args.threshold)
+        for r in report["regressions"]:
+            print(f"REGRESSION {r['case']}: {r['baseline'] * 1000:.2f} ms -> {r['current'] * 1000:.2f} ms (x{r['ratio']})", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    for name, error in failures.items():
+        print(f"FAILED {name}: {error}", file=sys.stderr)
+    return 1 if failures or report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
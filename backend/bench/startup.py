@@ -0,0 +1,83 @@
+"""Cold-start budget: time `import app.main` in fresh interpreters.
+
+    python -m bench.startup --app-budget 0.4 --budget 1.0
+
+The framework stack (FastAPI, pydantic, SQLAlchemy) is imported first and
+timed separately, so the app's own share can be budgeted on any machine.
+Fails when a median exceeds its budget or when a module that should load
+lazily is already imported once the app is ready.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Deferred until a request needs them; importing any of these at startup is a regression
+LAZY_MODULES = ("numpy", "scipy", "pdfminer", "sklearn", "pandas", "pyarrow", "sentence_transformers")
+
+FRAMEWORK = "fastapi, fastapi.testclient, pydantic_settings, sqlalchemy.orm, sqlalchemy.ext.asyncio"
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import %s
+t1 = time.perf_counter()
+import app.main
+t2 = time.perf_counter()
+print(json.dumps({"framework": t1 - t0, "app": t2 - t1, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def measure(runs: int = 5, env: dict = None) -> dict:
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    framework, own, loaded = [], [], set()
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE % (FRAMEWORK, LAZY_MODULES)],
+            cwd=backend, env={**os.environ, **(env or {})},
+            capture_output=True, text=True, check=True,
+        ).stdout
+        probe = json.loads(out.strip().splitlines()[-1])
+        framework.append(probe["framework"])
+        own.append(probe["app"])
+        loaded.update(probe["loaded"])
+    total = [a + b for a, b in zip(framework, own)]
+    return {
+        "runs": runs,
+        "framework_median": statistics.median(framework),
+        "app_median": statistics.median(own),
+        "total_median": statistics.median(total),
+        "total_max": max(total),
+        "eager_heavy_modules": sorted(loaded),
+    }
+
+
+def check(res: dict, app_budget: float, budget: float = None) -> list:
+    problems = []
+    if res["app_median"] > app_budget:
+        problems.append(f"app import {res['app_median']:.3f}s exceeds budget {app_budget}s")
+    if budget is not None and res["total_median"] > budget:
+        problems.append(f"total import {res['total_median']:.3f}s exceeds budget {budget}s")
+    if res["eager_heavy_modules"]:
+        problems.append(f"imported at startup: {', '.join(res['eager_heavy_modules'])}")
+    return problems
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--app-budget", type=float, default=0.4, help="max median seconds for the app's own imports")
+    p.add_argument("--budget", type=float, help="max median seconds for the whole import, framework included")
+    args = p.parse_args(argv)
+    res = measure(args.runs)
+    print(json.dumps(res, indent=2))
+    problems = check(res, args.app_budget, args.budget)
+    for msg in problems:
+        print(msg, file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
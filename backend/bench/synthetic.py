@@ -0,0 +1,171 @@
+"""Synthetic loan tapes and document corpora for benchmarks"""
+import csv
+import hashlib
+import io
+import zipfile
+from datetime import date, timedelta
+from typing import Dict, List
+
+import numpy as np
+
+GEOGRAPHIES = ["CA", "TX", "FL", "NY", "IL", "PA", "OH", "GA", "NC", "MI", "AZ", "WA", "NJ", "VA", "CO"]
+GEO_WEIGHTS = np.array([12, 9, 7, 6, 4, 4, 3.5, 3.3, 3.2, 3, 2.3, 2.3, 2.8, 2.6, 1.9])
+SERVICERS = ["SVC-%03d" % i for i in range(12)]
+TERMS = np.array([180, 240, 360])
+TERM_WEIGHTS = np.array([0.15, 0.05, 0.80])
+# (status, share, delinquency range in days)
+STATUSES = [
+    ("current", 0.86, (0, 0)),
+    ("delinquent", 0.08, (30, 89)),
+    ("default", 0.03, (90, 720)),
+    ("foreclosure", 0.02, (120, 900)),
+    ("paid_off", 0.01, (0, 0)),
+]
+LOAN_COLUMNS = ["loan_id", "orig_date", "balance", "rate", "term", "status", "delinquency_days",
+                "servicer_id", "collateral_id", "geography", "risk_score", "portfolio_id"]
+
+FILLER = (
+    "payment escrow arrears mortgage servicer borrower trustee chapter bankruptcy plan claim interest principal "
+    "statement notice account property tax insurance shortage amount due creditor filing court district schedule "
+    "modification forbearance deficiency collateral lien title appraisal balance late fee cure default"
+).split()
+FIRST = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth"]
+LAST = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez"]
+
+
+def loan_id(i: int) -> str:
+    return "BL%08d" % i
+
+
+def loan_rows(n: int, seed: int = 0, portfolios: int = 4, start: int = 0) -> List[Dict]:
+    """Loan records with roughly agency-like field distributions"""
+    rng = np.random.default_rng(seed)
+    balance = np.round(np.clip(rng.lognormal(np.log(240_000), 0.55, n), 20_000, 2_500_000), 2)
+    rate = np.round(np.clip(rng.normal(5.8, 1.3, n), 2.0, 11.0), 3)
+    term = rng.choice(TERMS, n, p=TERM_WEIGHTS)
+    age_days = rng.integers(30, 15 * 365, n)
+    geo = rng.choice(len(GEOGRAPHIES), n, p=GEO_WEIGHTS / GEO_WEIGHTS.sum())
+    servicer = rng.integers(0, len(SERVICERS), n)
+    status_idx = rng.choice(len(STATUSES), n, p=[s[1] for s in STATUSES])
+    risk = np.round(rng.beta(2, 8, n), 4)
+    scored = rng.random(n) < 0.7
+    today = date.today()
+
+    rows = []
+    for j in range(n):
+        status, _, (lo, hi) = STATUSES[status_idx[j]]
+        dpd = int(rng.integers(lo, hi + 1)) if hi else 0
+        # Delinquent loans skew riskier
+        r = min(float(risk[j]) + dpd / 1000.0, 0.99)
+        rows.append({
+            "loan_id": loan_id(start + j),
+            "orig_date": today - timedelta(days=int(age_days[j])),
+            "balance": float(balance[j]),
+            "rate": float(rate[j]),
+            "term": int(term[j]),
+            "status": status,
+            "delinquency_days": dpd,
+            "servicer_id": SERVICERS[servicer[j]],
+            "collateral_id": "COL%08d" % (start + j),
+            "geography": GEOGRAPHIES[geo[j]],
+            "risk_score": r if scored[j] else None,
+            "portfolio_id": "PF-%d" % (j % portfolios) if portfolios else None,
+        })
+    return rows
+
+
+def loans_csv(rows: List[Dict]) -> bytes:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=LOAN_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for r in rows:
+        writer.writerow({k: ("" if r.get(k) is None else r[k]) for k in LOAN_COLUMNS})
+    return buf.getvalue().encode()
+
+
+def document_text(rng: np.random.Generator, loan: Dict, words: int = 1500) -> str:
+    """A 410A-like filing: structured header fields followed by filler prose"""
+    debtor = f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+    arrears = float(rng.uniform(500, 40_000))
+    header = (
+        f"Case No. {int(rng.integers(10, 25))}-{int(rng.integers(10000, 99999))} "
+        f"Debtor: {debtor}. Loan {loan['loan_id']} serviced by {loan['servicer_id']}. "
+        f"Total prepetition arrearage: ${arrears:,.2f}. "
+        f"Escrow shortage: ${arrears * 0.2:,.2f}. Monthly escrow payment: ${rng.uniform(150, 900):,.2f}. "
+    )
+    body = " ".join(rng.choice(FILLER, words))
+    return header + body
+
+
+def document_rows(loans: List[Dict], n: int, seed: int = 0, words: int = 1500) -> List[Dict]:
+    rng = np.random.default_rng(seed + 1)
+    picks = rng.choice(len(loans), n, replace=n > len(loans)) if loans else []
+    out = []
+    for k, j in enumerate(picks):
+        loan = loans[j]
+        text = document_text(rng, loan, words)
+        out.append({
+            "doc_id": "BD%08d" % k,
+            "loan_id": loan["loan_id"],
+            "type": "410A" if rng.random() < 0.6 else "statement",
+            "path": "bench/%08d.pdf" % k,
+            "sha256": hashlib.sha256(text.encode()).hexdigest(),
+            "extracted_text": text,
+            "text_preview": text[:280],
+            "text_length": len(text),
+            "processing_status": "extracted",
+        })
+    return out
+
+
+def documents_zip(loans: List[Dict], n: int, seed: int = 0, words: int = 300) -> bytes:
+    """A servicer-style package: text files named <loan_id>_<type>_<n>.txt"""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for k, d in enumerate(document_rows(loans, n, seed, words)):
+            zf.writestr(f"{d['loan_id']}_{d['type']}_{k}.txt", d["extracted_text"])
+    return buf.getvalue()
+
+
+def portfolio_rows(n: int, seed: int = 0) -> List[Dict]:
+    """Portfolio records; the first ones carry the PF-<n> ids loan_rows assigns"""
+    rng = np.random.default_rng(seed + 3)
+    return [{
+        "portfolio_id": "PF-%d" % k,
+        "name": "Pool %d" % k,
+        "description": "Synthetic pool %d" % k if k % 3 else None,
+        "strategy": ["core", "opportunistic", "distressed"][k % 3],
+        "target_yield": float(np.round(rng.uniform(4.0, 9.0), 3)),
+        "risk_tolerance": ["conservative", "moderate", "aggressive"][k % 3],
+        "total_value": float(np.round(rng.lognormal(np.log(5e7), 1.0), 2)) if k % 4 else None,
+        "weighted_average_rate": float(np.round(rng.normal(5.8, 0.6), 4)),
+        "average_delinquency": float(np.round(rng.uniform(0, 45), 2)),
+        "compliance_score": float(np.round(rng.uniform(0.6, 1.0), 4)),
+    } for k in range(n)]
+
+
+def rule_rows(n: int, seed: int = 0) -> List[Dict]:
+    """Compliance rules with small JSON rule_logic payloads"""
+    rng = np.random.default_rng(seed + 5)
+    return [{
+        "rule_id": "BR%06d" % k,
+        "name": "Rule %d" % k,
+        "description": " ".join(FILLER[k % 10:k % 10 + 12]),
+        "rule_type": ["regulatory", "investor", "internal"][k % 3],
+        "rule_logic": {"field": "delinquency_days", "op": ">", "value": int(rng.integers(30, 180)),
+                       "weight": float(np.round(rng.random(), 3)), "states": GEOGRAPHIES[:k % 5]},
+        "severity": ["low", "medium", "high"][k % 3],
+        "is_active": bool(k % 7),
+    } for k in range(n)]
+
+
+def next_month(rows: List[Dict], changed: float = 0.05, seed: int = 0) -> List[Dict]:
+    """A copy of the tape with `changed` of the loans paid down and rolled a bucket further delinquent"""
+    rng = np.random.default_rng(seed)
+    out = [dict(r) for r in rows]
+    for j in rng.choice(len(out), int(len(out) * changed), replace=False):
+        r = out[j]
+        r["balance"] = round(r["balance"] * 0.995, 2)
+        r["delinquency_days"] += 30
+        r["status"] = "delinquent" if r["delinquency_days"] < 90 else "default"
+    return out
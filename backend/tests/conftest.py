@@ -0,0 +1,42 @@
+"""Tests run the app against a throwaway SQLite database.
+
+Settings are read when app.settings is first imported, so the environment is
+pointed at a temp directory here, before any test module imports the app.
+"""
+import os
+import tempfile
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="fixed-income-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_tmp}/test.db",
+    "SCHEMA_AUTO_CREATE": "true",
+    "UPLOAD_DIR": os.path.join(_tmp, "uploads"),
+    "VECTOR_STORE_DIR": os.path.join(_tmp, "vectors"),
+    "SNAPSHOT_SCHEDULE": "false",
+    "DATA_VERSION_TTL": "0",
+})
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def db(client):
+    """Sync session on the test database; every table is emptied afterwards"""
+    from app.db import Base, SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for table in reversed(Base.metadata.sorted_tables):
+            session.execute(table.delete())
+        session.commit()
+        session.close()
@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.settings import settings
+from app.utils import admission
+
+HEAVY_SECONDS = 0.5
+
+
+def _app():
+    app = FastAPI()
+
+    @app.get("/heavy")
+    async def heavy():
+        await asyncio.sleep(HEAVY_SECONDS)
+        return {"ok": True}
+
+    @app.get("/cheap")
+    async def cheap():
+        return {"ok": True}
+
+    return admission.AdmissionMiddleware(app, routes={"GET /heavy": admission.HEAVY})
+
+
+def test_burst_is_refused_and_cheap_reads_stay_fast(monkeypatch):
+    # One slot and one queue place: a burst of six gets one 200, one 503 (waited
+    # longer than ADMISSION_HEAVY_WAIT) and four 429s (queue full)
+    monkeypatch.setitem(admission.GATES, admission.HEAVY, admission.Gate(admission.HEAVY, 1, 1, 0.2, 0))
+
+    async def burst():
+        transport = httpx.ASGITransport(app=_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            heavy = [asyncio.create_task(client.get("/heavy")) for _ in range(6)]
+            await asyncio.sleep(0.05)
+            cheap = []
+            for _ in range(5):
+                started = time.perf_counter()
+                r = await client.get("/cheap")
+                cheap.append((r.status_code, time.perf_counter() - started))
+            return await asyncio.gather(*heavy), cheap
+
+    heavy, cheap = asyncio.run(burst())
+    assert sorted(r.status_code for r in heavy) == [200, 429, 429, 429, 429, 503]
+    for r in heavy:
+        if r.status_code != 200:
+            assert int(r.headers["Retry-After"]) >= 1
+    # Cheap reads are never queued behind the heavy one holding the slot
+    assert all(status == 200 for status, _ in cheap)
+    assert max(seconds for _, seconds in cheap) < HEAVY_SECONDS / 2
+    assert admission.GATES[admission.HEAVY].active == 0
+
+
+def test_default_caps_follow_cpus_and_pool(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_HEAVY_LIMIT", 0)
+    monkeypatch.setattr(settings, "ADMISSION_HEAVY_QUEUE", 0)
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 10)
+    monkeypatch.setattr(admission.os, "cpu_count", lambda: 16)
+    gate = admission._gate(admission.HEAVY)
+    assert (gate.limit, gate.queue) == (5, 10)
+    monkeypatch.setattr(admission.os, "cpu_count", lambda: 1)
+    gate = admission._gate(admission.HEAVY)
+    assert (gate.limit, gate.queue) == (1, 2)
+    monkeypatch.setattr(settings, "ADMISSION_HEAVY_LIMIT", 3)
+    assert admission._gate(admission.HEAVY).limit == 3
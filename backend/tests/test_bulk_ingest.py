@@ -0,0 +1,129 @@
+import io
+import os
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+
+from app.models import DocChunk, Document, Loan
+from app.services import bulk_ingest
+from app.settings import settings
+from app.utils import jobs
+
+PATTERN = settings.BULK_FILENAME_PATTERN
+
+
+def _zip(files: dict) -> SimpleNamespace:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, data in files.items():
+            z.writestr(name, data)
+    return SimpleNamespace(filename="pkg.zip", size=buf.tell(), file=buf)
+
+
+def _upload(name: str, data: bytes, size=None) -> SimpleNamespace:
+    return SimpleNamespace(filename=name, size=size, file=io.BytesIO(data))
+
+
+def _stored_files() -> set:
+    return set(os.listdir(settings.UPLOAD_DIR)) if os.path.isdir(settings.UPLOAD_DIR) else set()
+
+
+def _docs(db) -> dict:
+    return {d.meta["filename"]: d for d in db.scalars(select(Document))}
+
+
+@pytest.fixture
+def loans(db):
+    db.add_all([Loan(loan_id="L1", balance=1.0), Loan(loan_id="L2", balance=1.0)])
+    db.commit()
+
+
+def test_resolve_prefers_manifest_over_pattern():
+    rx = bulk_ingest.compile_pattern(PATTERN)
+    manifest = bulk_ingest.read_manifest("filename,loan_id,doc_type\nsub/L1_statement.txt,L2,410a\nonly_type.txt,,notice\n")
+    assert bulk_ingest.resolve("pkg/L1_statement.txt", manifest, rx, None, "generic") == ("L2", "410A")
+    assert bulk_ingest.resolve("only_type.txt", manifest, rx, "L9", "generic") == ("L9", "notice")
+    assert bulk_ingest.resolve("pkg/L1-410A.pdf", manifest, rx, None, "generic") == ("L1", "410A")
+    assert bulk_ingest.resolve("L1.pdf", {}, rx, None, "generic") == ("L1", "generic")
+    assert bulk_ingest.resolve("-weird-.pdf", {}, rx, "L5", "claim") == ("L5", "claim")
+    with pytest.raises(ValueError):
+        bulk_ingest.compile_pattern(r"(?P<loan>\w+)")
+    with pytest.raises(ValueError):
+        bulk_ingest.read_manifest("name,loan_id\nx,L1\n")
+
+
+def test_zip_ingest_links_skips_junk_and_leaves_unknown_loans_unlinked(db, loans):
+    package = _zip({
+        "pkg/L1_410A.txt": "Proof of claim for L1",
+        "pkg/L3_statement.txt": "Loan L3 is not on the book",
+        "pkg/mapped.txt": "Mapped through the manifest",
+        "pkg/.DS_Store": "junk",
+        "__MACOSX/pkg/._L1_410A.txt": "junk",
+        "pkg/empty/": "",
+        "manifest.csv": "filename,loan_id,doc_type\nmapped.txt,L2,statement\n",
+    })
+    res = bulk_ingest.ingest_uploads(db, [package], pattern=PATTERN)
+
+    assert (res["documents"], res["linked"], res["unlinked"], res["errors"]) == (3, 2, ["pkg/L3_statement.txt"], [])
+    assert res["loan_ids_410a"] == ["L1"]
+    docs = _docs(db)
+    assert set(docs) == {"pkg/L1_410A.txt", "pkg/L3_statement.txt", "pkg/mapped.txt"}
+    assert (docs["pkg/L1_410A.txt"].loan_id, docs["pkg/L1_410A.txt"].type) == ("L1", "410A")
+    assert (docs["pkg/mapped.txt"].loan_id, docs["pkg/mapped.txt"].type) == ("L2", "statement")
+    assert docs["pkg/L3_statement.txt"].loan_id is None
+    with open(docs["pkg/mapped.txt"].path, "rb") as f:
+        assert f.read() == b"Mapped through the manifest"
+
+
+def test_declared_limits_refuse_the_batch(db):
+    files = [_upload(f"L1_{i}.txt", b"x", size=1) for i in range(3)]
+    with pytest.raises(ValueError, match="3 files"):
+        bulk_ingest.ingest_uploads(db, files, max_files=2, pattern=PATTERN)
+    with pytest.raises(ValueError, match="expands to 3 bytes"):
+        bulk_ingest.ingest_uploads(db, files, max_bytes=2, pattern=PATTERN)
+
+
+def test_copied_bytes_are_capped_whatever_the_declared_size(db, loans):
+    before = _stored_files()
+    # Multipart parts often declare no size, so only the copy can enforce the limits
+    files = [_upload("L1_a.txt", b"x" * 10), _upload("L1_big.txt", b"x" * 100), _upload("L2_b.txt", b"y" * 10)]
+    res = bulk_ingest.ingest(db, bulk_ingest.upload_entries(files), pattern=PATTERN, max_file_bytes=50)
+    assert res["documents"] == 2
+    assert res["errors"] == ["L1_big.txt: File is larger than 50 bytes"]
+    assert len(_stored_files() - before) == 2
+
+    files = [_upload(f"L1_{i}.txt", b"z" * 40) for i in range(3)]
+    with pytest.raises(ValueError, match="past 100 bytes"):
+        bulk_ingest.ingest(db, bulk_ingest.upload_entries(files), pattern=PATTERN, max_bytes=100, workers=1)
+    assert len(_stored_files() - before) == 2
+    assert len(_docs(db)) == 2
+
+
+def test_failed_insert_removes_stored_files(db, loans, monkeypatch):
+    before = _stored_files()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("ledger unavailable")
+
+    monkeypatch.setattr(bulk_ingest, "append_event", fail)
+    with pytest.raises(RuntimeError):
+        bulk_ingest.ingest_uploads(db, [_zip({"L1_410A.txt": "a", "L2_note.txt": "b"})], pattern=PATTERN)
+    assert _stored_files() == before
+    assert _docs(db) == {}
+
+
+def test_process_documents_extracts_and_indexes(db, loans):
+    res = bulk_ingest.ingest_uploads(db, [_zip({
+        "L1_410A.txt": "Escrow shortage: $1,200.00. Debtor: Jane Roe.",
+        "L2_scan.png": b"\x89PNG",
+    })], pattern=PATTERN)
+    job = jobs.create_job({"documents": len(res["doc_ids"])})
+    summary = bulk_ingest.process_documents(db, job, res["doc_ids"])
+
+    assert summary == {"extracted": 1, "indexed": 1, "chunks": 1, "failed": 0, "skipped": 1}
+    assert (job["status"], job["progress"], job["result"]) == ("completed", 1.0, summary)
+    doc = _docs(db)["L1_410A.txt"]
+    assert (doc.processing_status, doc.extracted_text) == ("indexed", "Escrow shortage: $1,200.00. Debtor: Jane Roe.")
+    assert db.scalars(select(DocChunk.doc_id)).all() == [doc.doc_id]
@@ -0,0 +1,71 @@
+import json
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.models import Loan
+from app.services import cashflow
+
+AS_OF = date(2024, 11, 15)
+
+
+def _row(balance=100_000.0, rate=0.06, term=360, orig_date=None, delinquency_days=0):
+    return SimpleNamespace(balance=balance, rate=rate, term=term, orig_date=orig_date, delinquency_days=delinquency_days)
+
+
+def test_loan_arrays_normalizes_rates_and_ages_terms():
+    arrays = cashflow.loan_arrays([_row(rate=6.0, orig_date=date(2023, 11, 1)), _row(balance=None, term=None)], AS_OF)
+    np.testing.assert_allclose(arrays["rate"], [0.06, 0.06])
+    np.testing.assert_allclose(arrays["remaining"], [348, cashflow.DEFAULT_TERM])
+    np.testing.assert_allclose(arrays["balance"], [100_000, 0])
+
+
+def test_level_payment_amortization_without_prepay_or_default():
+    a = cashflow.Assumptions(cpr=0, cdr=0, periods=12)
+    out = cashflow.project(cashflow.loan_arrays([_row(term=12)], AS_OF), a)
+    r = 0.06 / 12
+    payment = 100_000 * r / (1 - (1 + r) ** -12)
+    np.testing.assert_allclose(out["cash_flow"][0], payment)
+    assert out["balance"][0, -1] == pytest.approx(0, abs=1e-6)
+    assert out["scheduled_principal"][0].sum() == pytest.approx(100_000)
+
+
+def test_principal_is_conserved_and_seriously_delinquent_loans_default_first():
+    a = cashflow.Assumptions(periods=360)
+    rows = [_row(), _row(rate=0, term=120), _row(delinquency_days=45), _row(delinquency_days=120)]
+    out = cashflow.project(cashflow.loan_arrays(rows, AS_OF), a)
+    paid = out["scheduled_principal"] + out["prepayment"] + out["default"]
+    np.testing.assert_allclose(paid.sum(axis=1) + out["balance"][:, -1], 100_000)
+    np.testing.assert_allclose(out["default"][3], [100_000] + [0] * 359)
+    assert out["default"][2, 1] > out["default"][0, 1]
+    np.testing.assert_allclose(out["loss"], out["default"] * a.severity)
+
+    totals = cashflow.project(cashflow.loan_arrays(rows, AS_OF), a, by_loan=False)
+    for k in cashflow.FLOWS:
+        np.testing.assert_allclose(totals[k], out[k].sum(axis=0))
+
+
+def test_portfolio_projection_is_chunk_and_worker_invariant(db):
+    db.add_all([Loan(loan_id=f"L{i}", balance=10_000.0 * i, rate=4 + i / 2, term=240, delinquency_days=15 * i) for i in range(1, 6)])
+    db.add(Loan(loan_id="L9", balance=1e6, rate=0.05, term=360, status="removed"))
+    db.commit()
+    a = cashflow.Assumptions(periods=24, as_of=AS_OF)
+    whole = cashflow.project_portfolio(db, a)
+    pooled = cashflow.project_portfolio(db, a, chunk_size=2, workers=2)
+    for k in cashflow.FLOWS:
+        np.testing.assert_allclose(pooled[k], whole[k])
+    assert whole["balance"][0] < 150_000
+
+    periods = list(cashflow.iter_periods(whole, AS_OF))
+    assert [p["date"] for p in periods[:3]] == ["2024-12-01", "2025-01-01", "2025-02-01"]
+
+
+def test_cashflow_endpoint_streams_ndjson_and_csv(client, db):
+    db.add(Loan(loan_id="L1", balance=50_000.0, rate=0.05, term=60))
+    db.commit()
+    lines = client.get("/api/portfolio/cashflows", params={"periods": 6}).text.splitlines()
+    assert len(lines) == 6 and json.loads(lines[0])["period"] == 1
+    csv = client.get("/api/portfolio/cashflows", params={"periods": 6, "format": "csv"}).text.splitlines()
+    assert csv[0] == ",".join(["period", "date", *cashflow.FLOWS]) and len(csv) == 7
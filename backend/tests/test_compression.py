@@ -0,0 +1,119 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import text
+
+from app.crud import set_document_text
+from app.models import Document
+from app.services import textstore
+from app.utils import compression
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOILERPLATE = (
+    "UNITED STATES BANKRUPTCY COURT FOR THE DISTRICT OF DELAWARE\n"
+    "Mortgage Proof of Claim Attachment (Official Form 410A)\n"
+    "If you file a claim secured by a security interest in the debtor's principal residence, use this form.\n"
+)
+CODECS = [compression.CODEC_RAW, compression.CODEC_ZLIB] + ([compression.CODEC_ZSTD] if compression.zstd_available() else [])
+
+
+@pytest.fixture(autouse=True)
+def _registry():
+    # Trained dictionaries become active process-wide; put the registry back afterwards
+    saved = dict(compression._dicts), dict(compression._active)
+    yield
+    compression._dicts.clear()
+    compression._dicts.update(saved[0])
+    compression._active.clear()
+    compression._active.update(saved[1])
+
+
+def _corpus(n):
+    return [BOILERPLATE + f"Case No. 24-{10000 + i}\nDebtor: Borrower {i}\nArrears: ${i * 137:,}.00\n" for i in range(n)]
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_round_trip_per_codec(codec):
+    body = "Escrow shortage — $1,200 ✓\n" * 50
+    blob = compression.compress(body, codec, 0)
+    assert blob[0] == codec and compression.decompress(blob) == body
+    if codec != compression.CODEC_RAW:
+        assert len(blob) < len(body.encode())
+
+
+def test_zlib_dictionary_keeps_recurring_lines_and_shrinks_small_texts():
+    data = compression.train_dictionary(_corpus(20), compression.CODEC_ZLIB)
+    assert 0 < len(data) <= compression.ZLIB_DICT_MAX
+    assert b"Official Form 410A" in data and b"Borrower 3" not in data
+
+    compression.register_dictionary(9001, compression.CODEC_ZLIB, data, active=False)
+    body = _corpus(21)[-1]
+    plain, shared = compression.compress(body, compression.CODEC_ZLIB, 0), compression.compress(body, compression.CODEC_ZLIB, 9001)
+    assert len(shared) < len(plain) / 2
+    assert compression.HEADER.unpack_from(shared) == (compression.CODEC_ZLIB, 9001)
+    assert compression.decompress(shared) == body
+    with pytest.raises(ValueError):
+        compression.decompress(compression.HEADER.pack(compression.CODEC_ZLIB, 9999) + b"x")
+
+
+def test_train_then_recompress_moves_stored_text_to_the_new_dictionary(db, monkeypatch):
+    monkeypatch.setattr(compression.settings, "TEXT_COMPRESSION", "zlib")
+    for i, body in enumerate(_corpus(12)):
+        doc = Document(doc_id=f"D{i:02}", type="410A", path="", sha256=str(i), ai_analysis={"summary": f"doc {i}"})
+        set_document_text(doc, body)
+        db.add(doc)
+    db.commit()
+
+    dict_id = textstore.train(db, samples=100)
+    assert dict_id and compression._active[compression.CODEC_ZLIB] == dict_id
+    before = textstore.stats(db)["text_stored_bytes"]
+    assert textstore.recompress(db, batch_size=5) == 12
+    blob = db.execute(text("SELECT text_z FROM documents WHERE doc_id = 'D03'")).scalar()
+    assert compression.HEADER.unpack_from(blob)[1] == dict_id
+    assert textstore.stats(db)["text_stored_bytes"] < before
+
+    db.expire_all()
+    doc = db.get(Document, "D03")
+    assert doc.extracted_text == _corpus(12)[3] and doc.ai_analysis == {"summary": "doc 3"}
+
+
+def _migrate(db_path, *calls):
+    code = "from alembic import command\nfrom app.migrate import alembic_config\ncfg = alembic_config()\n" + "\n".join(calls)
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "SCHEMA_AUTO_CREATE": "false", "TEXT_COMPRESSION": "zlib"}
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, env=env, capture_output=True, text=True)
+    assert out.returncode == 0, out.stderr
+    return out.stdout
+
+
+def test_0003_migration_compresses_existing_text_and_downgrades(tmp_path):
+    db_path = tmp_path / "legacy.db"
+    _migrate(db_path, "command.upgrade(cfg, '0002')")
+    corpus = _corpus(60)
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO documents (doc_id, type, path, extracted_text, ai_analysis) VALUES (?, '410A', '', ?, ?)",
+            [(f"D{i:02}", t, json.dumps({"n": i})) for i, t in enumerate(corpus)],
+        )
+        conn.execute("INSERT INTO doc_chunks (chunk_id, doc_id, ord, text) VALUES ('D00-0', 'D00', 0, 'first chunk')")
+
+    _migrate(db_path, "command.upgrade(cfg, '0003')")
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT dict_id, codec FROM text_dictionaries").fetchall() == [(1, compression.CODEC_ZLIB)]
+        assert "extracted_text" not in {r[1] for r in conn.execute("PRAGMA table_info(documents)")}
+        blob = conn.execute("SELECT text_z FROM documents WHERE doc_id = 'D07'").fetchone()[0]
+    assert compression.HEADER.unpack_from(blob) == (compression.CODEC_ZLIB, 1)
+
+    # Read back through the ORM (at head) in a process that loads the dictionary from the table
+    read = _migrate(db_path, "command.upgrade(cfg, 'head')\nfrom app.db import SessionLocal\nfrom app.models import DocChunk, Document\ndb = SessionLocal()\n"
+                             "d = db.get(Document, 'D07')\nimport json\n"
+                             "print(json.dumps([d.extracted_text, d.ai_analysis, db.get(DocChunk, 'D00-0').text]))")
+    assert json.loads(read) == [corpus[7], {"n": 7}, "first chunk"]
+
+    _migrate(db_path, "command.downgrade(cfg, '0002')")
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT extracted_text, ai_analysis FROM documents WHERE doc_id = 'D07'").fetchone() == (corpus[7], '{"n": 7}')
+        assert conn.execute("SELECT text FROM doc_chunks").fetchall() == [("first chunk",)]
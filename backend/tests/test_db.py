@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app import db as database
+from app.settings import settings
+
+
+def test_async_url_swaps_drivers():
+    assert database.async_url("sqlite:///./x.db") == "sqlite+aiosqlite:///./x.db"
+    assert database.async_url("postgresql+psycopg2://u@h/d") == "postgresql+asyncpg://u@h/d"
+    assert database.async_url("postgres://u@h/d") == "postgresql+asyncpg://u@h/d"
+    assert database.async_url("mysql://u@h/d") == "mysql://u@h/d"
+
+
+def test_engine_profiles(monkeypatch):
+    assert database.engine_options("sqlite://") == {"connect_args": {"check_same_thread": False}}
+    assert database.engine_options("sqlite:///x.db")["connect_args"]["timeout"] == settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+    assert database.engine_options("sqlite+aiosqlite:///x.db")["poolclass"] is AsyncAdaptedQueuePool
+
+    pg = database.engine_options("postgresql+psycopg2://u@h/d")
+    assert (pg["pool_size"], pg["max_overflow"], pg["pool_pre_ping"]) == (settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, True)
+    assert pg["connect_args"] == {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    assert database.engine_options("postgresql+asyncpg://u@h/d")["connect_args"] == {
+        "server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+    }
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT_MS", 0)
+    assert "connect_args" not in database.engine_options("postgresql://u@h/d")
+
+
+def test_sqlite_file_engines_get_pragmas_and_pool_stats(tmp_path):
+    engine = database.make_engine(f"sqlite:///{tmp_path}/pragmas.db", "test_pragmas")
+    try:
+        with engine.connect() as conn:
+            pragma = lambda name: conn.execute(text(f"PRAGMA {name}")).scalar()
+            assert pragma("journal_mode") == settings.SQLITE_JOURNAL_MODE.lower()
+            assert pragma("synchronous") == 1  # NORMAL
+            assert pragma("busy_timeout") == settings.SQLITE_BUSY_TIMEOUT_MS
+            assert pragma("cache_size") == settings.SQLITE_CACHE_SIZE
+            stats = database._pool_stats["test_pragmas"]
+            assert (stats["connects"], stats["checked_out"]) == (1, 1)
+        assert stats["checked_out"] == 0 and stats["peak_checked_out"] == 1
+    finally:
+        engine.dispose()
+
+
+def test_pool_endpoint_reports_every_engine(client, db):
+    db.execute(text("SELECT 1"))
+    pools = client.get("/api/db/pool").json()
+    assert {"primary", "primary_async", "checkout_timeouts"} <= set(pools)
+    assert pools["primary"]["checkouts"] >= 1 and "status" in pools["primary"]
@@ -0,0 +1,73 @@
+import math
+
+import pytest
+
+from app.services import embedding_cache, embeddings
+from app.settings import settings
+
+
+class CountingProvider(embeddings.HashedProvider):
+    def __init__(self, model=embeddings.HashedProvider.model):
+        self.model = model
+        self.batches = []
+
+    def embed_batch(self, texts):
+        self.batches.append(list(texts))
+        return super().embed_batch(texts)
+
+
+def test_hashed_provider_is_normalized_and_deterministic():
+    p = embeddings.HashedProvider()
+    a, b, empty = p.embed_batch(["Escrow shortage", "escrow SHORTAGE!", "..."])
+    assert a == b and len(a) == p.dim == embeddings.DIM
+    assert math.isclose(sum(x * x for x in a), 1.0) and not any(empty)
+    assert p.version == f"hashed:bow-{embeddings.DIM}"
+
+
+def test_only_unseen_texts_reach_the_model(db, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_SIZE", 2)
+    p = CountingProvider()
+    texts = ["alpha", "beta", "alpha", "gamma"]
+    first = embedding_cache.embed_cached(db, texts, p)
+    db.commit()
+    assert p.batches == [["alpha", "beta"], ["gamma"]]
+    assert first[0] == first[2] == pytest.approx(embeddings.embed("alpha"), abs=1e-6)
+
+    again = embedding_cache.embed_cached(db, ["gamma", "beta", "delta"], p)
+    assert p.batches[2:] == [["delta"]]
+    # Fresh vectors are rounded through float32 so a later cache hit returns identical values
+    assert again[:2] == [first[3], first[1]]
+
+    # Another model version is another vector space: nothing is shared
+    other = CountingProvider(model="bow-v2")
+    embedding_cache.embed_cached(db, ["alpha"], other)
+    assert other.batches == [["alpha"]]
+    db.commit()
+    assert sorted((s["model_version"], s["vectors"]) for s in embedding_cache.stats(db)) == [("bow-128", 4), ("bow-v2", 1)]
+
+
+def test_concurrently_cached_keys_are_skipped(db):
+    row = {"provider": "hashed", "model_version": "m", "text_hash": embedding_cache.text_hash("x"), "dim": 1, "vec": embedding_cache.pack([1.0])}
+    db.execute(embedding_cache._insert_ignoring_duplicates(db), [row])
+    db.execute(embedding_cache._insert_ignoring_duplicates(db), [row, {**row, "text_hash": "other"}])
+    db.commit()
+    assert embedding_cache.stats(db) == [{"provider": "hashed", "model_version": "m", "dim": 1, "vectors": 2}]
+
+
+def test_unknown_provider_is_rejected(monkeypatch):
+    embeddings.close_provider()
+    monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", "nope")
+    try:
+        with pytest.raises(ValueError):
+            embeddings.get_provider()
+    finally:
+        monkeypatch.undo()
+        embeddings.close_provider()
+    assert isinstance(embeddings.get_provider(), embeddings.HashedProvider)
+
+
+def test_chunk_spans_overlap_on_word_boundaries():
+    text = " ".join(f"w{i}" for i in range(10))
+    spans = embeddings.chunk_spans(text, target=4, overlap=1)
+    assert [text[a:b] for a, b in spans] == ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9", "w9"]
+    assert embeddings.chunk_spans("") == []
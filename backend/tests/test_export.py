@@ -0,0 +1,70 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date, datetime
+
+import pytest
+
+from app.crud import set_document_text
+from app.models import Document, Loan
+from app.services import export
+
+
+def _export(client, fmt, **params):
+    res = client.get("/api/export/loans", params={"format": fmt, **params})
+    assert res.status_code == 200
+    return res.content
+
+
+def test_ndjson_and_csv_write_the_same_datetime_text(client, db):
+    db.add(Loan(loan_id="L1", balance=1.0, orig_date=date(2020, 5, 1), last_risk_assessment=datetime(2024, 1, 1, 9, 30)))
+    db.commit()
+    row = next(csv.DictReader(io.StringIO(_export(client, "csv").decode())))
+    record = json.loads(_export(client, "ndjson").decode().splitlines()[0])
+    assert record["last_risk_assessment"] == row["last_risk_assessment"] == "2024-01-01T09:30:00"
+    assert record["orig_date"] == row["orig_date"] == "2020-05-01"
+
+
+def test_loan_filters_gzip_and_removed_loans(client, db):
+    db.add_all([
+        Loan(loan_id="L1", balance=1.0, status="current", features={"fico": 700}),
+        Loan(loan_id="L2", balance=2.0, status="delinquent", delinquency_days=60),
+        Loan(loan_id="L3", balance=3.0, status="removed"),
+    ])
+    db.commit()
+    records = [json.loads(line) for line in gzip.decompress(_export(client, "ndjson", gzip=True)).splitlines()]
+    assert [r["loan_id"] for r in records] == ["L1", "L2"] and "tape_hash" not in records[0]
+    assert records[0]["features"] == {"fico": 700}
+
+    rows = list(csv.DictReader(io.StringIO(_export(client, "csv", delinquency_min=30).decode())))
+    assert [r["loan_id"] for r in rows] == ["L2"]
+    assert [r["loan_id"] for r in csv.DictReader(io.StringIO(_export(client, "csv", status="removed").decode()))] == ["L3"]
+    assert client.get("/api/export/nope").status_code == 404
+
+
+def test_document_export_leaves_out_compressed_payloads(client, db):
+    doc = Document(doc_id="D1", loan_id=None, type="generic", path="", sha256="x")
+    set_document_text(doc, "body text")
+    db.add(doc)
+    db.commit()
+    header = _export(client, "csv").decode()  # loans: header only
+    assert header.startswith("loan_id,") and header.count("\n") == 1
+    record = json.loads(client.get("/api/export/documents", params={"format": "ndjson"}).text)
+    assert record["text_preview"] == "body text" and not {"text_z", "ai_analysis_z"} & set(record)
+
+
+def test_csv_chunks_flush_once_per_batch():
+    chunks = list(export.csv_chunks([[(1, "a")], [(2, {"k": 1})]], ["id", "v"]))
+    assert b"".join(chunks).decode().splitlines() == ["id,v", "1,a", '2,"{""k"": 1}"']
+    assert len(chunks) == 2
+
+
+def test_parquet_export_round_trips(client, db):
+    pq = pytest.importorskip("pyarrow.parquet")
+    db.add(Loan(loan_id="L1", balance=1.5, last_risk_assessment=datetime(2024, 1, 1), features={"a": 1}))
+    db.commit()
+    table = pq.read_table(io.BytesIO(_export(client, "parquet")))
+    row = table.to_pylist()[0]
+    assert (row["loan_id"], row["balance"], row["last_risk_assessment"]) == ("L1", 1.5, datetime(2024, 1, 1))
+    assert json.loads(row["features"]) == {"a": 1}
@@ -0,0 +1,69 @@
+from app.crud import set_document_text
+from app.models import Document, Loan
+from app.services import fields
+
+PROOF_OF_CLAIM = """UNITED STATES BANKRUPTCY COURT
+Case No. 2:23-bk-10452
+Debtor: John Q. Public
+Total prepetition arrearage: $12,345.67
+Escrow shortage: $1,200.00
+Monthly escrow payment: $310.25
+Payment history attached as Exhibit B-2
+"""
+
+
+def _doc(db, doc_id, text, sha256=None, loan_id=None):
+    doc = Document(doc_id=doc_id, loan_id=loan_id, type="410A", path="", sha256=sha256 or doc_id)
+    set_document_text(doc, text)
+    db.add(doc)
+    return doc
+
+
+def test_extract_fields_from_proof_of_claim():
+    found = fields.extract_fields(PROOF_OF_CLAIM)
+    assert {k: v["value"] for k, v in found.items()} == {
+        "case_number": "2:23-bk-10452",
+        "debtor_name": "John Q. Public",
+        "arrears": 12345.67,
+        "escrow_shortage": 1200.0,
+        "escrow_payment": 310.25,
+        "payment_history_ref": "B-2",
+    }
+    hit = found["arrears"]
+    assert PROOF_OF_CLAIM[hit["start"]:hit["end"]] == hit["text"] == "12,345.67"
+    # Weaker fallback pattern when the exhibit reference is missing
+    assert fields.extract_fields("see payment history below")["payment_history_ref"]["confidence"] == 0.4
+
+
+def test_index_is_built_once_per_sha256_and_rebuilt_for_new_extractors(db, monkeypatch):
+    built = []
+    build = fields.build_index
+    monkeypatch.setattr(fields, "build_index", lambda sha, text: built.append(sha) or build(sha, text))
+
+    first = _doc(db, "D1", PROOF_OF_CLAIM, sha256="same")
+    copy = _doc(db, "D2", PROOF_OF_CLAIM, sha256="same")
+    db.flush()
+    index = fields.index_document_fields(db, first)
+    db.flush()
+    assert fields.index_document_fields(db, copy) == index
+    assert fields.index_document_fields(db, first) is first.extracted_fields
+    assert built == ["same"] and copy.confidence_score == index["confidence"]
+
+    monkeypatch.setattr(fields, "EXTRACTOR_VERSION", "next")
+    fields.index_document_fields(db, first)
+    assert built == ["same", "same"] and first.extracted_fields["version"] == "next"
+
+
+def test_loan_fields_indexes_stale_documents_and_keeps_best_match(db):
+    db.add(Loan(loan_id="L1", balance=1.0))
+    _doc(db, "D1", "In re Jane Roe\nAmount past due: $900.00", loan_id="L1")
+    _doc(db, "D2", PROOF_OF_CLAIM, loan_id="L1")
+    db.add(Document(doc_id="D3", loan_id="L1", type="generic", path="", sha256="D3"))
+    db.commit()
+
+    merged, with_text = fields.loan_fields(db, "L1")
+    assert with_text == 2
+    assert merged["debtor_name"]["value"] == "John Q. Public"
+    assert merged["arrears"]["value"] == 12345.67
+    db.expire_all()
+    assert all(fields.is_current(db.get(Document, d).extracted_fields, d) for d in ("D1", "D2"))
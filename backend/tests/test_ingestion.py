@@ -0,0 +1,112 @@
+import pytest
+
+from app.models import Document, Loan
+from app.services import loan_cache, simulation, snapshots
+from app.services.scoring import score_book
+from app.settings import settings
+from app.utils import versions
+
+HEADER = "loan_id,balance,rate,term,orig_date,servicer_id,portfolio_id,risk_score\n"
+ROWS = {
+    "L1": "L1,100,0.05,360,2020-01-01,S1,P1,0.2\n",
+    "L2": "L2,200,0.06,360,2020-01-01,S1,P1,0.9\n",
+    "L3": "L3,300,0.07,360,2020-01-01,S1,P1,0.5\n",
+}
+
+
+def _ingest(client, ids, **data):
+    tape = HEADER + "".join(ROWS[x] for x in ids)
+    return client.post("/api/ingest/loans", data=data, files={"file": ("tape.csv", tape, "text/csv")})
+
+
+@pytest.fixture(params=[False, True], ids=["sql", "loan_cache"])
+def loan_tape_cache(request, monkeypatch):
+    monkeypatch.setattr(settings, "LOAN_CACHE_ENABLED", request.param)
+    loan_cache.mark_changed()  # drop whatever an earlier test left resident
+
+
+def test_full_reload_drops_removed_loans_from_reads(client, db, loan_tape_cache):
+    assert _ingest(client, ["L1", "L2", "L3"], full="true").json()["loans_created"] == 3
+    assert client.get("/api/loans/summary").json()["total"] == 3
+
+    res = _ingest(client, ["L1"], full="true").json()
+    assert res["changes"]["removed"] == ["L2", "L3"]
+
+    summary = client.get("/api/loans/summary").json()
+    assert (summary["total"], summary["total_value"], summary["high_risk_loans"]) == (1, 100.0, 0)
+    analytics = client.get("/api/portfolio/analytics").json()
+    assert (analytics["total_loans"], analytics["total_value"]) == (1, 100.0)
+    assert client.get("/api/portfolio/analytics", params={"portfolio_id": "P1"}).json()["total_loans"] == 1
+    assert [x["loan_id"] for x in client.get("/api/loans/search").json()["items"]] == ["L1"]
+    assert client.get("/api/loans/search", params={"status": "removed"}).json()["total"] == 2
+
+    assert snapshots._sums(db)["P1"]["loans"] == 1
+    assert simulation.load_tape(db).balance.tolist() == [100.0]
+    assert score_book(db, workers=1)["loans_scored"] == 1
+
+    # Back on a later tape, the loan counts again
+    _ingest(client, ["L1", "L3"], full="true")
+    assert client.get("/api/loans/summary").json()["total"] == 2
+
+
+def test_partial_tape_removes_nothing_by_default(client, db):
+    _ingest(client, ["L1", "L2", "L3"])
+    res = _ingest(client, ["L1"]).json()
+    assert res["loans_removed"] == 0
+    assert client.get("/api/loans/summary").json()["total"] == 3
+
+
+def test_full_reload_needs_servicer_column(client, db):
+    _ingest(client, ["L1", "L2"])
+    header = "loan_id,balance\n"
+    r = client.post("/api/ingest/loans", data={"full": "true"}, files={"file": ("tape.csv", header + "L1,100\n", "text/csv")})
+    assert r.status_code == 400
+    assert "servicer_id" in r.json()["detail"]
+    assert client.get("/api/loans/summary").json()["total"] == 2
+
+
+def test_unlinked_410a_does_not_hide_missing_ones(client, db, loan_tape_cache):
+    _ingest(client, ["L1", "L2"])
+    db.add_all([
+        Document(doc_id="D1", loan_id="L1", type="410A", path="", sha256="a"),
+        # Filed for a loan id bulk ingest could not match
+        Document(doc_id="D2", loan_id=None, type="410A", path="", sha256="b"),
+    ])
+    db.commit()
+    versions.bump(db, "documents")
+
+    assert client.get("/api/loans/summary").json()["missing_410A"] == 1
+    findings = client.get("/api/compliance/findings/missing-410a").json()
+    assert [x["loan_id"] for x in findings["items"]] == ["L2"]
+    assert {x["loan_id"]: x["missing_410A"] for x in client.get("/api/loans/search").json()["items"]} == {"L1": False, "L2": True}
+
+
+def test_unchanged_rows_are_skipped_by_fingerprint(client, db):
+    _ingest(client, ["L1", "L2", "L3"])
+    db.get(Loan, "L1").delinquency_days = 45  # not a column of this tape
+    db.commit()
+    version = versions.read(db)["loans"]
+
+    # Same values, spelled differently: trailing zeros, padding, header case
+    tape = HEADER.upper() + "L1, 100.00 ,0.050,360,2020-01-01,S1,P1,0.20\n" + ROWS["L2"] + ROWS["L3"].replace("300", "350")
+    res = client.post("/api/ingest/loans", files={"file": ("tape.csv", tape, "text/csv")}).json()
+    assert (res["loans_unchanged"], res["loans_updated"], res["loans_created"]) == (2, 1, 0)
+    assert res["changes"]["updated"] == ["L3"] and res["changes"]["changed_columns"] == {"balance": 1}
+    db.expire_all()
+    assert db.get(Loan, "L3").balance == 350 and db.get(Loan, "L1").delinquency_days == 45
+    assert versions.read(db)["loans"] == version + 1
+
+    # A no-op tape writes nothing and leaves the data version alone
+    res = client.post("/api/ingest/loans", files={"file": ("tape.csv", tape, "text/csv")}).json()
+    assert res["loans_unchanged"] == 3 and res["loans_updated"] == 0
+    assert versions.read(db)["loans"] == version + 1
+
+
+def test_fingerprint_covers_only_the_tape_columns():
+    from app.services.ingestion import fingerprint, parse_tape
+
+    columns, rows, errors, rejected = parse_tape("loan_id,balance,rate,unknown\nL1,100,5,x\nL2,abc,5,\n")
+    assert columns == ["loan_id", "balance", "rate"] and rejected == {"L2"} and errors == ["line 3: bad balance 'abc'"]
+    assert rows["L1"]["tape_hash"] == fingerprint({"loan_id": "L1", "balance": 100.0, "rate": 5.0, "term": 360}, columns)
+    # The same values under a wider tape are a different row: the stored loan is rewritten
+    assert fingerprint(rows["L1"], columns + ["term"]) != rows["L1"]["tape_hash"]
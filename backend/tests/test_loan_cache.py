@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import update
+
+from app.db import SessionLocal
+from app.models import DataVersion, Document, Loan
+from app.services import loan_cache
+from app.settings import settings
+from app.utils import versions
+
+
+@pytest.fixture
+def cached(client, monkeypatch):
+    monkeypatch.setattr(settings, "LOAN_CACHE_ENABLED", True)
+    loan_cache.mark_changed()  # drop whatever an earlier test left resident
+
+
+def _stats(client):
+    return client.get("/api/cache/stats").json()["loan_tape"]
+
+
+def test_tape_reloads_after_another_workers_write(client, db, cached):
+    db.add_all([Loan(loan_id="L1", balance=100.0), Loan(loan_id="L2", balance=200.0)])
+    db.commit()
+    versions.bump(db, "loans")
+    first = client.get("/api/loans/summary")
+    assert first.json()["total_value"] == 300.0
+
+    # Another worker: its write and bump never pass through this process's mark_changed/on_bump
+    other = SessionLocal()
+    other.execute(update(Loan).where(Loan.loan_id == "L2").values(balance=500.0))
+    other.execute(update(DataVersion).where(DataVersion.name == "loans").values(version=DataVersion.version + 1))
+    other.commit()
+    other.close()
+
+    fulls = _stats(client)["full_refreshes"]
+    after = client.get("/api/loans/summary", headers={"If-None-Match": first.headers["etag"]})
+    assert after.status_code == 200
+    assert after.json()["total_value"] == 600.0
+    assert _stats(client)["full_refreshes"] == fulls + 1
+
+
+def test_own_writes_patch_the_tape(client, db, cached):
+    db.add_all([Loan(loan_id=f"L{i}", balance=1.0) for i in range(20)])
+    db.commit()
+    versions.bump(db, "loans")
+    assert client.get("/api/loans/summary").json()["total"] == 20
+
+    r = client.post("/api/risk/assess/L3", json={
+        "loan_id": "L3", "risk_score": 0.9, "default_probability": None, "yield_impact": None,
+        "risk_factors": None, "model_version": None, "confidence_interval": None,
+    })
+    assert r.status_code == 200
+    stats = _stats(client)
+    summary = client.get("/api/loans/summary").json()
+    assert summary["high_risk_loans"] == 1
+    after = _stats(client)
+    assert (after["full_refreshes"], after["incremental_refreshes"]) == (stats["full_refreshes"], stats["incremental_refreshes"] + 1)
+
+    # A 410A filed through any path shows once the documents version moves
+    db.add(Document(doc_id="D1", loan_id="L3", type="410A", path="", sha256="x"))
+    db.commit()
+    versions.bump(db, "documents")
+    assert client.get("/api/loans/summary").json()["missing_410A"] == 19
+
+
+def test_own_versions_are_kept_only_while_a_tape_is_resident(client, db, cached, monkeypatch):
+    versions.bump(db, "loans")
+    client.get("/api/loans/summary")
+    versions.bump(db, "loans")
+    assert loan_cache._own_loans
+    loan_cache.mark_changed()
+    assert not loan_cache._own_loans
+
+    monkeypatch.setattr(loan_cache, "_tape", None)
+    versions.bump(db, "loans")
+    assert not loan_cache._own_loans
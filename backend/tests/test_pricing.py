@@ -0,0 +1,71 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.models import Loan
+from app.services import cashflow, pricing
+from app.utils import versions
+
+
+@pytest.fixture(autouse=True)
+def _empty_caches():
+    # Keys start with the loans version, which restarts when the test database is emptied
+    pricing._flow_cache.clear()
+    pricing._result_cache.clear()
+
+
+def test_parse_curve_sorts_points_and_rejects_garbage():
+    assert pricing.parse_curve("10:0.04,1:0.05") == ((1.0, 0.05), (10.0, 0.04))
+    assert pricing.parse_curve(None) == ((0.25, 0.05), (30.0, 0.05))
+    with pytest.raises(ValueError):
+        pricing.parse_curve("1-0.05")
+
+
+def test_flat_curve_prices_a_bullet_at_its_own_yield():
+    df = pricing.discount_factors(((1, 0.06),), 24)
+    np.testing.assert_allclose(df, (1 + 0.06 / 12) ** -np.arange(1, 25))
+
+    cf = np.zeros((2, 24))
+    cf[0, -1] = 100.0
+    m = pricing.price_yield(cf, cf, df)
+    assert m["yield"][0] == pytest.approx(0.06)
+    assert m["price"][0] == pytest.approx(100 * df[-1])
+    assert m["wal"][0] == pytest.approx(2.0)
+    assert m["modified_duration"][0] == pytest.approx(2.0 / (1 + 0.06 / 12))
+    # A row with no cash flow has no metrics
+    assert all(np.isnan(m[k][1]) for k in pricing.METRICS)
+
+
+def test_pricing_caches_flows_per_loan_version(db, monkeypatch):
+    db.add_all([Loan(loan_id=f"L{i}", balance=100_000.0, rate=0.05 + i / 100, term=360) for i in range(3)])
+    db.commit()
+    projected = []
+    project = pricing.project_portfolio
+    monkeypatch.setattr(pricing, "project_portfolio", lambda *args: projected.append(1) or project(*args))
+    a = cashflow.Assumptions(periods=360, as_of=date(2024, 1, 1))
+    flat = pricing.parse_curve("1:0.05")
+
+    res = pricing.portfolio_pricing(db, flat, a, by_loan=True, loan_chunk_size=2)
+    assert res["total_balance"] == pytest.approx(300_000)
+    assert pricing.portfolio_pricing(db, flat, a, by_loan=True) is res
+    page = pricing.loan_page(res, 2, 2)
+    assert [p["loan_id"] for p in page] == ["L2"]
+    # Priced off a flat 5% curve: the yield is the curve rate, a 7% coupon shows up in the price
+    assert page[0]["yield"] == pytest.approx(0.05) and page[0]["price"] > page[0]["balance"]
+
+    wider = pricing.portfolio_pricing(db, flat, a, spread=0.01)
+    assert wider["price"] < res["price"] and len(projected) == 1
+
+    versions.bump(db, "loans")
+    pricing.portfolio_pricing(db, flat, a)
+    assert len(projected) == 2
+
+
+def test_pricing_endpoint(client, db):
+    db.add(Loan(loan_id="L1", balance=100_000.0, rate=0.06, term=360))
+    db.commit()
+    res = client.get("/api/portfolio/analytics/pricing", params={"curve": "1:0.06,30:0.06", "include_loans": True}).json()
+    assert res["loans_total"] == 1 and res["loans"][0]["loan_id"] == "L1"
+    assert 0 < res["price_pct"] < 100 and res["wal"] > 0
+    assert client.get("/api/portfolio/analytics/pricing", params={"curve": "bad"}).status_code == 400
@@ -0,0 +1,68 @@
+import logging
+import re
+
+from app.models import Loan
+from app.settings import settings
+from app.utils import profiling
+
+
+def _timing(res):
+    m = re.fullmatch(r'app;dur=([\d.]+), db;dur=([\d.]+);desc="(\d+) queries"', res.headers["server-timing"])
+    assert m, res.headers["server-timing"]
+    return float(m[1]), float(m[2]), int(m[3])
+
+
+def test_server_timing_counts_sql_per_request(client, db):
+    db.add(Loan(loan_id="L1", balance=1.0))
+    db.commit()
+    app_ms, db_ms, queries = _timing(client.get("/api/loans/search"))
+    assert queries >= 2 and 0 < db_ms <= app_ms
+    assert _timing(client.get("/health"))[2] == 0
+    # Unmatched paths still get timed, under one route label
+    assert _timing(client.get("/no/such/path"))[2] == 0
+
+    text = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/loans/search",status="200"}' in text
+    assert 'route="unmatched"' in text
+
+
+def test_slow_queries_are_logged_and_counted(client, monkeypatch, caplog):
+    monkeypatch.setitem(profiling._config, "slow_query_ms", 0.0)
+    before = profiling.SLOW_QUERIES.series[("/api/loans/search",)]
+    with caplog.at_level(logging.WARNING, logger="app.profiling"):
+        client.get("/api/loans/search")
+    assert profiling.SLOW_QUERIES.series[("/api/loans/search",)] > before
+    assert any(r.getMessage().startswith("slow query") and "route=/api/loans/search" in r.getMessage() for r in caplog.records)
+
+
+def test_repeated_statements_flag_n_plus_one():
+    stats = profiling.RequestStats("/r")
+    for _ in range(3):
+        stats.record("SELECT 1", 0.001)
+    stats.record("INSERT x", 0.001)
+    stats.record("INSERT x", 0.001, page=True)  # later pages of one executemany
+    assert stats.queries == 5 and stats.repeated(3) == [("SELECT 1", 3)]
+    assert stats.repeated(4) == []
+
+
+def test_histogram_buckets_are_cumulative():
+    h = profiling.Histogram("h", "help", ("route",), (1, 5))
+    h.observe(("/a",), 0.5)
+    h.observe(("/a",), 3)
+    h.observe(("/a",), 9)
+    lines = h.render()
+    assert 'h_bucket{route="/a",le="1"} 1' in lines and 'h_bucket{route="/a",le="5"} 2' in lines
+    assert 'h_bucket{route="/a",le="+Inf"} 3' in lines and 'h_sum{route="/a"} 12.5' in lines
+
+
+def test_profiles_need_the_token(client, monkeypatch):
+    assert "x-profile-id" not in client.get("/health", headers={settings.PROFILE_HEADER: "t"}).headers
+    assert client.get("/api/debug/profiles").status_code == 404
+
+    monkeypatch.setattr(settings, "PROFILE_TOKEN", "t")
+    auth = {settings.PROFILE_HEADER: "t"}
+    profile_id = client.get("/health", headers=auth).headers["x-profile-id"]
+    listed = client.get("/api/debug/profiles", params={"route": "/health"}, headers=auth).json()["profiles"]
+    assert profile_id in [p["profile_id"] for p in listed]
+    assert "cumulative" in client.get(f"/api/debug/profiles/{profile_id}", headers=auth).text
+    assert client.get(f"/api/debug/profiles/{profile_id}").status_code == 404
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+from sqlalchemy import select
+
+from app.services import scoring
+from app.models import Event, Loan, RiskAssessment
+from app.settings import settings
+
+
+def _ndjson(*records):
+    return "".join((r if isinstance(r, str) else json.dumps(r)) + "\n" for r in records)
+
+
+def _post(client, body, content_type="application/x-ndjson"):
+    return client.post("/api/risk/assess:batch", content=body, headers={"content-type": content_type})
+
+
+def test_batch_writes_and_reports_rejects(client, db):
+    db.add_all([Loan(loan_id="L1", balance=1.0), Loan(loan_id="L2", balance=1.0)])
+    db.commit()
+    res = _post(client, _ndjson(
+        {"loan_id": "L1", "risk_score": 0.4}, {"loan_id": "L2", "risk_score": 1.5}, {"loan_id": "X", "risk_score": 0.2},
+    )).json()
+    assert (res["received"], res["written"], res["rejected"], res["missing_loans"]) == (3, 1, 2, 1)
+    assert db.get(Loan, "L1").risk_score == 0.4
+
+
+def test_parse_error_after_first_chunk_keeps_committed_rows(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "RISK_BATCH_CHUNK_SIZE", 2)
+    db.add_all([Loan(loan_id=f"L{i}", balance=1.0) for i in range(1, 4)])
+    db.commit()
+    before = client.get("/api/data/versions").json()["loans"]
+
+    r = _post(client, _ndjson(
+        {"loan_id": "L1", "risk_score": 0.1}, {"loan_id": "L2", "risk_score": 0.2},
+        {"loan_id": "L3", "risk_score": 0.3}, "{not json",
+    ))
+    assert r.status_code == 400
+    detail = r.json()["detail"]
+    assert detail["message"].startswith("Failed to parse assessments")
+    assert (detail["received"], detail["written"], detail["chunks"]) == (2, 2, 1)
+
+    # The committed chunk is versioned and audited like a complete batch
+    assert db.scalar(select(Loan.risk_score).where(Loan.loan_id == "L2")) == 0.2
+    assert db.get(Loan, "L3").risk_score is None
+    assert len(db.scalars(select(RiskAssessment)).all()) == 2
+    assert client.get("/api/data/versions").json()["loans"] == before + 1
+    event = db.scalars(select(Event).where(Event.type == "risk_assessment_batch")).one()
+    assert event.payload["written"] == 2 and event.payload["aborted"] == detail["message"]
+
+
+def test_parse_error_before_any_write_logs_nothing(client, db):
+    r = _post(client, "[1,", "application/json")
+    assert r.status_code == 400
+    assert r.json()["detail"]["written"] == 0
+    assert db.scalars(select(Event)).all() == []
+
+
+def test_score_job_loads_model_off_the_event_loop(client, db, monkeypatch):
+    db.add(Loan(loan_id="L1", balance=100.0, rate=0.05, features={"fico": 700, "ltv": 0.8}))
+    db.commit()
+    load, loops = scoring.load_model, []
+
+    def spy(path):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return load(path)
+
+    monkeypatch.setattr(scoring, "load_model", spy)
+    res = client.post("/api/risk/score").json()
+    assert res["status"] == "scheduled" and loops[0] is None
+
+    job = client.get(f"/api/risk/score/{res['job_id']}").json()
+    assert job["status"] == "completed" and job["result"]["loans_scored"] == 1
+    assert client.get("/api/risk/score/nope").status_code == 404
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app.models import Loan, RiskAssessment
+from app.services import scoring
+
+
+def _book(db):
+    db.add_all([
+        Loan(loan_id="L1", balance=100_000.0, rate=5.0, term=360, delinquency_days=0, geography="CA", features={"fico": 780}),
+        Loan(loan_id="L2", balance=100_000.0, rate=0.05, term=360, delinquency_days=120, geography="TX", features={"fico": "n/a"}),
+        Loan(loan_id="L3", balance=None, rate=0.07, term=180, delinquency_days=30, portfolio_id="P1"),
+        Loan(loan_id="L4", balance=1.0, rate=0.05, term=360, status="removed"),
+    ])
+    db.commit()
+
+
+def test_build_matrix_layout(db):
+    _book(db)
+    rows = db.execute(select(Loan.loan_id, Loan.geography, Loan.features, *[getattr(Loan, c) for c in scoring.TAPE_COLUMNS])
+                      .order_by(Loan.loan_id)).all()[:3]
+    model = scoring.SklearnModel(None, "t", geographies=["CA", "TX"], feature_keys=["fico"])
+    X = scoring.build_matrix(rows, model)
+    np.testing.assert_allclose(X, [
+        # balance, rate (percent normalized), term, delinquency, CA, TX, fico (unparseable -> 0)
+        [100_000, 0.05, 360, 0, 1, 0, 780],
+        [100_000, 0.05, 360, 120, 0, 1, 0],
+        [0, 0.07, 180, 30, 0, 0, 0],
+    ])
+
+
+def test_builtin_model_scores_the_book_in_chunks(db):
+    _book(db)
+    res = scoring.score_book(db, chunk_size=1)
+    assert (res["model_version"], res["loans_scored"]) == ("builtin-logit-v1", 3)
+
+    pd_ = {a.loan_id: a.default_probability for a in db.execute(select(RiskAssessment)).scalars()}
+    assert set(pd_) == {"L1", "L2", "L3"}
+    assert pd_["L2"] > pd_["L1"] and all(0 < p < 1 for p in pd_.values())
+    db.expire_all()
+    assert db.get(Loan, "L2").risk_score == pytest.approx(pd_["L2"])
+    assert db.get(Loan, "L4").risk_score is None
+
+    assert scoring.score_book(db, portfolio_id="P1")["loans_scored"] == 1
+
+
+def test_trained_model_bundle_scores_the_same_in_worker_processes(db, tmp_path):
+    joblib = pytest.importorskip("joblib")
+    linear_model = pytest.importorskip("sklearn.linear_model")
+    _book(db)
+    X = np.array([[1e5, 0.05, 360, 0, 1, 0], [1e5, 0.05, 360, 120, 0, 1]] * 5)
+    clf = linear_model.LogisticRegression().fit(X, [0, 1] * 5)
+    path = tmp_path / "model.joblib"
+    joblib.dump({"model": clf, "version": "lr-test", "geographies": ["CA", "TX"], "severity": 0.5}, path)
+
+    model = scoring.load_model(str(path))
+    assert (model.version, model.severity) == ("lr-test", 0.5)
+    serial = scoring.score_book(db, model_path=str(path), workers=1)
+    scores = dict(db.execute(select(Loan.loan_id, Loan.risk_score)).all())
+    pooled = scoring.score_book(db, model_path=str(path), chunk_size=1, workers=2)
+    db.expire_all()
+    assert serial["loans_scored"] == pooled["loans_scored"] == 3
+    assert dict(db.execute(select(Loan.loan_id, Loan.risk_score)).all()) == pytest.approx(scores)
+    assert db.get(Loan, "L1").yield_impact == pytest.approx(-0.5 * scores["L1"])
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.settings import settings
+from app.utils import serialization
+from app.utils.serialization import dumps, stream_page
+
+CASES = {
+    "exponent floats": [1e16, 1e-7, -2.5e-10, 1e22, 0.1, 1.0, 123456789.125, {"a": 1e-7, "b": [3e20]}],
+    "datetimes": {
+        "naive": datetime(2024, 3, 1, 9, 30),
+        "micro": datetime(2024, 3, 1, 9, 30, 0, 120),
+        "utc": datetime(2024, 3, 1, tzinfo=timezone.utc),
+        "offset": datetime(2024, 3, 1, 23, 59, 59, tzinfo=timezone(timedelta(hours=-5))),
+        "day": date(2024, 2, 29),
+    },
+    "decimals": [Decimal("10"), Decimal("1.50"), Decimal("1E+2"), Decimal("-0.001"), Decimal("123456.789")],
+    "non-str keys": {1: "int", 2.5: "float", True: "bool", None: "none", "s": {0: [1, 2]}},
+    "unicode": {"name": "Zoë – “quoted” ✓", "empty": "", "nested": [[], {}]},
+    "rows": [{"loan_id": "L1", "balance": 1e7, "rate": 0.0425, "orig_date": date(2020, 1, 1), "risk_score": None}],
+}
+
+
+def _reference(content) -> bytes:
+    """What FastAPI's default path renders"""
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def _drain(response) -> bytes:
+    async def collect():
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(collect())
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson not installed")
+    return request.param
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_dumps_matches_jsonresponse(encoder, name):
+    assert dumps(CASES[name]) == _reference(CASES[name])
+
+
+@pytest.mark.parametrize("fast_path", [True, False])
+@pytest.mark.parametrize("batches", [
+    [],
+    [[]],
+    [[], [{"id": 1, "x": 1e-7}], [], [{"id": 2, "at": datetime(2024, 1, 2, 3, 4, 5)}, {"id": 3, "amt": Decimal("2.50")}], []],
+    [[{"id": 1, "x": 1e16}]],
+])
+def test_stream_page_matches_jsonresponse(encoder, monkeypatch, fast_path, batches):
+    monkeypatch.setattr(settings, "JSON_FAST_PATH", fast_path)
+    head = {"total": 3, "page": 1, "as_of": date(2024, 1, 31)}
+    expected = _reference({**head, "items": [row for batch in batches for row in batch]})
+    assert _drain(stream_page(head, iter(batches))) == expected
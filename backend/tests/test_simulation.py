@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from app.models import Loan
+from app.services import simulation
+
+
+@pytest.mark.parametrize("confidence", [[0.95, 1.0], [0.0], [1.5]])
+def test_confidence_outside_open_unit_interval_is_rejected(client, confidence):
+    res = client.post("/api/risk/simulations", json={"paths": 10, "confidence": confidence})
+    assert res.status_code == 422
+
+
+def _tape(db):
+    db.add_all(
+        [Loan(loan_id=f"C{i}", balance=100_000.0, default_probability=0.05, geography="CA") for i in range(40)]
+        + [Loan(loan_id=f"T{i}", balance=50_000.0, risk_score=0.01, geography="TX") for i in range(40)]
+        + [Loan(loan_id="N1", balance=None, geography=None), Loan(loan_id="R1", balance=1e9, status="removed")]
+    )
+    db.commit()
+
+
+def test_stress_hits_only_listed_geographies(db):
+    _tape(db)
+    tape = simulation.load_tape(db)
+    assert tape.balance.size == 81 and tape.pd[tape.geo == tape.geographies.index("")][0] == simulation.DEFAULT_PD
+    pd_, severity = simulation.stressed(tape, simulation.Scenario("ca", hpi_drop=0.2, geographies=["CA"]))
+    ca = tape.geo == tape.geographies.index("CA")
+    np.testing.assert_allclose(pd_[ca], 0.05 * 1.4)
+    np.testing.assert_allclose(pd_[~ca], tape.pd[~ca])
+    assert severity[ca][0] == pytest.approx(0.45) and severity[~ca][0] == simulation.DEFAULT_SEVERITY
+
+    b = simulation.buckets(tape, pd_, severity)
+    assert b["count"].sum() == 81
+    assert (b["count"] * b["loss_per_default"]).sum() == pytest.approx((tape.balance * severity).sum())
+
+
+def test_simulation_is_seeded_independent_of_workers_and_stress_costs_more(db, monkeypatch):
+    _tape(db)
+    monkeypatch.setattr(simulation, "MAX_CELLS", 1000)  # several blocks per scenario
+    scenarios = [simulation.SCENARIOS["baseline"], simulation.SCENARIOS["severe"]]
+    run = lambda workers: simulation.run_simulation(db, simulation.create_job({}), scenarios, paths=4000, seed=7, workers=workers)
+    serial, pooled = run(1), run(2)
+    assert serial["scenarios"] == pooled["scenarios"]
+
+    base, severe = serial["scenarios"]["baseline"], serial["scenarios"]["severe"]
+    analytic = 40 * 100_000 * 0.05 * 0.35 + 40 * 50_000 * 0.01 * 0.35
+    assert base["expected_loss"] == pytest.approx(analytic, rel=0.1)
+    assert base["exposure"] == 6_000_000
+    assert base["var"]["0.99"] >= base["var"]["0.95"] and base["es"]["0.99"] >= base["var"]["0.99"]
+    assert severe["expected_loss"] > base["expected_loss"]
+
+
+def test_simulation_endpoint_runs_the_job(client, db):
+    _tape(db)
+    body = {"paths": 500, "scenarios": ["baseline", {"name": "tx", "hpi_drop": 0.3, "geographies": ["TX"]}]}
+    job = client.post("/api/risk/simulations", json=body).json()
+    res = client.get(f"/api/risk/simulations/{job['job_id']}").json()
+    assert res["status"] == "completed" and set(res["result"]["scenarios"]) == {"baseline", "tx"}
+    assert client.post("/api/risk/simulations", json={"scenarios": ["nope"]}).status_code == 400
+    assert client.post("/api/risk/simulations", json={"systematic_correlation": 0.6, "geography_correlation": 0.5}).status_code == 400
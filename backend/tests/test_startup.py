@@ -0,0 +1,89 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from app.utils.lazy import lazy_import
+from bench import startup
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_app_import_within_budget():
+    # Same check as `python -m bench.startup`: the app's own imports stay under
+    # 0.4s and numpy/scipy/pdfminer/... load only when a request needs them
+    res = startup.measure(runs=5)
+    assert startup.check(res, app_budget=0.4) == [], res
+
+
+def _python(code, tmp_path):
+    """Run code in a fresh interpreter against its own database; returns the last stdout line"""
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path}/startup.db", "SCHEMA_AUTO_CREATE": "false"}
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, env=env, capture_output=True, text=True)
+    assert out.returncode == 0, out.stderr
+    return out.stdout.strip().rpartition("\n")[2]
+
+
+def _tables(tmp_path):
+    with sqlite3.connect(tmp_path / "startup.db") as conn:
+        return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _alembic_version(tmp_path):
+    with sqlite3.connect(tmp_path / "startup.db") as conn:
+        return conn.execute("SELECT version_num FROM alembic_version").fetchone()[0]
+
+
+def test_services_load_on_first_use_and_startup_leaves_the_schema_alone(tmp_path):
+    loaded = _python(f"""
+import json, sys
+from fastapi.testclient import TestClient
+import app.main
+heavy = {startup.LAZY_MODULES!r}
+with TestClient(app.main.app) as c:
+    assert c.get("/health").status_code == 200
+    before = [m for m in heavy if m in sys.modules]
+    app.main.cashflow.FLOWS
+    print(json.dumps([before, "numpy" in sys.modules]))
+""", tmp_path)
+    assert json.loads(loaded) == [[], True]
+    assert _tables(tmp_path) == set()
+
+
+def test_migrate_builds_the_schema_and_adopts_create_all_databases(tmp_path):
+    from app import models  # noqa: F401  registers tables on Base.metadata
+    from app.db import Base
+    from app.migrate import INITIAL_REVISION
+
+    migrate = "from app.migrate import migrate; migrate(%r)"
+    _python(migrate % "head", tmp_path)
+    assert _tables(tmp_path) == set(Base.metadata.tables) | {"alembic_version"}
+    head = _alembic_version(tmp_path)
+
+    # Databases from the old import-time create_all: revision 0001 tables, no alembic_version
+    (tmp_path / "startup.db").unlink()
+    _python(migrate % INITIAL_REVISION, tmp_path)
+    with sqlite3.connect(tmp_path / "startup.db") as conn:
+        conn.execute("DROP TABLE alembic_version")
+    _python(migrate % "head", tmp_path)
+    assert _alembic_version(tmp_path) == head
+    assert _tables(tmp_path) == set(Base.metadata.tables) | {"alembic_version"}
+
+
+def test_lazy_import_defers_the_module_body(tmp_path, monkeypatch):
+    (tmp_path / "lazy_probe.py").write_text("import sys\nsys.lazy_probe_runs = getattr(sys, 'lazy_probe_runs', 0) + 1\nVALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "lazy_probe", raising=False)
+    try:
+        module = lazy_import("lazy_probe")
+        assert not hasattr(sys, "lazy_probe_runs")
+        assert module.VALUE == 42 and sys.lazy_probe_runs == 1
+        assert lazy_import("lazy_probe") is module and sys.lazy_probe_runs == 1
+    finally:
+        sys.modules.pop("lazy_probe", None)
+        vars(sys).pop("lazy_probe_runs", None)
+    with pytest.raises(ModuleNotFoundError):
+        lazy_import("app.services.no_such_module")
@@ -0,0 +1,42 @@
+from app.crud import PREVIEW_CHARS, set_document_text
+from app.models import DocChunk, Document
+from app.services import textstore
+
+FILLER = "lorem ipsum " * (PREVIEW_CHARS // 6)
+
+
+def _doc(db, doc_id, text):
+    doc = Document(doc_id=doc_id, type="generic", path="", sha256=doc_id)
+    set_document_text(doc, text)
+    db.add(doc)
+
+
+def test_search_text_matches_previews_and_bounded_scan(db):
+    _doc(db, "D1", "Proof of claim: escrow shortage of $1,200")
+    _doc(db, "D2", FILLER + "escrow shortage buried past the preview")
+    _doc(db, "D3", FILLER + "nothing relevant")
+    _doc(db, "D4", "Literal 100%_ match")
+    db.commit()
+
+    assert [h["doc_id"] for h in textstore.search_text(db, "ESCROW shortage", 10)] == ["D1", "D2"]
+    # Preview hits come from SQL; the decompressing scan is what the cap bounds
+    assert [h["doc_id"] for h in textstore.search_text(db, "escrow shortage", 10, scan_limit=0)] == ["D1"]
+    assert [h["doc_id"] for h in textstore.search_text(db, "escrow shortage", 1)] == ["D1"]
+    assert textstore.search_text(db, "buried", 10)[0]["text"].startswith("lorem ipsum")
+    # LIKE wildcards in the query are literal
+    assert [h["doc_id"] for h in textstore.search_text(db, "0%_", 10)] == ["D4"]
+    assert [h["doc_id"] for h in textstore.search_text(db, "%", 10, scan_limit=0)] == ["D4"]
+    assert textstore.search_text(db, "no such phrase", 10) == []
+
+
+def test_search_text_finds_phrase_only_in_chunk_copy(db):
+    # Copied chunk text (CHUNK_TEXT_COPY) is compressed like document text, so it is scanned, not LIKEd
+    _doc(db, "D1", "Short cover letter")
+    _doc(db, "D2", FILLER + "unrelated")
+    db.add(DocChunk(chunk_id="D1-0", doc_id="D1", ord=0, text="Trustee objection to the escrow analysis", start_char=0, end_char=18))
+    db.commit()
+
+    hits = textstore.search_text(db, "trustee OBJECTION", 10)
+    assert [(h["doc_id"], h["text"]) for h in hits] == [("D1", "Trustee objection to the escrow analysis")]
+    # The cap counts chunk copies too: D2's text uses the only scan
+    assert textstore.search_text(db, "trustee objection", 10, scan_limit=1) == []
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from app.services import vectorstore
+from bench.ann import vectors
+
+DIM = 32
+
+
+def _fill(version, rows=3000, segments=3, topics=600, seed=1):
+    _, x = next(vectors(rows, DIM, topics, seed))
+    docs = {"d0": ("L0", "410A"), "d1": ("L1", "generic")}
+    per = rows // segments
+    for s in range(segments):
+        vectorstore.add(version, [
+            {"chunk_id": f"c{i}", "doc_id": f"d{i % 2}", "vec": x[i]} for i in range(s * per, (s + 1) * per)
+        ], docs, synced=True)
+    return x
+
+
+def _ids(hits):
+    return [h[1] for h in hits]
+
+
+def test_ivf_recall_against_exact_search():
+    version = "test:ivf-recall"
+    x = _fill(version)
+    index = vectorstore.train(version, nlist=48)
+    assert index["nlist"] == 48 and index["rows"] == 3000
+
+    rng = np.random.default_rng(7)
+    queries = x[rng.choice(len(x), 40, replace=False)] + 0.1 * rng.normal(size=(40, DIM)).astype(np.float32)
+    recall = {nprobe: [] for nprobe in (1, 16, 48)}
+    for q in queries:
+        exact = _ids(vectorstore.search(version, q, 10, nprobe=0))
+        assert len(exact) == 10
+        for nprobe in recall:
+            approx = _ids(vectorstore.search(version, q, 10, nprobe=nprobe))
+            recall[nprobe].append(len(set(approx) & set(exact)) / 10)
+    mean = {n: float(np.mean(r)) for n, r in recall.items()}
+    # More topics than cells, so neighbours spill into nearby cells: one probe
+    # misses many, a third of the cells finds nearly all, every cell is exact
+    assert mean[1] < 0.8 and mean[16] >= 0.9 and mean[48] == 1.0
+
+
+def test_index_follows_appends_merges_and_tombstones():
+    version = "test:ivf-maintenance"
+    x = _fill(version, rows=1200, segments=2)
+    vectorstore.train(version, nlist=16)
+    new = {"chunk_id": "fresh", "doc_id": "d0", "vec": x[5]}
+    vectorstore.add(version, [new], {"d0": ("L0", "410A")}, deleted=["c5"])
+
+    probe = lambda: vectorstore.search(version, x[5], 3, nprobe=4)
+    assert _ids(probe())[0] == "fresh" and "c5" not in _ids(probe())
+
+    before = _ids(vectorstore.search(version, x[100], 10, nprobe=4))
+    assert vectorstore.merge(version, everything=True)
+    manifest = vectorstore.read_manifest(vectorstore.space_dir(version))
+    assert len(manifest["segments"]) == 1 and manifest["segments"][0]["rows"] == 1200
+    assert _ids(vectorstore.search(version, x[100], 10, nprobe=4)) == before
+    assert "c5" not in _ids(vectorstore.search(version, x[5], 1200, nprobe=0))
+
+
+def test_filtered_ivf_query_falls_back_to_exact_and_dims_are_checked():
+    version = "test:ivf-filters"
+    x = _fill(version, rows=600, segments=1)
+    vectorstore.train(version, nlist=30)
+    hits = vectorstore.search(version, x[0], 50, loan_id="L1", nprobe=1)
+    assert len(hits) == 50 and all(int(c[1:]) % 2 == 1 for c in _ids(hits))
+    assert _ids(hits) == _ids(vectorstore.search(version, x[0], 50, loan_id="L1", nprobe=0))
+    assert {h[2] for h in vectorstore.search(version, x[0], 5, doc_type="410A")} == {"d0"}
+    with pytest.raises(ValueError):
+        vectorstore.search(version, x[0][:8], 5)
@@ -0,0 +1,43 @@
+import time
+
+from sqlalchemy import update
+
+from app.models import DataVersion, Loan
+from app.settings import settings
+from app.utils import versions
+
+
+def _get(client, url, tag=None):
+    return client.get(url, headers={"If-None-Match": tag} if tag else {})
+
+
+def test_bump_invalidates_etag(client, db):
+    db.add(Loan(loan_id="L1", balance=100.0))
+    db.commit()
+    first = _get(client, "/api/loans/summary")
+    tag = first.headers["etag"]
+    assert first.status_code == 200
+    assert _get(client, "/api/loans/summary", tag).status_code == 304
+
+    db.add(Loan(loan_id="L2", balance=200.0))
+    db.commit()
+    versions.bump(db, "loans")
+    after = _get(client, "/api/loans/summary", tag)
+    assert after.status_code == 200
+    assert after.headers["etag"] != tag
+    assert after.json()["total"] == 2
+    assert _get(client, "/api/loans/summary", after.headers["etag"]).status_code == 304
+
+
+def test_other_worker_bump_seen_after_ttl(client, db, monkeypatch):
+    # current() caches per process; a bump made by another worker (here: straight
+    # to the table, bypassing this process's cache) shows once DATA_VERSION_TTL lapses
+    monkeypatch.setattr(settings, "DATA_VERSION_TTL", 0.5)
+    versions.bump(db, "loans")
+    tag = _get(client, "/api/loans/summary").headers["etag"]
+    db.execute(update(DataVersion).where(DataVersion.name == "loans").values(version=DataVersion.version + 1))
+    db.commit()
+    time.sleep(0.6)
+    after = _get(client, "/api/loans/summary", tag)
+    assert after.status_code == 200
+    assert after.headers["etag"] != tag